@@ -0,0 +1,36 @@
+"""build_missing_analytics
+
+Revision ID: 1e7b4d9a3c60
+Revises: 5d9e1b3a7c42
+Create Date: 2026-10-20 09:12:37.184205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlmodel import Session
+
+from db.utils.application_utils import build_missing_user_analytics
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e7b4d9a3c60'
+down_revision: Union[str, None] = '5d9e1b3a7c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Build the applications and user_stats rollups of existing users, which reads
+    never do. Uses the same grouping as the write path, so it runs at the head
+    revision's schema.
+    """
+    with Session(bind=op.get_bind()) as db_session:
+        build_missing_user_analytics(db_session)
+        db_session.flush()
+
+
+def downgrade() -> None:
+    """The rollups are derived data, nothing to undo."""
+    pass
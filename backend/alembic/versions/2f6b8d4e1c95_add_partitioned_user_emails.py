@@ -0,0 +1,105 @@
+"""add_partitioned_user_emails
+
+Revision ID: 2f6b8d4e1c95
+Revises: 7c3e9a1f5d28
+Create Date: 2026-10-19 22:41:07.382114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6b8d4e1c95'
+down_revision: Union[str, None] = '7c3e9a1f5d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# db/user_emails.USER_EMAILS_PARTITIONS when the table was partitioned
+PARTITIONS = 16
+
+# keeps user_emails_partitioned in step with every write to user_emails until the swap
+SYNC_FUNCTION = """
+CREATE FUNCTION user_emails_sync_partitioned() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.id, OLD.user_id) IS DISTINCT FROM (NEW.id, NEW.user_id)) THEN
+        DELETE FROM user_emails_partitioned WHERE id = OLD.id AND user_id = OLD.user_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO user_emails_partitioned (
+            id, user_id, company_id, status_id, job_title_id, received_at, subject, email_from,
+            prompt_version, application_id
+        ) VALUES (
+            NEW.id, NEW.user_id, NEW.company_id, NEW.status_id, NEW.job_title_id, NEW.received_at,
+            NEW.subject, NEW.email_from, NEW.prompt_version, NEW.application_id
+        )
+        ON CONFLICT (id, user_id) DO UPDATE SET
+            company_id = EXCLUDED.company_id,
+            status_id = EXCLUDED.status_id,
+            job_title_id = EXCLUDED.job_title_id,
+            received_at = EXCLUDED.received_at,
+            subject = EXCLUDED.subject,
+            email_from = EXCLUDED.email_from,
+            prompt_version = EXCLUDED.prompt_version,
+            application_id = EXCLUDED.application_id;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    """
+    Add user_emails_partitioned, hash partitioned by user_id, and a trigger that
+    copies every write to user_emails into it. Existing rows are copied by
+    `python -m jobs.partition_user_emails` while the app keeps running, and the
+    next migration swaps the tables.
+    """
+    op.execute('CREATE TABLE user_emails_partitioned (LIKE user_emails) PARTITION BY HASH (user_id)')
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f'CREATE TABLE user_emails_p{remainder:02d} PARTITION OF user_emails_partitioned '
+            f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})'
+        )
+    op.create_primary_key('user_emails_partitioned_pkey', 'user_emails_partitioned', ['id', 'user_id'])
+    op.create_index('ix_user_emails_partitioned_application_id', 'user_emails_partitioned', ['application_id'])
+    op.create_index(
+        'ix_user_emails_partitioned_user_id_received_at',
+        'user_emails_partitioned',
+        ['user_id', sa.text('received_at DESC')],
+    )
+    op.create_index(
+        'ix_user_emails_partitioned_user_id_status_id', 'user_emails_partitioned', ['user_id', 'status_id']
+    )
+    op.create_foreign_key(
+        'user_emails_partitioned_application_id_fkey', 'user_emails_partitioned', 'applications',
+        ['application_id'], ['id'], ondelete='SET NULL',
+    )
+    op.create_foreign_key(
+        'user_emails_partitioned_company_id_fkey', 'user_emails_partitioned', 'companies',
+        ['company_id'], ['company_id'],
+    )
+    op.create_foreign_key(
+        'user_emails_partitioned_status_id_fkey', 'user_emails_partitioned', 'job_statuses',
+        ['status_id'], ['status_id'],
+    )
+    op.create_foreign_key(
+        'user_emails_partitioned_job_title_id_fkey', 'user_emails_partitioned', 'job_titles',
+        ['job_title_id'], ['job_title_id'],
+    )
+
+    op.execute(SYNC_FUNCTION)
+    op.execute(
+        'CREATE TRIGGER user_emails_sync_partitioned AFTER INSERT OR UPDATE OR DELETE ON user_emails '
+        'FOR EACH ROW EXECUTE FUNCTION user_emails_sync_partitioned()'
+    )
+
+
+def downgrade() -> None:
+    """Drop user_emails_partitioned and its trigger."""
+    op.execute('DROP TRIGGER user_emails_sync_partitioned ON user_emails')
+    op.execute('DROP FUNCTION user_emails_sync_partitioned()')
+    op.drop_table('user_emails_partitioned')
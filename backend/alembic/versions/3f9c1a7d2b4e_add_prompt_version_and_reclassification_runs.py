@@ -0,0 +1,42 @@
+"""add_prompt_version_and_reclassification_runs
+
+Revision ID: 3f9c1a7d2b4e
+Revises: c256d0279ea6
+Create Date: 2026-10-19 09:12:41.183502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1a7d2b4e'
+down_revision: Union[str, None] = 'c256d0279ea6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Record the prompt version used to label each email and track re-classification runs."""
+    # existing rows stay NULL, which marks them as labeled by an older prompt
+    op.add_column('user_emails', sa.Column('prompt_version', sa.Integer(), nullable=True))
+
+    op.create_table(
+        'reclassification_task_runs',
+        sa.Column('user_id', sa.VARCHAR(), sa.ForeignKey('users.user_id'), primary_key=True),
+        sa.Column('prompt_version', sa.Integer(), nullable=False),
+        sa.Column('created', sa.DateTime(), nullable=False),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.VARCHAR(), nullable=False),
+        sa.Column('total_emails', sa.Integer(), nullable=False),
+        sa.Column('processed_emails', sa.Integer(), nullable=False),
+        sa.Column('llm_calls', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Remove the prompt_version column and the re-classification runs table."""
+    op.drop_table('reclassification_task_runs')
+    op.drop_column('user_emails', 'prompt_version')
@@ -0,0 +1,49 @@
+"""add_applications_and_user_stats
+
+Revision ID: 5b8e2f4a6c13
+Revises: e41b7c9d3a52
+Create Date: 2026-10-19 14:40:53.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f4a6c13'
+down_revision: Union[str, None] = 'e41b7c9d3a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the per-company applications rollup and per-user stats tables."""
+    # existing users get their rollups built by revision 1e7b4d9a3c60 (build_missing_analytics)
+    op.create_table(
+        'applications',
+        sa.Column('user_id', sa.VARCHAR(), sa.ForeignKey('users.user_id'), primary_key=True),
+        sa.Column('company_name', sa.VARCHAR(), primary_key=True),
+        sa.Column('job_title', sa.VARCHAR(), nullable=False),
+        sa.Column('status_counts', sa.JSON(), nullable=False),
+        sa.Column('email_count', sa.Integer(), nullable=False),
+        sa.Column('has_known_status', sa.Boolean(), nullable=False),
+        sa.Column('has_response', sa.Boolean(), nullable=False),
+        sa.Column('last_email_at', sa.DateTime(), nullable=True),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.VARCHAR(), sa.ForeignKey('users.user_id'), primary_key=True),
+        sa.Column('email_count', sa.Integer(), nullable=False),
+        sa.Column('application_count', sa.Integer(), nullable=False),
+        sa.Column('responded_application_count', sa.Integer(), nullable=False),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Remove the applications and user_stats tables."""
+    op.drop_table('user_stats')
+    op.drop_table('applications')
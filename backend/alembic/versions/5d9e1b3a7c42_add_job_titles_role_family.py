@@ -0,0 +1,36 @@
+"""add_job_titles_role_family
+
+Revision ID: 5d9e1b3a7c42
+Revises: 8a5c3f7e2b19
+Create Date: 2026-10-20 00:21:14.503817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9e1b3a7c42'
+down_revision: Union[str, None] = '8a5c3f7e2b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Add job_titles.role_family. Existing titles are clustered by
+    jobs/assign_role_families.py; until then /get-response-rate parses them.
+    """
+    op.add_column('job_titles', sa.Column('role_family', sa.String(), nullable=True))
+    op.create_index(
+        'ix_job_titles_without_role_family', 'job_titles', ['job_title_id'],
+        postgresql_where=sa.text('role_family IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Drop job_titles.role_family."""
+    op.drop_index('ix_job_titles_without_role_family', table_name='job_titles')
+    op.drop_column('job_titles', 'role_family')
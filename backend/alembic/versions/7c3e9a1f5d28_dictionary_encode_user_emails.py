@@ -0,0 +1,157 @@
+"""dictionary_encode_user_emails
+
+Revision ID: 7c3e9a1f5d28
+Revises: c5f81d2e9a64
+Create Date: 2026-10-19 20:12:48.915302
+
+"""
+import email.utils
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e9a1f5d28'
+down_revision: Union[str, None] = 'c5f81d2e9a64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the labels of utils/llm_utils.py when the table was added, seeded so they get the small ids
+STATUS_LABELS = (
+    "Application confirmation",
+    "Rejection",
+    "Availability request",
+    "Information request",
+    "Assessment sent",
+    "Interview invitation",
+    "Did not apply - inbound request",
+    "Action required from company",
+    "Hiring freeze notification",
+    "Withdrew application",
+    "Offer made",
+    "False positive",
+    "unknown",
+)
+
+
+def sender_domain(email_from: str) -> str:
+    """
+    db/utils/dictionary_utils.sender_domain as of this revision, so backfilled rows get
+    the same company_email_domain as rows written at runtime.
+    """
+    address = email.utils.parseaddr(email_from or "")[1]
+    return address.rpartition("@")[2].lower() if "@" in address else ""
+
+
+def upgrade() -> None:
+    """
+    Store company (with sender domain), job title and status of user_emails as ids
+    into dictionary tables. The UPDATE rewrites every row, run
+    `VACUUM FULL user_emails` afterwards to return the space of the old rows.
+    """
+    op.create_table(
+        'companies',
+        sa.Column('company_id', sa.Integer(), primary_key=True),
+        sa.Column('company_name', sa.VARCHAR(), nullable=False),
+        sa.Column('company_email_domain', sa.VARCHAR(), nullable=False),
+        sa.UniqueConstraint('company_name', 'company_email_domain', name='unique_company_name_and_domain'),
+    )
+    op.create_table(
+        'job_titles',
+        sa.Column('job_title_id', sa.Integer(), primary_key=True),
+        sa.Column('job_title', sa.VARCHAR(), nullable=False),
+        sa.UniqueConstraint('job_title', name='unique_job_title'),
+    )
+    job_statuses = op.create_table(
+        'job_statuses',
+        sa.Column('status_id', sa.SmallInteger(), primary_key=True),
+        sa.Column('status_name', sa.VARCHAR(), nullable=False),
+        sa.Column('status_description', sa.VARCHAR(), nullable=False),
+        sa.UniqueConstraint('status_name', name='unique_status_name'),
+    )
+    op.bulk_insert(job_statuses, [{'status_name': label, 'status_description': ''} for label in STATUS_LABELS])
+
+    op.execute(
+        "INSERT INTO job_statuses (status_name, status_description) "
+        "SELECT DISTINCT application_status, '' FROM user_emails ON CONFLICT DO NOTHING"
+    )
+    op.execute("INSERT INTO job_titles (job_title) SELECT DISTINCT job_title FROM user_emails ON CONFLICT DO NOTHING")
+    # the domain of each sender is parsed in Python, with the function the write path uses
+    connection = op.get_bind()
+    connection.execute(sa.text(
+        "CREATE TEMPORARY TABLE sender_domains (email_from VARCHAR PRIMARY KEY, domain VARCHAR NOT NULL)"
+    ))
+    email_froms = connection.execute(sa.text("SELECT DISTINCT coalesce(email_from, '') FROM user_emails")).scalars()
+    sender_domains = [{'email_from': email_from, 'domain': sender_domain(email_from)} for email_from in email_froms]
+    if sender_domains:
+        connection.execute(sa.text("INSERT INTO sender_domains VALUES (:email_from, :domain)"), sender_domains)
+    op.execute(
+        "INSERT INTO companies (company_name, company_email_domain) "
+        "SELECT DISTINCT user_emails.company_name, sender_domains.domain FROM user_emails "
+        "JOIN sender_domains ON sender_domains.email_from = coalesce(user_emails.email_from, '') "
+        "ON CONFLICT DO NOTHING"
+    )
+
+    op.add_column('user_emails', sa.Column('company_id', sa.Integer(), nullable=True))
+    op.add_column('user_emails', sa.Column('status_id', sa.SmallInteger(), nullable=True))
+    op.add_column('user_emails', sa.Column('job_title_id', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE user_emails SET company_id = companies.company_id, status_id = job_statuses.status_id, "
+        "job_title_id = job_titles.job_title_id "
+        "FROM companies, job_statuses, job_titles, sender_domains "
+        "WHERE sender_domains.email_from = coalesce(user_emails.email_from, '') "
+        "AND companies.company_name = user_emails.company_name "
+        "AND companies.company_email_domain = sender_domains.domain "
+        "AND job_statuses.status_name = user_emails.application_status "
+        "AND job_titles.job_title = user_emails.job_title"
+    )
+    op.execute("DROP TABLE sender_domains")
+    for column in ('company_id', 'status_id', 'job_title_id'):
+        op.alter_column('user_emails', column, nullable=False)
+    op.create_foreign_key(
+        'user_emails_company_id_fkey', 'user_emails', 'companies', ['company_id'], ['company_id']
+    )
+    op.create_foreign_key(
+        'user_emails_status_id_fkey', 'user_emails', 'job_statuses', ['status_id'], ['status_id']
+    )
+    op.create_foreign_key(
+        'user_emails_job_title_id_fkey', 'user_emails', 'job_titles', ['job_title_id'], ['job_title_id']
+    )
+
+    op.drop_index('ix_user_emails_user_id_lower_status', table_name='user_emails')
+    op.create_index('ix_user_emails_user_id_status_id', 'user_emails', ['user_id', 'status_id'])
+    op.drop_column('user_emails', 'company_name')
+    op.drop_column('user_emails', 'application_status')
+    op.drop_column('user_emails', 'job_title')
+
+
+def downgrade() -> None:
+    """Store company, job title and status of user_emails as text again."""
+    op.add_column('user_emails', sa.Column('company_name', sa.VARCHAR(), nullable=True))
+    op.add_column('user_emails', sa.Column('application_status', sa.VARCHAR(), nullable=True))
+    op.add_column('user_emails', sa.Column('job_title', sa.VARCHAR(), nullable=True))
+    op.execute(
+        "UPDATE user_emails SET company_name = companies.company_name, "
+        "application_status = job_statuses.status_name, job_title = job_titles.job_title "
+        "FROM companies, job_statuses, job_titles "
+        "WHERE companies.company_id = user_emails.company_id "
+        "AND job_statuses.status_id = user_emails.status_id "
+        "AND job_titles.job_title_id = user_emails.job_title_id"
+    )
+    for column in ('company_name', 'application_status', 'job_title'):
+        op.alter_column('user_emails', column, nullable=False)
+
+    op.drop_index('ix_user_emails_user_id_status_id', table_name='user_emails')
+    op.create_index(
+        'ix_user_emails_user_id_lower_status',
+        'user_emails',
+        ['user_id', sa.text('lower(application_status)')],
+    )
+    op.drop_column('user_emails', 'company_id')
+    op.drop_column('user_emails', 'status_id')
+    op.drop_column('user_emails', 'job_title_id')
+    op.drop_table('companies')
+    op.drop_table('job_statuses')
+    op.drop_table('job_titles')
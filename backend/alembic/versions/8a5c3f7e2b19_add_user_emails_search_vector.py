@@ -0,0 +1,66 @@
+"""add_user_emails_search_vector
+
+Revision ID: 8a5c3f7e2b19
+Revises: d4a7c2e9f316
+Create Date: 2026-10-19 23:37:52.118640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a5c3f7e2b19'
+down_revision: Union[str, None] = 'd4a7c2e9f316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# db/user_emails.SEARCH_VECTOR_FUNCTION and SEARCH_VECTOR_TRIGGER when the column was added
+SEARCH_VECTOR_FUNCTION = """
+CREATE FUNCTION user_emails_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT company_name FROM companies WHERE company_id = NEW.company_id), ''
+        )), 'A')
+        || setweight(to_tsvector('simple', coalesce(
+            (SELECT job_title FROM job_titles WHERE job_title_id = NEW.job_title_id), ''
+        )), 'B')
+        || setweight(to_tsvector('simple', coalesce(NEW.subject, '')), 'B')
+        || setweight(to_tsvector('simple', translate(coalesce(NEW.email_from, ''), '@.<>', '    ')), 'C');
+    RETURN NEW;
+END
+$$
+"""
+SEARCH_VECTOR_TRIGGER = (
+    'CREATE TRIGGER user_emails_search_vector '
+    'BEFORE INSERT OR UPDATE OF company_id, job_title_id, subject, email_from ON user_emails '
+    'FOR EACH ROW EXECUTE FUNCTION user_emails_search_vector()'
+)
+
+
+def upgrade() -> None:
+    """
+    Add user_emails.search_vector, kept up to date by a trigger, with a GIN index for
+    /search-emails. The backfill rewrites every row, run `VACUUM user_emails`
+    afterwards.
+    """
+    op.add_column('user_emails', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(SEARCH_VECTOR_FUNCTION)
+    op.execute(SEARCH_VECTOR_TRIGGER)
+    # fires the trigger for every row
+    op.execute('UPDATE user_emails SET subject = subject')
+    op.create_index(
+        'ix_user_emails_search_vector', 'user_emails', ['search_vector'], postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Drop user_emails.search_vector and its trigger."""
+    op.drop_index('ix_user_emails_search_vector', table_name='user_emails')
+    op.execute('DROP TRIGGER user_emails_search_vector ON user_emails')
+    op.execute('DROP FUNCTION user_emails_search_vector()')
+    op.drop_column('user_emails', 'search_vector')
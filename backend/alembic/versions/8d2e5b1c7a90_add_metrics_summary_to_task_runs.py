@@ -0,0 +1,28 @@
+"""add_metrics_summary_to_task_runs
+
+Revision ID: 8d2e5b1c7a90
+Revises: 3f9c1a7d2b4e
+Create Date: 2026-10-19 11:04:27.650193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e5b1c7a90'
+down_revision: Union[str, None] = '3f9c1a7d2b4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add a per-run summary of ingestion stage timings and counters."""
+    op.add_column('processing_task_runs', sa.Column('metrics_summary', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Remove the metrics_summary column."""
+    op.drop_column('processing_task_runs', 'metrics_summary')
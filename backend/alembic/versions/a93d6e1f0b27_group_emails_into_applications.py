@@ -0,0 +1,82 @@
+"""group_emails_into_applications
+
+Revision ID: a93d6e1f0b27
+Revises: 5b8e2f4a6c13
+Create Date: 2026-10-19 15:58:20.447310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93d6e1f0b27'
+down_revision: Union[str, None] = '5b8e2f4a6c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Key applications by normalized company and title, and link emails to them."""
+    # the rollups are derived data: drop them, revision 1e7b4d9a3c60 (build_missing_analytics)
+    # builds them again
+    op.drop_table('applications')
+    op.execute('DELETE FROM user_stats')
+
+    op.create_table(
+        'applications',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.VARCHAR(), sa.ForeignKey('users.user_id'), nullable=False),
+        sa.Column('company_key', sa.VARCHAR(), nullable=False),
+        sa.Column('title_key', sa.VARCHAR(), nullable=False),
+        sa.Column('company_name', sa.VARCHAR(), nullable=False),
+        sa.Column('job_title', sa.VARCHAR(), nullable=False),
+        sa.Column('status_counts', sa.JSON(), nullable=False),
+        sa.Column('email_count', sa.Integer(), nullable=False),
+        sa.Column('has_known_status', sa.Boolean(), nullable=False),
+        sa.Column('has_response', sa.Boolean(), nullable=False),
+        sa.Column('last_status', sa.VARCHAR(), nullable=True),
+        sa.Column('first_seen_at', sa.DateTime(), nullable=True),
+        sa.Column('last_email_at', sa.DateTime(), nullable=True),
+        sa.Column('first_response_at', sa.DateTime(), nullable=True),
+        sa.Column('assessment_at', sa.DateTime(), nullable=True),
+        sa.Column('interview_at', sa.DateTime(), nullable=True),
+        sa.Column('offer_at', sa.DateTime(), nullable=True),
+        sa.Column('rejected_at', sa.DateTime(), nullable=True),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('user_id', 'company_key', 'title_key', name='unique_user_application'),
+    )
+
+    op.add_column(
+        'user_emails',
+        sa.Column(
+            'application_id',
+            sa.Integer(),
+            sa.ForeignKey('applications.id', ondelete='SET NULL'),
+            nullable=True,
+        ),
+    )
+    op.create_index('ix_user_emails_application_id', 'user_emails', ['application_id'])
+
+
+def downgrade() -> None:
+    """Go back to per-company applications without links from emails."""
+    op.drop_index('ix_user_emails_application_id', table_name='user_emails')
+    op.drop_column('user_emails', 'application_id')
+    op.drop_table('applications')
+    op.execute('DELETE FROM user_stats')
+
+    op.create_table(
+        'applications',
+        sa.Column('user_id', sa.VARCHAR(), sa.ForeignKey('users.user_id'), primary_key=True),
+        sa.Column('company_name', sa.VARCHAR(), primary_key=True),
+        sa.Column('job_title', sa.VARCHAR(), nullable=False),
+        sa.Column('status_counts', sa.JSON(), nullable=False),
+        sa.Column('email_count', sa.Integer(), nullable=False),
+        sa.Column('has_known_status', sa.Boolean(), nullable=False),
+        sa.Column('has_response', sa.Boolean(), nullable=False),
+        sa.Column('last_email_at', sa.DateTime(), nullable=True),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+    )
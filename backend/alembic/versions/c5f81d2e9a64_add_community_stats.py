@@ -0,0 +1,44 @@
+"""add_community_stats
+
+Revision ID: c5f81d2e9a64
+Revises: a93d6e1f0b27
+Create Date: 2026-10-19 17:21:36.508821
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f81d2e9a64'
+down_revision: Union[str, None] = 'a93d6e1f0b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add per-user response statistics and the community sketches built from them."""
+    op.add_column('user_stats', sa.Column('response_rate', sa.Float(), nullable=True))
+    op.add_column('user_stats', sa.Column('median_response_hours', sa.Float(), nullable=True))
+    op.add_column('user_stats', sa.Column('community_response_rate', sa.Float(), nullable=True))
+    op.add_column('user_stats', sa.Column('community_response_hours', sa.Float(), nullable=True))
+    # existing user_stats rows are rebuilt so the new columns get filled in
+    op.execute('DELETE FROM user_stats')
+
+    op.create_table(
+        'community_stats',
+        sa.Column('name', sa.VARCHAR(), primary_key=True),
+        sa.Column('sketch', sa.JSON(), nullable=False),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Remove the community sketches and per-user response statistics."""
+    op.drop_table('community_stats')
+    op.drop_column('user_stats', 'community_response_hours')
+    op.drop_column('user_stats', 'community_response_rate')
+    op.drop_column('user_stats', 'median_response_hours')
+    op.drop_column('user_stats', 'response_rate')
@@ -0,0 +1,139 @@
+"""swap_in_partitioned_user_emails
+
+Revision ID: d4a7c2e9f316
+Revises: 2f6b8d4e1c95
+Create Date: 2026-10-19 22:58:31.604277
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c2e9f316'
+down_revision: Union[str, None] = '2f6b8d4e1c95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    'id, user_id, company_id, status_id, job_title_id, received_at, subject, email_from, '
+    'prompt_version, application_id'
+)
+# (name while both tables exist, name once swapped)
+INDEXES = (
+    ('user_emails_partitioned_pkey', 'user_emails_pkey'),
+    ('ix_user_emails_partitioned_application_id', 'ix_user_emails_application_id'),
+    ('ix_user_emails_partitioned_user_id_received_at', 'ix_user_emails_user_id_received_at'),
+    ('ix_user_emails_partitioned_user_id_status_id', 'ix_user_emails_user_id_status_id'),
+)
+FOREIGN_KEYS = (
+    ('user_emails_partitioned_application_id_fkey', 'user_emails_application_id_fkey'),
+    ('user_emails_partitioned_company_id_fkey', 'user_emails_company_id_fkey'),
+    ('user_emails_partitioned_status_id_fkey', 'user_emails_status_id_fkey'),
+    ('user_emails_partitioned_job_title_id_fkey', 'user_emails_job_title_id_fkey'),
+)
+
+# the trigger of the previous migration, put back by the downgrade
+SYNC_FUNCTION = """
+CREATE FUNCTION user_emails_sync_partitioned() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.id, OLD.user_id) IS DISTINCT FROM (NEW.id, NEW.user_id)) THEN
+        DELETE FROM user_emails_partitioned WHERE id = OLD.id AND user_id = OLD.user_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO user_emails_partitioned (
+            id, user_id, company_id, status_id, job_title_id, received_at, subject, email_from,
+            prompt_version, application_id
+        ) VALUES (
+            NEW.id, NEW.user_id, NEW.company_id, NEW.status_id, NEW.job_title_id, NEW.received_at,
+            NEW.subject, NEW.email_from, NEW.prompt_version, NEW.application_id
+        )
+        ON CONFLICT (id, user_id) DO UPDATE SET
+            company_id = EXCLUDED.company_id,
+            status_id = EXCLUDED.status_id,
+            job_title_id = EXCLUDED.job_title_id,
+            received_at = EXCLUDED.received_at,
+            subject = EXCLUDED.subject,
+            email_from = EXCLUDED.email_from,
+            prompt_version = EXCLUDED.prompt_version,
+            application_id = EXCLUDED.application_id;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def copy_missing_rows(source: str, target: str) -> None:
+    op.execute(
+        f'INSERT INTO {target} ({COLUMNS}) SELECT {COLUMNS} FROM {source} '
+        f'WHERE NOT EXISTS (SELECT FROM {target} WHERE {target}.id = {source}.id '
+        f'AND {target}.user_id = {source}.user_id)'
+    )
+
+
+def upgrade() -> None:
+    """
+    Replace user_emails with user_emails_partitioned. Run
+    `python -m jobs.partition_user_emails` first, otherwise every row is copied here
+    while user_emails is locked. The old table is kept as user_emails_unpartitioned
+    (without its foreign keys); archive it with `pg_dump -t user_emails_unpartitioned`
+    and drop it once the partitioned table has been checked.
+    """
+    op.execute('LOCK TABLE user_emails, user_emails_partitioned IN ACCESS EXCLUSIVE MODE')
+    # the trigger has copied every write since the last migration, so once the backfill
+    # has finished the counts match and there is nothing left to copy
+    connection = op.get_bind()
+    count = 'SELECT (SELECT count(*) FROM user_emails) = (SELECT count(*) FROM user_emails_partitioned)'
+    if not connection.exec_driver_sql(count).scalar():
+        copy_missing_rows('user_emails', 'user_emails_partitioned')
+    op.execute('DROP TRIGGER user_emails_sync_partitioned ON user_emails')
+    op.execute('DROP FUNCTION user_emails_sync_partitioned()')
+
+    for _, name in FOREIGN_KEYS:
+        op.drop_constraint(name, 'user_emails', type_='foreignkey')
+    op.rename_table('user_emails', 'user_emails_unpartitioned')
+    for _, name in INDEXES:
+        op.execute(f'ALTER INDEX {name} RENAME TO {name.replace("user_emails", "user_emails_unpartitioned", 1)}')
+
+    op.rename_table('user_emails_partitioned', 'user_emails')
+    for old_name, name in INDEXES:
+        op.execute(f'ALTER INDEX {old_name} RENAME TO {name}')
+    for old_name, name in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE user_emails RENAME CONSTRAINT {old_name} TO {name}')
+
+
+def downgrade() -> None:
+    """
+    Put the unpartitioned table back, with the rows written since the upgrade, and
+    keep the partitioned one in step with it again.
+    """
+    op.execute('LOCK TABLE user_emails, user_emails_unpartitioned IN ACCESS EXCLUSIVE MODE')
+    op.execute('TRUNCATE user_emails_unpartitioned')
+    op.execute(f'INSERT INTO user_emails_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM user_emails')
+
+    for old_name, name in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE user_emails RENAME CONSTRAINT {name} TO {old_name}')
+    for old_name, name in INDEXES:
+        op.execute(f'ALTER INDEX {name} RENAME TO {old_name}')
+    op.rename_table('user_emails', 'user_emails_partitioned')
+
+    for _, name in INDEXES:
+        op.execute(f'ALTER INDEX {name.replace("user_emails", "user_emails_unpartitioned", 1)} RENAME TO {name}')
+    op.rename_table('user_emails_unpartitioned', 'user_emails')
+    op.create_foreign_key(
+        'user_emails_application_id_fkey', 'user_emails', 'applications',
+        ['application_id'], ['id'], ondelete='SET NULL',
+    )
+    op.create_foreign_key('user_emails_company_id_fkey', 'user_emails', 'companies', ['company_id'], ['company_id'])
+    op.create_foreign_key('user_emails_status_id_fkey', 'user_emails', 'job_statuses', ['status_id'], ['status_id'])
+    op.create_foreign_key(
+        'user_emails_job_title_id_fkey', 'user_emails', 'job_titles', ['job_title_id'], ['job_title_id']
+    )
+
+    op.execute(SYNC_FUNCTION)
+    op.execute(
+        'CREATE TRIGGER user_emails_sync_partitioned AFTER INSERT OR UPDATE OR DELETE ON user_emails '
+        'FOR EACH ROW EXECUTE FUNCTION user_emails_sync_partitioned()'
+    )
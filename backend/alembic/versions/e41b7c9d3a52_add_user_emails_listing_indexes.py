@@ -0,0 +1,38 @@
+"""add_user_emails_listing_indexes
+
+Revision ID: e41b7c9d3a52
+Revises: 8d2e5b1c7a90
+Create Date: 2026-10-19 13:22:08.114927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b7c9d3a52'
+down_revision: Union[str, None] = '8d2e5b1c7a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index a user's emails by date and by case-insensitive status."""
+    op.create_index(
+        'ix_user_emails_user_id_received_at',
+        'user_emails',
+        ['user_id', sa.text('received_at DESC')],
+    )
+    op.create_index(
+        'ix_user_emails_user_id_lower_status',
+        'user_emails',
+        ['user_id', sa.text('lower(application_status)')],
+    )
+
+
+def downgrade() -> None:
+    """Drop the user_emails listing indexes."""
+    op.drop_index('ix_user_emails_user_id_lower_status', table_name='user_emails')
+    op.drop_index('ix_user_emails_user_id_received_at', table_name='user_emails')
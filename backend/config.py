@@ -26,6 +26,42 @@ class Settings(BaseSettings):
     DATABASE_URL_DOCKER: str = (
         "postgresql://postgres:postgres@db:5432/jobseeker_analytics"
     )
+    DATABASE_REPLICA_URL: str = ""  # streaming replica for analytics and exports, see database.ReplicaRouter
+    REPLICA_MAX_LAG_SECONDS: float = 30.0  # reads go to the primary while the replica is further behind
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_TIMEOUT_SECONDS: float = 2.0  # connect and statement timeout of the lag check
+    # connection pool of request handlers (sync and async engine each), see database.py
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10  # extra connections opened under load and closed when returned
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced, -1 to keep them
+    DB_POOL_PRE_PING: bool = True  # check connections on checkout, so dropped ones are replaced
+    # connection pool of email fetching and batch jobs, kept apart so they can't starve requests
+    INGEST_DB_POOL_SIZE: int = 2
+    INGEST_DB_MAX_OVERFLOW: int = 3
+    COPY_MIN_EMAILS: int = 200  # batches of new emails at least this large are written with COPY, see db/utils/user_email_utils.py
+    DICTIONARY_CACHE_SIZE: int = 10000  # cached ids per dictionary table, see db/utils/dictionary_utils.py
+    COMPANY_MATCH_MIN_SIMILARITY: float = 0.6  # n-gram similarity to merge a company name into a known one, see db/utils/company_utils.py
+    COMPANY_INDEX_MAX_AGE_SECONDS: float = 3600.0  # the in-memory index of companies is rebuilt this often
+    ROLE_FAMILY_MIN_SIMILARITY: float = 0.6  # n-gram similarity to cluster a job title with a known role, see db/utils/job_title_utils.py
+    ROLE_FAMILY_INDEX_MAX_AGE_SECONDS: float = 3600.0  # the in-memory index of role families is rebuilt this often
+    RULE_EXTRACTION_ENABLED: bool = True  # find company and job title with sender-domain rules before asking the model, see utils/extraction_utils.py
+    LLM_REQUESTS_PER_MINUTE: int = 30  # 0 disables client side rate limiting
+    LLM_BATCH_SIZE: int = 20  # emails labeled per model call by batch jobs
+    RECLASSIFY_MAX_LLM_CALLS: int = 500  # budget for a single re-classification run
+    CASSETTE_MODE: str = "off"  # "record" or "replay" Gmail and Gemini calls, see utils/cassette_utils.py
+    CASSETTE_PATH: str = "cassettes/session.jsonl.gz"
+    CASSETTE_LATENCY_SCALE: float = 1.0  # replayed latency = recorded latency * scale
+    METRICS_TOKEN: str = ""  # /metrics requires "Authorization: Bearer <token>", and is off in prod/staging without one
+    PROFILING_SAMPLE_RATE: float = 0.0  # fraction of requests to profile, see utils/profiling_utils.py
+    PROFILING_INTERVAL_SECONDS: float = 0.005
+    PROFILING_OUTPUT_DIR: str = "profiles"
+    STATS_CACHE_SIZE: int = 1024  # cached /stats results per process, see routes/stats_routes.py
+    COMMUNITY_MIN_APPLICATIONS: int = 5  # users with fewer applications are left out of /stats/community
+    COMMUNITY_SKETCH_ACCURACY: float = 0.01  # relative error of community percentiles
+    SANKEY_RENDER_WORKERS: int = 2  # processes rendering Sankey PNGs, see utils/sankey_utils.py
+    SANKEY_RENDER_TIMEOUT_SECONDS: float = 60.0
+    SANKEY_CACHE_SIZE: int = 256  # cached Sankey renderings per process
 
     @field_validator("GOOGLE_SCOPES", mode="before")
     @classmethod
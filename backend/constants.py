@@ -20,6 +20,27 @@ GENERIC_ATS_DOMAINS = [
     "myworkday.com",
     "otta.com",
 ]
+# domains of the applicant tracking systems and job boards that utils/extraction_utils.py
+# has templates for, by system; subdomains (us.greenhouse-mail.io) match too. Other
+# GENERIC_ATS_DOMAINS are only told apart from company domains
+ATS_SENDER_DOMAINS = {
+    "greenhouse": ["greenhouse-mail.io", "greenhouse.io"],
+    "lever": ["lever.co"],
+    "ashby": ["ashbyhq.com"],
+    "linkedin": ["linkedin.com"],
+}
+# free mailboxes, which recruiters also write from, so they don't identify a company
+PERSONAL_EMAIL_DOMAINS = [
+    "gmail.com",
+    "googlemail.com",
+    "yahoo.com",
+    "outlook.com",
+    "hotmail.com",
+    "live.com",
+    "icloud.com",
+    "proton.me",
+    "protonmail.com",
+]
 
 DEFAULT_DAYS_AGO = 30
 # Get the current date
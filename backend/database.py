@@ -1,11 +1,22 @@
+import logging
+import math
 import os
-from typing import Annotated
+import threading
+import time
+from typing import Annotated, Optional
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Engine, make_url, text
+from sqlalchemy.ext.asyncio import create_async_engine
 from utils.config_utils import get_settings
+from utils.pool_utils import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, track_connections_in_use
+from utils import metrics_utils
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import fastapi
 
+logger = logging.getLogger(__name__)
+
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -21,7 +32,117 @@ def request_session():
         yield session
 
 
+def read_only_request_session():
+    """
+    Session for routes that only read (analytics and exports), on the replica when
+    it is fresh enough (see ReplicaRouter), otherwise on the primary.
+    """
+    session = Session(read_engine())
+    # for helpers that need to know they can't write on this session
+    session.info["read_only"] = True
+    with session.begin():
+        session.exec(text("SET TRANSACTION READ ONLY"))
+        yield session
+
+
+async def async_request_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        async with session.begin():
+            yield session
+
+
 DBSession = Annotated[Session, fastapi.Depends(request_session)]
+ReadOnlyDBSession = Annotated[Session, fastapi.Depends(read_only_request_session)]
+# For async routes: queries are awaited instead of blocking the event loop
+AsyncDBSession = Annotated[AsyncSession, fastapi.Depends(async_request_session)]
+
+
+def async_database_url(database_url: str):
+    """The same database, through the asyncpg driver."""
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    if "sslmode" in url.query:
+        # asyncpg calls libpq's sslmode "ssl"
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+    return url
+
+
+class ReplicaRouter:
+    """
+    Routes read-only work to a streaming replica while it is at most max_lag_seconds
+    behind the primary, and to the primary when it lags further, isn't streaming
+    from the primary or can't be reached. The lag is checked at most every
+    check_interval_seconds, by one request at a time while the others keep using
+    the last decision.
+    """
+
+    # A replica that has replayed everything it received while still streaming is
+    # caught up, however long ago the last write on the primary was. One whose WAL
+    # receiver is disconnected has replayed everything too, so its lag is unknown
+    # (NULL). Reading pg_stat_wal_receiver.status takes pg_read_all_stats (or
+    # pg_monitor); without it the status is NULL and reads stay on the primary.
+    LAG_QUERY = text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN NOT EXISTS (SELECT FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+
+    def __init__(
+        self,
+        primary: Engine,
+        replica: Optional[Engine],
+        max_lag_seconds: float,
+        check_interval_seconds: float,
+        check_timeout_seconds: float = 2.0,
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.check_timeout_seconds = check_timeout_seconds
+        self.use_replica = False
+        self.checked_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def replica_lag_seconds(self) -> Optional[float]:
+        """Replication lag, or None if it is unknown or the replica can't be reached."""
+        try:
+            with self.replica.connect() as connection:
+                connection.execute(
+                    text("SELECT set_config('statement_timeout', :timeout, true)"),
+                    {"timeout": f"{round(self.check_timeout_seconds * 1000)}ms"},
+                )
+                lag = connection.execute(self.LAG_QUERY).scalar()
+        except Exception as e:
+            logger.warning("Replica lag check failed: %s", e)
+            return None
+        return None if lag is None else float(lag)
+
+    def read_engine(self) -> Engine:
+        if self.replica is None:
+            return self.primary
+        with self.lock:
+            now = time.monotonic()
+            check_lag = self.checked_at is None or now - self.checked_at >= self.check_interval_seconds
+            if check_lag:
+                # claimed, so concurrent requests don't check it too
+                self.checked_at = now
+            use_replica = self.use_replica
+        if check_lag:
+            lag = self.replica_lag_seconds()
+            metrics_utils.DB_REPLICA_LAG_SECONDS.set(-1 if lag is None else lag)
+            use_replica = lag is not None and lag <= self.max_lag_seconds
+            with self.lock:
+                if use_replica != self.use_replica:
+                    logger.info("Routing reads to the %s (replica lag: %s)", "replica" if use_replica else "primary", lag)
+                self.use_replica = use_replica
+        return self.replica if use_replica else self.primary
+
+
+def read_engine() -> Engine:
+    """Engine for read-only queries, see ReplicaRouter."""
+    return replica_router.read_engine()
+
 
 settings = get_settings()
 IS_DOCKER_CONTAINER = os.environ.get("IS_DOCKER_CONTAINER", 0)
@@ -32,6 +153,59 @@ elif settings.is_publicly_deployed:
 else:
     DATABASE_URL = settings.DATABASE_URL_LOCAL_VIRTUAL_ENV
 
-engine = create_engine(DATABASE_URL)
+
+def pool_options(name: str, size: int, max_overflow: int) -> dict:
+    return {
+        "pool_logging_name": name,
+        "pool_size": size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+# request handlers (sync routes and dependencies)
+# batch the UPDATEs of ORM flushes (e.g. re-labeled emails, refreshed applications)
+# into pages of statements instead of one round trip per row
+engine = create_engine(
+    DATABASE_URL,
+    executemany_mode="values_plus_batch",
+    poolclass=InstrumentedQueuePool,
+    **pool_options("web", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+)
+# async request handlers
+async_engine = create_async_engine(
+    async_database_url(DATABASE_URL),
+    poolclass=InstrumentedAsyncAdaptedQueuePool,
+    **pool_options("web_async", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+)
+# email fetching and batch jobs, which hold a connection for a whole run
+ingest_engine = create_engine(
+    DATABASE_URL,
+    executemany_mode="values_plus_batch",
+    poolclass=InstrumentedQueuePool,
+    **pool_options("ingest", settings.INGEST_DB_POOL_SIZE, settings.INGEST_DB_MAX_OVERFLOW),
+)
+# analytics and exports, when a replica is configured
+replica_engine = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        settings.DATABASE_REPLICA_URL,
+        poolclass=InstrumentedQueuePool,
+        # so an unreachable replica fails the lag check quickly instead of holding up reads
+        connect_args={"connect_timeout": max(1, math.ceil(settings.REPLICA_LAG_CHECK_TIMEOUT_SECONDS))},
+        **pool_options("replica", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+    )
+for pool in (engine.pool, async_engine.pool, ingest_engine.pool, replica_engine and replica_engine.pool):
+    if pool:
+        track_connections_in_use(pool)
+replica_router = ReplicaRouter(
+    engine,
+    replica_engine,
+    settings.REPLICA_MAX_LAG_SECONDS,
+    settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+    settings.REPLICA_LAG_CHECK_TIMEOUT_SECONDS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
\ No newline at end of file
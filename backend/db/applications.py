@@ -0,0 +1,44 @@
+from sqlmodel import Field, SQLModel, UniqueConstraint
+from datetime import datetime, timezone
+from typing import Optional
+import sqlalchemy as sa
+
+
+class Applications(SQLModel, table=True):
+    """
+    A job application, grouping a user's emails about the same role at the same
+    company (see utils/normalization_utils.py for the grouping keys). Maintained by
+    db/utils/application_utils.py whenever user_emails rows are added, deleted or
+    re-labeled.
+    """
+
+    __tablename__ = "applications"
+    __table_args__ = (
+        UniqueConstraint("user_id", "company_key", "title_key", name="unique_user_application"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str = Field(foreign_key="users.user_id", nullable=False)
+    company_key: str = Field(nullable=False)
+    title_key: str = Field(nullable=False)  # "" when no email named the role
+    # as written in the most recent labeled email
+    company_name: str = ""
+    job_title: str = ""
+    # number of emails per normalized status, "unknown" excluded
+    status_counts: dict = Field(default_factory=dict, sa_column=sa.Column(sa.JSON, nullable=False))
+    email_count: int = 0
+    has_known_status: bool = False
+    has_response: bool = False
+    last_status: Optional[str] = None
+    first_seen_at: Optional[datetime] = None
+    last_email_at: Optional[datetime] = None
+    first_response_at: Optional[datetime] = None
+    # first email that reached each stage of the hiring process
+    assessment_at: Optional[datetime] = None
+    interview_at: Optional[datetime] = None
+    offer_at: Optional[datetime] = None
+    rejected_at: Optional[datetime] = None
+    updated: datetime = Field(
+        sa_column_kwargs={"onupdate": sa.func.now()},
+        default_factory=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
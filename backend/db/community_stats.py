@@ -0,0 +1,19 @@
+from sqlmodel import Field, SQLModel
+from datetime import datetime, timezone
+import sqlalchemy as sa
+
+
+class CommunityStats(SQLModel, table=True):
+    """
+    Distribution of a per-user statistic across all users, as a mergeable quantile
+    sketch (utils/sketch_utils.py). Maintained by jobs/community_rollup.py.
+    """
+
+    __tablename__ = "community_stats"
+    name: str = Field(primary_key=True)  # e.g. "response_rate"
+    sketch: dict = Field(sa_column=sa.Column(sa.JSON, nullable=False))
+    updated: datetime = Field(
+        sa_column_kwargs={"onupdate": sa.func.now()},
+        default_factory=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
@@ -2,6 +2,11 @@ from sqlmodel import SQLModel, Field, UniqueConstraint
 
 
 class Companies(SQLModel, table=True):
+    """
+    Dictionary of the company names and sender domains of user_emails, see
+    db/utils/dictionary_utils.py.
+    """
+
     __tablename__ = "companies"
     company_id: int = Field(default=None, primary_key=True)
     company_name: str
@@ -1,8 +1,17 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, UniqueConstraint
+import sqlalchemy as sa
 
 
 class JobStatus(SQLModel, table=True):
+    """
+    Dictionary of the application statuses of user_emails, as labeled by the model.
+    The labels of utils/llm_utils.py are seeded with fixed ids by the migration that
+    added the table, anything else the model answers is added as it comes up.
+    """
+
     __tablename__ = "job_statuses"
-    status_id: int = Field(default=None, primary_key=True)
+    status_id: int = Field(default=None, sa_column=sa.Column(sa.SmallInteger, primary_key=True))
     status_name: str
-    status_description: str
+    status_description: str = ""
+
+    __table_args__ = (UniqueConstraint("status_name", name="unique_status_name"),)
@@ -1,9 +1,20 @@
+from typing import Optional
+
+import sqlalchemy as sa
 from sqlmodel import SQLModel, Field, UniqueConstraint
 
 
 class JobTitles(SQLModel, table=True):
+    """Dictionary of the job titles of user_emails, see db/utils/dictionary_utils.py."""
+
     __tablename__ = "job_titles"
     job_title_id: int = Field(default=None, primary_key=True)
     job_title: str
+    # cluster of the title's role, "" for unknown titles, set by db/utils/job_title_utils.py
+    role_family: Optional[str] = None
 
-    __table_args__ = (UniqueConstraint("job_title", name="unique_job_title"),)
+    __table_args__ = (
+        UniqueConstraint("job_title", name="unique_job_title"),
+        # titles still to be clustered
+        sa.Index("ix_job_titles_without_role_family", "job_title_id", postgresql_where=sa.text("role_family IS NULL")),
+    )
@@ -1,5 +1,6 @@
 from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime, timezone
+from typing import Optional
 import sqlalchemy as sa
 from db.users import Users
 
@@ -19,5 +20,7 @@ class TaskRuns(SQLModel, table=True):
     status: str = Field(nullable=False)
     total_emails: int = 0
     processed_emails: int = 0
+    # time spent per ingestion stage and counters of the last run, see utils/metrics_utils.py
+    metrics_summary: Optional[dict] = Field(default=None, sa_column=sa.Column(sa.JSON))
 
     user: Users = Relationship()
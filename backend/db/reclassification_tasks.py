@@ -0,0 +1,27 @@
+from sqlmodel import Field, SQLModel
+from datetime import datetime, timezone
+import sqlalchemy as sa
+
+from db.processing_tasks import FINISHED, STARTED  # noqa: F401
+
+
+class ReclassificationRuns(SQLModel, table=True):
+    """
+    Progress of re-labeling a user's stored emails with the current prompt version.
+    A run that stops early (budget reached, crash) keeps status STARTED and is picked
+    up where it left off by the next run for the same prompt version.
+    """
+
+    __tablename__ = "reclassification_task_runs"
+    user_id: str = Field(foreign_key="users.user_id", primary_key=True)
+    prompt_version: int = Field(nullable=False)
+    created: datetime = Field(default_factory=datetime.now, nullable=False)
+    updated: datetime = Field(
+        sa_column_kwargs={"onupdate": sa.func.now()},
+        default_factory=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    status: str = Field(nullable=False)
+    total_emails: int = 0
+    processed_emails: int = 0
+    llm_calls: int = 0
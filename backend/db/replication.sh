@@ -0,0 +1,4 @@
+#!/bin/bash
+# Lets the db-replica service (docker-compose-dev.yaml, "replica" profile) stream from this database
+set -e
+echo "host replication all all md5" >> "$PGDATA/pg_hba.conf"
@@ -1,13 +1,110 @@
 from sqlmodel import SQLModel, Field
 from datetime import datetime
+from typing import Optional
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+from pydantic import BaseModel
+# register the tables referenced by the foreign keys below
+from db.applications import Applications  # noqa: F401
+from db.companies import Companies  # noqa: F401
+from db.job_status import JobStatus  # noqa: F401
+from db.job_titles import JobTitles  # noqa: F401
 
-class UserEmails(SQLModel, table=True):
-    __tablename__ = "user_emails"  
-    id: str = Field(primary_key=True)  # Gmail email ID (not unique globally)
-    user_id: str = Field(primary_key=True)  # Unique per user (composite key)
+# user_emails is hash partitioned by user_id, so every per-user query reads one partition
+USER_EMAILS_PARTITIONS = 16
+
+# search_vector of user_emails, set by a trigger as company and job title are only
+# stored as ids. Weighted so matches on the company rank first, and with the sender
+# address split up so "stripe" matches jobs@stripe.com.
+SEARCH_VECTOR_FUNCTION = """
+CREATE FUNCTION user_emails_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT company_name FROM companies WHERE company_id = NEW.company_id), ''
+        )), 'A')
+        || setweight(to_tsvector('simple', coalesce(
+            (SELECT job_title FROM job_titles WHERE job_title_id = NEW.job_title_id), ''
+        )), 'B')
+        || setweight(to_tsvector('simple', coalesce(NEW.subject, '')), 'B')
+        || setweight(to_tsvector('simple', translate(coalesce(NEW.email_from, ''), '@.<>', '    ')), 'C');
+    RETURN NEW;
+END
+$$
+"""
+SEARCH_VECTOR_TRIGGER = (
+    "CREATE TRIGGER user_emails_search_vector "
+    "BEFORE INSERT OR UPDATE OF company_id, job_title_id, subject, email_from ON user_emails "
+    "FOR EACH ROW EXECUTE FUNCTION user_emails_search_vector()"
+)
+
+
+class UserEmailData(BaseModel):
+    """
+    An email as returned by the API, and as written by store_user_emails, with the
+    names that user_emails stores as dictionary ids.
+    """
+
+    id: str
+    user_id: str
     company_name: str
     application_status: str
     received_at: datetime
     subject: str
     job_title: str
-    email_from: str  # to avoid 'from' being a reserved key word
\ No newline at end of file
+    email_from: str
+    prompt_version: Optional[int] = None
+    application_id: Optional[int] = None
+
+
+class UserEmails(SQLModel, table=True):
+    """
+    A job-related email. Company names, statuses and job titles repeat on many rows,
+    so they are stored as ids into the companies, job_statuses and job_titles
+    tables. Emails are written through db/utils/user_email_utils.py, which encodes
+    the names, and read with the names joined in (job_emails_query).
+    """
+
+    __tablename__ = "user_emails"
+    __table_args__ = (
+        # newest-first listing of a user's emails (get_user_emails, exports, stats)
+        sa.Index("ix_user_emails_user_id_received_at", "user_id", sa.text("received_at DESC")),
+        # status filters
+        sa.Index("ix_user_emails_user_id_status_id", "user_id", "status_id"),
+        {"postgresql_partition_by": "HASH (user_id)"},
+    )
+    id: str = Field(primary_key=True)  # Gmail email ID (not unique globally)
+    user_id: str = Field(primary_key=True)  # Unique per user (composite key)
+    company_id: Optional[int] = Field(default=None, foreign_key="companies.company_id", nullable=False)
+    status_id: Optional[int] = Field(
+        default=None, sa_column=sa.Column(sa.SmallInteger, sa.ForeignKey("job_statuses.status_id"), nullable=False)
+    )
+    job_title_id: Optional[int] = Field(default=None, foreign_key="job_titles.job_title_id", nullable=False)
+    received_at: datetime
+    subject: str
+    # to avoid 'from' being a reserved key word. The whole sender (name and address),
+    # which listings and exports show and searches match; companies only keep its domain
+    email_from: str
+    prompt_version: Optional[int] = None  # llm_utils.PROMPT_VERSION used to label this email
+    application_id: Optional[int] = Field(
+        default=None, foreign_key="applications.id", index=True, ondelete="SET NULL"
+    )  # set by db/utils/application_utils.py
+
+
+# not a model field: it is only written by the trigger above and only read by searches
+UserEmails.__table__.append_column(sa.Column("search_vector", TSVECTOR))
+sa.Index("ix_user_emails_search_vector", UserEmails.__table__.c.search_vector, postgresql_using="gin")
+
+UserEmails.__mapper__.add_property("search_vector", deferred(UserEmails.__table__.c.search_vector))
+
+
+@sa.event.listens_for(UserEmails.__table__, "after_create")
+def create_partitions_and_triggers(table, connection, **kwargs) -> None:
+    for remainder in range(USER_EMAILS_PARTITIONS):
+        connection.exec_driver_sql(
+            f"CREATE TABLE {table.name}_p{remainder:02d} PARTITION OF {table.name} "
+            f"FOR VALUES WITH (MODULUS {USER_EMAILS_PARTITIONS}, REMAINDER {remainder})"
+        )
+    connection.exec_driver_sql(SEARCH_VECTOR_FUNCTION)
+    connection.exec_driver_sql(SEARCH_VECTOR_TRIGGER)
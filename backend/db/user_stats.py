@@ -0,0 +1,29 @@
+from sqlmodel import Field, SQLModel
+from datetime import datetime, timezone
+from typing import Optional
+import sqlalchemy as sa
+
+
+class UserStats(SQLModel, table=True):
+    """
+    Per-user totals over the applications rollup, kept in step with it by
+    db/utils/application_utils.py.
+    """
+
+    __tablename__ = "user_stats"
+    user_id: str = Field(foreign_key="users.user_id", primary_key=True)
+    email_count: int = 0
+    application_count: int = 0  # applications with at least one known status
+    responded_application_count: int = 0
+    # percent of applications with a response, None below COMMUNITY_MIN_APPLICATIONS
+    response_rate: Optional[float] = None
+    # median time from first email to first response over responded applications
+    median_response_hours: Optional[float] = None
+    # the values currently counted in community_stats, see jobs/community_rollup.py
+    community_response_rate: Optional[float] = None
+    community_response_hours: Optional[float] = None
+    updated: datetime = Field(
+        sa_column_kwargs={"onupdate": sa.func.now()},
+        default_factory=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
@@ -0,0 +1,395 @@
+"""
+Groups a user's emails into applications and keeps the applications and user_stats
+rollups in step with user_emails.
+
+Writers of user_emails call assign_applications() for new or re-labeled emails and
+then refresh_user_analytics() with the application ids they touched, in the same
+transaction, so the rollups commit (or roll back) together with the emails. Each
+refresh recomputes only the touched applications from their emails, which also
+keeps deletes and re-labels exact. A user's first write after the rollups were
+added rebuilds them from all of their emails; reads never build them, so the
+migration that added them is followed by one that builds them for every existing
+user (build_missing_user_analytics).
+"""
+
+import logging
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlmodel import Session, select, delete, insert, update, func
+
+from db.applications import Applications
+from db.companies import Companies
+from db.job_status import JobStatus
+from db.job_titles import JobTitles
+from db.user_emails import UserEmails
+from db.user_stats import UserStats
+from db.users import Users
+from db.utils.job_title_utils import assign_role_families
+from utils.config_utils import get_settings
+from utils.llm_utils import APPLICATION_STATUS_LABELS
+from utils.normalization_utils import normalize_company_name, normalize_job_title, normalize_status
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# statuses that don't count as hearing back from the company
+NON_RESPONSE_STATUSES = {"application confirmation", "rejection"}
+
+# the stage each status label of the model marks, None for those that mark none.
+# Every label needs an entry, so a new label fails here instead of dropping its emails
+LABEL_STAGES = {
+    "Application confirmation": None,
+    "Rejection": "rejected_at",
+    "Availability request": "interview_at",
+    "Information request": None,
+    "Assessment sent": "assessment_at",
+    "Interview invitation": "interview_at",
+    "Did not apply - inbound request": None,
+    "Action required from company": None,
+    "Hiring freeze notification": None,
+    "Withdrew application": None,
+    "Offer made": "offer_at",
+    "False positive": None,
+}
+
+# statuses (lower-cased, as stored statuses are compared) that mark each stage
+STAGE_STATUSES: Dict[str, set] = {"assessment_at": set(), "interview_at": set(), "offer_at": set(), "rejected_at": set()}
+for label in APPLICATION_STATUS_LABELS:
+    if LABEL_STAGES[label]:
+        STAGE_STATUSES[LABEL_STAGES[label]].add(label.lower())
+
+
+def normalized_status():
+    """The status of user_emails rows, in queries joined with_status()."""
+    return func.lower(func.trim(JobStatus.status_name))
+
+
+def with_status(statement):
+    return statement.join(JobStatus, JobStatus.status_id == UserEmails.status_id)
+
+
+def has_known_status():
+    """In queries joined with_status()."""
+    return (JobStatus.status_name != "") & (normalized_status() != "unknown")
+
+
+def assign_applications(db_session: Session, user_id: str, user_emails: Iterable) -> set:
+    """
+    Sets application_id on each email (UserEmailData objects, or any rows with
+    company_name, job_title and received_at), creating applications as needed, and returns
+    the ids of the applications the emails now belong to. Emails without a known
+    company don't belong to an application. An email that doesn't name the role is
+    added to the most recent application at the same company.
+    """
+    user_emails = list(user_emails)
+    company_keys = {normalize_company_name(user_email.company_name) for user_email in user_emails} - {""}
+    application_ids: Dict[Tuple[str, str], Optional[int]] = {}
+    latest_by_company: Dict[str, Tuple[str, str]] = {}
+    if company_keys:
+        existing = db_session.exec(
+            select(Applications.id, Applications.company_key, Applications.title_key)
+            .where(Applications.user_id == user_id, Applications.company_key.in_(company_keys))
+            .order_by(Applications.last_email_at.asc().nulls_first())
+        ).all()
+        for application_id, company_key, title_key in existing:
+            application_ids[(company_key, title_key)] = application_id
+            latest_by_company[company_key] = (company_key, title_key)
+
+    assignments = []
+    for user_email in sorted(user_emails, key=lambda user_email: user_email.received_at):
+        company_key = normalize_company_name(user_email.company_name)
+        if not company_key:
+            user_email.application_id = None
+            continue
+        key = (company_key, normalize_job_title(user_email.job_title))
+        if key not in application_ids and not key[1]:
+            key = latest_by_company.get(company_key, key)
+        # new applications get their id from the insert below
+        application_ids.setdefault(key, None)
+        latest_by_company[company_key] = key
+        assignments.append((user_email, key))
+
+    new_keys = [key for key, application_id in application_ids.items() if application_id is None]
+    if new_keys:
+        # one multi-row INSERT; refresh_applications() fills in the rest of the columns
+        now = datetime.now(timezone.utc)
+        inserted = db_session.exec(
+            insert(Applications).returning(Applications.id, Applications.company_key, Applications.title_key),
+            params=[
+                {"user_id": user_id, "company_key": company_key, "title_key": title_key, "status_counts": {}, "updated": now}
+                for company_key, title_key in new_keys
+            ],
+        ).all()
+        for application_id, company_key, title_key in inserted:
+            application_ids[(company_key, title_key)] = application_id
+
+    for user_email, key in assignments:
+        user_email.application_id = application_ids[key]
+    return {user_email.application_id for user_email, _ in assignments}
+
+
+def refresh_applications(db_session: Session, user_id: str, application_ids: Iterable[Optional[int]]) -> None:
+    """
+    Recomputes the given applications from their emails, deleting the ones whose
+    emails are all gone.
+    """
+    application_ids = {application_id for application_id in application_ids if application_id}
+    if not application_ids:
+        return
+    db_session.flush()
+
+    in_applications = (UserEmails.user_id == user_id) & UserEmails.application_id.in_(application_ids)
+    counts = db_session.exec(
+        with_status(select(
+            UserEmails.application_id,
+            normalized_status(),
+            func.count(),
+            func.min(UserEmails.received_at),
+            func.max(UserEmails.received_at),
+        ))
+        .where(in_applications)
+        .group_by(UserEmails.application_id, normalized_status())
+    ).all()
+    # most recent email per application, preferring labeled ones for the display names
+    latest_emails = {
+        user_email.application_id: user_email
+        for user_email in db_session.exec(
+            with_status(select(
+                UserEmails.application_id,
+                Companies.company_name,
+                JobTitles.job_title,
+                JobStatus.status_name.label("application_status"),
+            ))
+            .join(Companies, Companies.company_id == UserEmails.company_id)
+            .join(JobTitles, JobTitles.job_title_id == UserEmails.job_title_id)
+            .where(in_applications)
+            .distinct(UserEmails.application_id)
+            .order_by(
+                UserEmails.application_id,
+                sa.desc(has_known_status()),
+                sa.desc(UserEmails.received_at),
+            )
+        ).all()
+    }
+
+    rollups = {}
+    for application_id, status, count, first_at, last_at in counts:
+        rollup = rollups.setdefault(
+            application_id, {"status_counts": {}, "email_count": 0, "first_at": {}, "seen": []}
+        )
+        rollup["email_count"] += count
+        rollup["seen"] += [first_at, last_at]
+        status = normalize_status(status)
+        if status:
+            rollup["status_counts"][status] = count
+            rollup["first_at"][status] = first_at
+
+    # one executemany UPDATE by primary key, which also updates loaded Applications objects
+    now = datetime.now(timezone.utc)
+    updates = []
+    for application_id, rollup in rollups.items():
+        latest_email = latest_emails[application_id]
+        first_at = rollup["first_at"]
+        response_times = [at for status, at in first_at.items() if status not in NON_RESPONSE_STATUSES]
+        values = {
+            "id": application_id,
+            "company_name": latest_email.company_name,
+            "job_title": latest_email.job_title,
+            "status_counts": rollup["status_counts"],
+            "email_count": rollup["email_count"],
+            "has_known_status": bool(rollup["status_counts"]),
+            "has_response": bool(response_times),
+            "last_status": normalize_status(latest_email.application_status) or None,
+            "first_seen_at": min(rollup["seen"]),
+            "last_email_at": max(rollup["seen"]),
+            "first_response_at": min(response_times, default=None),
+            "updated": now,
+        }
+        for stage, statuses in STAGE_STATUSES.items():
+            values[stage] = min((at for status, at in first_at.items() if status in statuses), default=None)
+        updates.append(values)
+    if updates:
+        db_session.execute(update(Applications), updates)
+    emptied = application_ids - rollups.keys()
+    if emptied:
+        db_session.exec(delete(Applications).where(Applications.id.in_(emptied)))
+
+
+def refresh_user_stats(db_session: Session, user_id: str) -> UserStats:
+    """
+    Recomputes the user's totals from their applications rows.
+    """
+    application_count, responded_application_count = db_session.exec(
+        select(
+            func.count().filter(Applications.has_known_status),
+            func.count().filter(Applications.has_known_status & Applications.has_response),
+        ).where(Applications.user_id == user_id)
+    ).one()
+    email_count = db_session.exec(
+        select(func.count()).select_from(UserEmails).where(UserEmails.user_id == user_id)
+    ).one()
+    response_hours = func.extract("epoch", Applications.first_response_at - Applications.first_seen_at) / 3600
+    median_response_hours = db_session.exec(
+        select(func.percentile_cont(0.5).within_group(response_hours)).where(
+            Applications.user_id == user_id,
+            Applications.first_response_at.is_not(None),
+        )
+    ).one()
+
+    user_stats = db_session.get(UserStats, user_id)
+    if user_stats is None:
+        user_stats = UserStats(user_id=user_id)
+        db_session.add(user_stats)
+    user_stats.email_count = email_count
+    user_stats.application_count = application_count
+    user_stats.responded_application_count = responded_application_count
+    user_stats.response_rate = None
+    if application_count >= settings.COMMUNITY_MIN_APPLICATIONS:
+        user_stats.response_rate = responded_application_count / application_count * 100
+    user_stats.median_response_hours = median_response_hours
+    # bumped on every refresh, so it also versions cached stats (routes/stats_routes.py)
+    user_stats.updated = datetime.now(timezone.utc)
+    db_session.flush()
+    return user_stats
+
+
+def refresh_user_analytics(db_session: Session, user_id: str, application_ids: Iterable[Optional[int]]) -> None:
+    """
+    Brings the rollups up to date after emails of the given applications were added,
+    deleted or re-labeled. Pass both the old and new application of a re-labeled email.
+    Does not commit, so the caller's email changes and the rollups commit together.
+    """
+    user_titles = select(UserEmails.job_title_id).where(UserEmails.user_id == user_id)
+    if db_session.get(UserStats, user_id) is None:
+        # the user's older emails predate the rollups, so regroup all of them
+        rebuild_user_analytics(db_session, user_id)
+    else:
+        application_ids = {application_id for application_id in application_ids if application_id}
+        refresh_applications(db_session, user_id, application_ids)
+        refresh_user_stats(db_session, user_id)
+        user_titles = user_titles.where(UserEmails.application_id.in_(application_ids))
+    # only the titles this write touched, not every title waiting for a role family
+    assign_role_families(db_session, user_titles)
+
+
+def set_application_ids(db_session: Session, user_id: str, user_emails: Iterable) -> None:
+    """
+    Stores the application_id assigned to plain (non-ORM) email rows, in a single
+    UPDATE joined against unnest()ed arrays of ids instead of one UPDATE per email.
+    """
+    assigned_emails = [user_email for user_email in user_emails if user_email.application_id]
+    if not assigned_emails:
+        return
+    assigned = (
+        func.unnest(
+            sa.bindparam("email_ids", [user_email.id for user_email in assigned_emails], type_=ARRAY(sa.String)),
+            sa.bindparam(
+                "application_ids",
+                [user_email.application_id for user_email in assigned_emails],
+                type_=ARRAY(sa.Integer),
+            ),
+        )
+        .table_valued("id", "application_id")
+        .render_derived(name="assigned")
+    )
+    db_session.exec(
+        update(UserEmails)
+        .where(UserEmails.user_id == user_id, UserEmails.id == assigned.c.id)
+        .values(application_id=assigned.c.application_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_user_analytics(db_session: Session, user_id: str) -> UserStats:
+    """
+    Regroups all of the user's emails into applications and rebuilds the rollups from scratch.
+    """
+    db_session.exec(update(UserEmails).where(UserEmails.user_id == user_id).values(application_id=None))
+    db_session.exec(delete(Applications).where(Applications.user_id == user_id))
+    db_session.expire_all()
+    # plain rows rather than ORM objects, so the new ids are written in bulk
+    user_emails = [
+        SimpleNamespace(**row)
+        for row in db_session.exec(
+            select(UserEmails.id, Companies.company_name, JobTitles.job_title, UserEmails.received_at)
+            .join(Companies, Companies.company_id == UserEmails.company_id)
+            .join(JobTitles, JobTitles.job_title_id == UserEmails.job_title_id)
+            .where(UserEmails.user_id == user_id)
+        ).mappings()
+    ]
+    application_ids = assign_applications(db_session, user_id, user_emails)
+    set_application_ids(db_session, user_id, user_emails)
+    refresh_applications(db_session, user_id, application_ids)
+    return refresh_user_stats(db_session, user_id)
+
+
+def build_missing_user_analytics(db_session: Session) -> int:
+    """
+    Builds the rollups of every user who doesn't have them yet, as their first write
+    would. Does not commit. Returns the number of users built.
+    """
+    user_ids = db_session.exec(
+        select(Users.user_id).where(~select(UserStats.user_id).where(UserStats.user_id == Users.user_id).exists())
+    ).all()
+    for user_id in user_ids:
+        refresh_user_analytics(db_session, user_id, [])
+    return len(user_ids)
+
+
+def get_user_stats(db_session: Session, user_id: str) -> UserStats:
+    """
+    Returns the user's totals, or empty (unsaved) totals for users whose rollups
+    haven't been built yet. Never writes, so it is safe on read-only sessions.
+    """
+    user_stats = db_session.get(UserStats, user_id)
+    if user_stats is None:
+        logger.info("user_id:%s has no analytics rollups yet", user_id)
+        # a fixed version, so stats cached before the rollups are built are replaced once they are
+        return UserStats(user_id=user_id, updated=datetime.min.replace(tzinfo=timezone.utc))
+    return user_stats
+
+
+def get_user_applications(db_session: Session, user_id: str) -> List[Applications]:
+    """
+    Returns the user's applications that have at least one known status, most recent first.
+    """
+    return db_session.exec(
+        select(Applications)
+        .where(Applications.user_id == user_id, Applications.has_known_status)
+        .order_by(Applications.last_email_at.desc())
+    ).all()
+
+
+def get_stage_counts(db_session: Session, user_id: str) -> Dict[str, int]:
+    """
+    Counts the user's applications by the furthest outcome they reached: an offer,
+    a rejection, an interview, an assessment, no response yet, or some other reply
+    (e.g. an information request).
+    """
+    no_offer = Applications.offer_at.is_(None)
+    no_rejection = Applications.rejected_at.is_(None)
+    no_interview = Applications.interview_at.is_(None)
+    total, offer, rejected, interview, assessment, no_response = db_session.exec(
+        select(
+            func.count(),
+            func.count().filter(Applications.offer_at.is_not(None)),
+            func.count().filter(no_offer, Applications.rejected_at.is_not(None)),
+            func.count().filter(no_offer, no_rejection, Applications.interview_at.is_not(None)),
+            func.count().filter(no_offer, no_rejection, no_interview, Applications.assessment_at.is_not(None)),
+            func.count().filter(~Applications.has_response, no_rejection),
+        ).where(Applications.user_id == user_id, Applications.has_known_status)
+    ).one()
+    return {
+        "applications": total,
+        "offer": offer,
+        "rejected": rejected,
+        "interview": interview,
+        "assessment": assessment,
+        "no_response": no_response,
+        "other": total - offer - rejected - interview - assessment - no_response,
+    }
@@ -0,0 +1,60 @@
+"""
+Reads and writes the community-wide quantile sketches in community_stats.
+"""
+
+from typing import Dict
+
+from sqlmodel import Session, select
+
+from db.community_stats import CommunityStats
+from db.user_stats import UserStats
+from utils.config_utils import get_settings
+from utils.sketch_utils import QuantileSketch
+
+settings = get_settings()
+
+# sketch name -> (current value, value currently counted in the sketch)
+COMMUNITY_METRICS = {
+    "response_rate": ("response_rate", "community_response_rate"),
+    "response_hours": ("median_response_hours", "community_response_hours"),
+}
+
+
+def load_sketches(db_session: Session, for_update: bool = False) -> Dict[str, QuantileSketch]:
+    statement = select(CommunityStats).where(CommunityStats.name.in_(COMMUNITY_METRICS))
+    if for_update:
+        # concurrent rollups wait for each other instead of losing updates
+        statement = statement.with_for_update()
+    rows = {row.name: row for row in db_session.exec(statement).all()}
+    return {
+        name: QuantileSketch.from_dict(rows[name].sketch)
+        if name in rows
+        else QuantileSketch(settings.COMMUNITY_SKETCH_ACCURACY)
+        for name in COMMUNITY_METRICS
+    }
+
+
+def save_sketches(db_session: Session, sketches: Dict[str, QuantileSketch]) -> None:
+    for name, sketch in sketches.items():
+        row = db_session.get(CommunityStats, name)
+        if row is None:
+            row = CommunityStats(name=name, sketch={})
+            db_session.add(row)
+        row.sketch = sketch.to_dict()
+
+
+def remove_user_contribution(db_session: Session, user_stats: UserStats) -> None:
+    """
+    Takes the values the user is counted with out of the community sketches. Call it
+    in the transaction that deletes the user's user_stats row, which the rollup can't
+    see any more afterwards.
+    """
+    counted_values = {name: getattr(user_stats, counted) for name, (_, counted) in COMMUNITY_METRICS.items()}
+    if all(value is None for value in counted_values.values()):
+        return
+    sketches = load_sketches(db_session, for_update=True)
+    for name, value in counted_values.items():
+        if value is not None:
+            sketches[name].remove(value)
+        setattr(user_stats, COMMUNITY_METRICS[name][1], None)
+    save_sketches(db_session, sketches)
@@ -0,0 +1,158 @@
+"""
+Canonical company names at ingest. The model spells the same company in many ways
+("Stripe", "Stripe, Inc.", "stripe"), and emails are grouped into applications by
+normalize_company_name of the name, so each spelling that normalizes differently
+would be a separate application. Before emails are stored, their company name is
+replaced with the name already used for that company:
+
+- an unknown name, or one that extends the company of a known sender domain
+  ("Stripe Payments" from jobs@stripe.com), becomes the domain's company,
+- a name whose normalized key matches a known company's, ignoring spaces, becomes
+  that company's name,
+- otherwise a name close to a known company's by n-gram similarity ("Goldmann
+  Sachs") becomes that company's name.
+
+Known companies are the companies table (names with their sender domain), kept in
+memory by a CompanyIndex that reads new rows incrementally, so a lookup doesn't go
+to the database.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from constants import GENERIC_ATS_DOMAINS, PERSONAL_EMAIL_DOMAINS
+from db.companies import Companies
+from db.utils.dictionary_utils import sender_domain
+from utils import metrics_utils
+from utils.config_utils import get_settings
+from utils.email_utils import is_generic_email_domain
+from utils.normalization_utils import NGramIndex, normalize_company_name
+
+settings = get_settings()
+
+# second-level labels under which companies register their domain, as in acme.co.uk
+SECOND_LEVEL_LABELS = {"co", "com", "org", "net", "ac", "gov", "edu"}
+
+
+def registered_domain(domain: str) -> str:
+    """The domain a company registered, without subdomains: jobs.acme.co.uk is acme.co.uk."""
+    labels = domain.lower().strip(".").split(".")
+    if len(labels) >= 3 and labels[-2] in SECOND_LEVEL_LABELS and len(labels[-1]) == 2:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+# emails from these come from many companies
+SHARED_DOMAINS = {registered_domain(domain) for domain in (*GENERIC_ATS_DOMAINS, *PERSONAL_EMAIL_DOMAINS)}
+
+
+def company_domain(domain: str) -> str:
+    """The registered domain if it identifies a company, "" for ATS and personal mail domains."""
+    if not domain or is_generic_email_domain(domain):
+        return ""
+    domain = registered_domain(domain)
+    return "" if domain in SHARED_DOMAINS else domain
+
+
+class CompanyIndex:
+    """Known companies by normalized key, spaceless key, n-grams and sender domain."""
+
+    def __init__(self, min_similarity: float, max_age_seconds: float):
+        self.min_similarity = min_similarity
+        self.max_age_seconds = max_age_seconds
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.names: Dict[str, str] = {}  # normalized key -> name of the company
+        self.compact_keys: Dict[str, str] = {}  # key without spaces -> key
+        self.domains: Dict[str, str] = {}  # company_domain -> key
+        self.ngrams = NGramIndex(size=3)  # of the spaceless keys
+        self.last_company_id = 0
+        self.loaded_at = time.monotonic()
+
+    def refresh(self, db_session: Session) -> None:
+        """
+        Adds the companies inserted since the last refresh. Rows whose ids commit out of
+        order can be missed, so the index is rebuilt every max_age_seconds.
+        """
+        with self.lock:
+            if time.monotonic() - self.loaded_at > self.max_age_seconds:
+                self.clear()
+            rows = db_session.exec(
+                select(Companies.company_id, Companies.company_name, Companies.company_email_domain)
+                .where(Companies.company_id > self.last_company_id)
+                .order_by(Companies.company_id)
+            ).all()
+            for company_id, company_name, domain in rows:
+                self.add_company(company_name, domain)
+                self.last_company_id = company_id
+
+    def add(self, company_name: str, domain: str) -> None:
+        with self.lock:
+            self.add_company(company_name, domain)
+
+    def add_company(self, company_name: str, domain: str) -> None:
+        key = normalize_company_name(company_name)
+        if not key:
+            return
+        # the first name seen for a key stays its name
+        self.names.setdefault(key, company_name)
+        compact_key = key.replace(" ", "")
+        self.compact_keys.setdefault(compact_key, key)
+        self.ngrams.add(compact_key)
+        domain = company_domain(domain)
+        # a domain belongs to the first company seen with it, unless a later one is named like it
+        if domain and (domain not in self.domains or compact_key == domain.split(".")[0]):
+            self.domains[domain] = key
+
+    def company_for_domain(self, email_from: str) -> Optional[str]:
+        """The name of the company known for the sender's domain, if any."""
+        with self.lock:
+            key = self.domains.get(company_domain(sender_domain(email_from)))
+            return self.names[key] if key else None
+
+    def canonical_name(self, company_name: str, email_from: str) -> Tuple[str, Optional[str]]:
+        """
+        The name to store for an email's company, with the rule that changed it
+        ("domain", "spelling" or "similar"), or the name itself and None.
+        """
+        with self.lock:
+            key = normalize_company_name(company_name)
+            domain_key = self.domains.get(company_domain(sender_domain(email_from)))
+            if domain_key and (not key or key.startswith(f"{domain_key} ")):
+                return self.names[domain_key], "domain"
+            if not key:
+                return company_name, None
+
+            compact_key = key.replace(" ", "")
+            rule = "spelling"
+            match = self.compact_keys.get(compact_key)
+            if match is None:
+                similar = self.ngrams.best_match(compact_key, self.min_similarity)
+                if similar is None:
+                    return company_name, None
+                match, rule = self.compact_keys[similar[0]], "similar"
+            name = self.names[match]
+            return (name, rule) if name != company_name else (company_name, None)
+
+
+company_index = CompanyIndex(settings.COMPANY_MATCH_MIN_SIMILARITY, settings.COMPANY_INDEX_MAX_AGE_SECONDS)
+
+
+def canonicalize_company_names(db_session: Session, user_emails: Iterable) -> None:
+    """
+    Replaces company_name of the emails (UserEmailData objects) with the name already used
+    for the same company. Companies new to the index are added, so later emails in the
+    batch match them too.
+    """
+    company_index.refresh(db_session)
+    for user_email in user_emails:
+        name, rule = company_index.canonical_name(user_email.company_name, user_email.email_from)
+        if rule:
+            metrics_utils.INGEST_COMPANY_NAMES_CANONICALIZED.inc(rule=rule)
+            user_email.company_name = name
+        company_index.add(name, sender_domain(user_email.email_from))
@@ -0,0 +1,138 @@
+"""
+Dictionary encoding of the text of user_emails that repeats on many rows: company
+names with their sender domain, job titles and application statuses are stored
+once in the companies, job_titles and job_statuses tables and referenced by id.
+
+Ids are looked up through a per-process cache, so ingest only goes to the database
+for values it hasn't seen before, and new values are added with one INSERT per
+dictionary per batch. Ids inserted by a transaction are only cached once it has
+committed, as they would be invalid if it rolled back.
+"""
+
+import email.utils
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import sqlalchemy as sa
+from cachetools import LRUCache
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from db.companies import Companies
+from db.job_status import JobStatus
+from db.job_titles import JobTitles
+from db.user_emails import UserEmails
+from utils.config_utils import get_settings
+
+settings = get_settings()
+
+
+class Dictionary:
+    """Interns values (tuples of key_columns) of one dictionary table."""
+
+    def __init__(self, id_column, key_columns: Sequence, cache_size: int):
+        self.id_column = id_column
+        self.table = id_column.table.name
+        self.key_columns = list(key_columns)
+        self.cache = LRUCache(maxsize=cache_size)
+        self.lock = threading.Lock()
+
+    def ids(self, db_session: Session, keys: Iterable[Tuple]) -> Dict[Tuple, int]:
+        """Returns the id of every key, adding the keys that aren't in the table yet."""
+        keys = set(keys)
+        with self.lock:
+            ids = {key: self.cache[key] for key in keys if key in self.cache}
+        missing = keys - ids.keys()
+        if not missing:
+            return ids
+
+        stored = self.lookup(db_session, missing)
+        inserted = uncommitted_ids(db_session)
+        with self.lock:
+            self.cache.update({key: id_ for key, id_ in stored.items() if (self.table, id_) not in inserted})
+        ids.update(stored)
+        missing -= stored.keys()
+        if missing:
+            names = [column.key for column in self.key_columns]
+            # keys added concurrently by another transaction come back from the lookup below
+            rows = db_session.exec(
+                pg_insert(self.id_column.table)
+                .values([dict(zip(names, key)) for key in missing])
+                .on_conflict_do_nothing()
+                .returning(self.id_column, *self.key_columns)
+            ).all()
+            ids.update({tuple(row[1:]): row[0] for row in rows})
+            inserted.update((self.table, row[0]) for row in rows)
+            ids.update(self.lookup(db_session, missing - ids.keys()))
+        return ids
+
+    def lookup(self, db_session: Session, keys: set) -> Dict[Tuple, int]:
+        if not keys:
+            return {}
+        rows = db_session.exec(
+            select(self.id_column, *self.key_columns).where(sa.tuple_(*self.key_columns).in_(keys))
+        ).all()
+        return {tuple(row[1:]): row[0] for row in rows}
+
+    def clear(self) -> None:
+        with self.lock:
+            self.cache.clear()
+
+
+def uncommitted_ids(db_session: Session) -> set:
+    """(table, id) of the dictionary rows inserted by the session's current transaction."""
+    return db_session.info.setdefault("uncommitted_dictionary_ids", set())
+
+
+@sa.event.listens_for(Session, "after_transaction_end")
+def forget_uncommitted_ids(db_session: Session, transaction) -> None:
+    # committed or rolled back, either way the next lookup reads what is stored
+    if transaction.parent is None:
+        db_session.info.pop("uncommitted_dictionary_ids", None)
+
+
+companies = Dictionary(
+    Companies.company_id,
+    [Companies.company_name, Companies.company_email_domain],
+    settings.DICTIONARY_CACHE_SIZE,
+)
+job_titles = Dictionary(JobTitles.job_title_id, [JobTitles.job_title], settings.DICTIONARY_CACHE_SIZE)
+job_statuses = Dictionary(JobStatus.status_id, [JobStatus.status_name], settings.DICTIONARY_CACHE_SIZE)
+
+
+def sender_domain(email_from: str) -> str:
+    """Domain of the sender's address, "" if there is none."""
+    address = email.utils.parseaddr(email_from or "")[1]
+    return address.rpartition("@")[2].lower() if "@" in address else ""
+
+
+def encode_user_emails(db_session: Session, user_emails: Sequence) -> List[UserEmails]:
+    """
+    The UserEmails rows of emails (UserEmailData, or any objects with its fields), with
+    company_id, status_id and job_title_id looked up from their company_name and
+    email_from, application_status and job_title. The rows are not added to the session.
+    """
+    company_keys = [(user_email.company_name, sender_domain(user_email.email_from)) for user_email in user_emails]
+    company_ids = companies.ids(db_session, company_keys)
+    status_ids = job_statuses.ids(db_session, {(user_email.application_status,) for user_email in user_emails})
+    title_ids = job_titles.ids(db_session, {(user_email.job_title,) for user_email in user_emails})
+    return [
+        UserEmails(
+            id=user_email.id,
+            user_id=user_email.user_id,
+            company_id=company_ids[company_key],
+            status_id=status_ids[(user_email.application_status,)],
+            job_title_id=title_ids[(user_email.job_title,)],
+            received_at=user_email.received_at,
+            subject=user_email.subject,
+            email_from=user_email.email_from,
+            prompt_version=user_email.prompt_version,
+            application_id=user_email.application_id,
+        )
+        for user_email, company_key in zip(user_emails, company_keys)
+    ]
+
+
+def clear_caches() -> None:
+    for dictionary in (companies, job_titles, job_statuses):
+        dictionary.clear()
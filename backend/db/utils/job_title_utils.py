@@ -0,0 +1,116 @@
+"""
+Role families of job titles, so response rates are grouped by role rather than by
+exact title: "Sr. Software Engineer", "Senior SWE" and "Software Engineer II" are all
+"software engineer".
+
+parse_job_title (utils/normalization_utils.py) drops seniority, level and qualifiers
+and expands abbreviations. Families that still differ slightly ("software engineer"
+and "software engineering") are clustered: a new family joins the cluster of the
+most similar family seen before, by n-gram similarity, or starts its own cluster.
+Each title's cluster is stored in job_titles.role_family once, when the rollups of
+the applications it names are refreshed, so the clustering is incremental and
+requests only read it. jobs/assign_role_families.py clusters the titles stored
+before role families existed.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable
+
+from sqlmodel import Session, select, update
+
+from db.job_titles import JobTitles
+from utils.config_utils import get_settings
+from utils.normalization_utils import NGramIndex, parse_job_title
+
+settings = get_settings()
+
+
+class RoleFamilyIndex:
+    """The role families assigned so far, by spaceless family and n-grams."""
+
+    def __init__(self, min_similarity: float, max_age_seconds: float):
+        self.min_similarity = min_similarity
+        self.max_age_seconds = max_age_seconds
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.clusters: Dict[str, str] = {}  # spaceless family -> role family of its cluster
+        self.ngrams = NGramIndex(size=3)  # of the spaceless role families
+        self.loaded_at = None
+
+    def load(self, db_session: Session) -> None:
+        """Reads the role families assigned by every process, once every max_age_seconds."""
+        with self.lock:
+            if self.loaded_at is not None and time.monotonic() - self.loaded_at <= self.max_age_seconds:
+                return
+            self.clear()
+            for role_family in db_session.exec(
+                select(JobTitles.role_family).where(JobTitles.role_family != "").distinct()
+            ).all():
+                self.add_family(role_family)
+            self.loaded_at = time.monotonic()
+
+    def add_family(self, role_family: str) -> None:
+        compact_family = role_family.replace(" ", "")
+        self.clusters.setdefault(compact_family, role_family)
+        self.ngrams.add(compact_family)
+
+    def cluster(self, family: str) -> str:
+        """The role family of a parsed family, which starts a new cluster if none is similar."""
+        if not family:
+            return ""
+        compact_family = family.replace(" ", "")
+        with self.lock:
+            if compact_family not in self.clusters:
+                similar = self.ngrams.best_match(compact_family, self.min_similarity)
+                if similar is None:
+                    self.add_family(family)
+                else:
+                    self.clusters[compact_family] = self.clusters[similar[0]]
+            return self.clusters[compact_family]
+
+
+role_families = RoleFamilyIndex(settings.ROLE_FAMILY_MIN_SIMILARITY, settings.ROLE_FAMILY_INDEX_MAX_AGE_SECONDS)
+
+
+def assign_role_families(db_session: Session, job_title_ids=None) -> int:
+    """
+    Sets role_family of the job titles that don't have one yet, only of job_title_ids
+    (ids, or a select of them) if given. Titles another transaction is assigning are
+    skipped. Returns the number of titles assigned.
+    """
+    statement = select(JobTitles.job_title_id, JobTitles.job_title).where(JobTitles.role_family.is_(None))
+    if job_title_ids is not None:
+        statement = statement.where(JobTitles.job_title_id.in_(job_title_ids))
+    rows = db_session.exec(statement.with_for_update(skip_locked=True)).all()
+    if not rows:
+        return 0
+    role_families.load(db_session)
+    families = {job_title_id: parse_job_title(job_title).family for job_title_id, job_title in rows}
+    # shortest first, so a new cluster is named after its plainest family
+    clusters = {
+        family: role_families.cluster(family)
+        for family in sorted(set(families.values()), key=lambda family: (len(family), family))
+    }
+    db_session.exec(
+        update(JobTitles),
+        params=[
+            {"job_title_id": job_title_id, "role_family": clusters[family]} for job_title_id, family in families.items()
+        ],
+    )
+    return len(rows)
+
+
+def get_role_families(db_session: Session, job_titles: Iterable[str]) -> Dict[str, str]:
+    """
+    The role family of each job title. Titles that haven't been clustered yet get
+    their parsed family.
+    """
+    job_titles = set(job_titles)
+    stored = dict(db_session.exec(
+        select(JobTitles.job_title, JobTitles.role_family)
+        .where(JobTitles.job_title.in_(job_titles), JobTitles.role_family.is_not(None))
+    ).all())
+    return {job_title: stored.get(job_title, parse_job_title(job_title).family) for job_title in job_titles}
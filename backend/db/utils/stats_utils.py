@@ -0,0 +1,217 @@
+"""
+Time-bucketed statistics over a user's emails, aggregated in Postgres.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+from sqlmodel import Session, select, func
+
+from db.job_status import JobStatus
+from db.user_emails import UserEmails
+from db.utils.application_utils import STAGE_STATUSES, normalized_status, with_status
+from utils.normalization_utils import normalize_status
+
+GRANULARITIES = ("day", "week", "month")
+
+APPLICATION_STATUSES = {"application confirmation"}
+
+
+def next_bucket(bucket: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return bucket + timedelta(days=1)
+    if granularity == "week":
+        return bucket + timedelta(weeks=1)
+    if bucket.month == 12:
+        return bucket.replace(year=bucket.year + 1, month=1)
+    return bucket.replace(month=bucket.month + 1)
+
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    """Python equivalent of Postgres date_trunc for the supported granularities."""
+    moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":  # date_trunc weeks start on Monday
+        return moment - timedelta(days=moment.weekday())
+    if granularity == "month":
+        return moment.replace(day=1)
+    return moment
+
+
+def get_timeline(
+    db_session: Session,
+    user_id: str,
+    granularity: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[Dict]:
+    """
+    Counts the user's labeled emails per status in each day, week or month from
+    since (or their first email) up to until (or their last email). Buckets with
+    no emails are included, so the series has no gaps. Each bucket also has the
+    number of applications (confirmations), responses (any reply, rejections
+    included) and interviews:
+    [{"start": datetime, "applications": 2, "responses": 1, "interviews": 0,
+      "counts": {"application confirmation": 2, "rejection": 1}}, ...]
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+
+    bucket = func.date_trunc(granularity, UserEmails.received_at).label("bucket")
+    status = normalized_status().label("status")
+    statement = (
+        with_status(select(bucket, status, func.count()))
+        .where(
+            UserEmails.user_id == user_id,
+            JobStatus.status_name != "",
+            status != "unknown",
+        )
+        .group_by(bucket, status)
+        .order_by(bucket)
+    )
+    if since:
+        statement = statement.where(UserEmails.received_at >= since)
+    if until:
+        statement = statement.where(UserEmails.received_at < until)
+    rows = db_session.exec(statement).all()
+    if not rows:
+        return []
+
+    counts_by_bucket: Dict[datetime, Dict[str, int]] = {}
+    for bucket_start, bucket_status, count in rows:
+        bucket_status = normalize_status(bucket_status)
+        if bucket_status:
+            counts_by_bucket.setdefault(bucket_start, {})[bucket_status] = count
+
+    first = truncate(since, granularity) if since else rows[0][0]
+    last = truncate(until - timedelta(microseconds=1), granularity) if until else rows[-1][0]
+    timeline = []
+    bucket_start = first
+    while bucket_start <= last:
+        counts = counts_by_bucket.get(bucket_start, {})
+        timeline.append(
+            {
+                "start": bucket_start,
+                "applications": sum(n for s, n in counts.items() if s in APPLICATION_STATUSES),
+                "responses": sum(n for s, n in counts.items() if s not in APPLICATION_STATUSES),
+                "interviews": sum(n for s, n in counts.items() if s in STAGE_STATUSES["interview_at"]),
+                "counts": counts,
+            }
+        )
+        bucket_start = next_bucket(bucket_start, granularity)
+    return timeline
+
+
+FUNNEL_STAGES = ("assessment", "interview", "offer")
+
+RESPONSE_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def get_funnel(db_session: Session, user_id: str) -> Dict:
+    """
+    Follows each application from its first confirmation email through the
+    assessment, interview and offer stages, in a single query: a window over each
+    application's emails finds when it was applied to, then every later email is
+    checked against the stages. An application reached a stage if it got an email
+    for that stage or any later one. Also returns percentiles of the hours from
+    applying to the first reply that isn't a confirmation.
+    """
+    status = normalized_status()
+    applied_at = (
+        func.min(UserEmails.received_at)
+        .filter(status.in_(APPLICATION_STATUSES))
+        .over(partition_by=UserEmails.application_id)
+    )
+    emails = (
+        with_status(select(
+            UserEmails.application_id,
+            UserEmails.received_at,
+            status.label("status"),
+            applied_at.label("applied_at"),
+        ))
+        .where(
+            UserEmails.user_id == user_id,
+            UserEmails.application_id.is_not(None),
+            JobStatus.status_name != "",
+        )
+        .subquery()
+    )
+
+    after_applying = emails.c.received_at >= emails.c.applied_at
+
+    def first_email(condition):
+        return func.min(emails.c.received_at).filter(after_applying, condition)
+
+    applications = (
+        select(
+            emails.c.application_id,
+            func.min(emails.c.applied_at).label("applied_at"),
+            first_email(emails.c.status.not_in(APPLICATION_STATUSES | {"unknown"})).label("replied_at"),
+            first_email(emails.c.status.in_(STAGE_STATUSES["assessment_at"])).label("assessment_at"),
+            first_email(emails.c.status.in_(STAGE_STATUSES["interview_at"])).label("interview_at"),
+            first_email(emails.c.status.in_(STAGE_STATUSES["offer_at"])).label("offer_at"),
+        )
+        .where(emails.c.applied_at.is_not(None))
+        .group_by(emails.c.application_id)
+        .subquery()
+    )
+
+    def hours_to(column):
+        return sa.cast(func.extract("epoch", column - applications.c.applied_at), sa.Float) / 3600
+
+    reached = {}
+    later_stages = []
+    for stage in reversed(FUNNEL_STAGES):
+        later_stages.append(applications.c[f"{stage}_at"].is_not(None))
+        reached[stage] = func.count().filter(sa.or_(*later_stages))
+
+    row = db_session.exec(
+        select(
+            func.count(),
+            func.count(applications.c.replied_at),
+            *(reached[stage] for stage in FUNNEL_STAGES),
+            *(func.percentile_cont(q).within_group(hours_to(applications.c.replied_at)) for q in RESPONSE_QUANTILES),
+            *(
+                func.percentile_cont(0.5).within_group(hours_to(applications.c[f"{stage}_at"]))
+                for stage in FUNNEL_STAGES
+            ),
+        )
+    ).one()
+
+    applied, replied = row[0], row[1]
+    stage_counts = dict(zip(FUNNEL_STAGES, row[2:5]))
+    response_hours = row[5:5 + len(RESPONSE_QUANTILES)]
+    median_stage_hours = dict(zip(FUNNEL_STAGES, row[5 + len(RESPONSE_QUANTILES):]))
+
+    def rate(count: int, total: int) -> Optional[float]:
+        return round(count / total * 100, 1) if total else None
+
+    stages = [
+        {
+            "stage": "applied",
+            "count": applied,
+            "rate_from_previous": None,
+            "rate_from_applied": rate(applied, applied),
+            "median_hours_from_applied": 0.0 if applied else None,
+        }
+    ]
+    previous = applied
+    for stage in FUNNEL_STAGES:
+        stages.append(
+            {
+                "stage": stage,
+                "count": stage_counts[stage],
+                "rate_from_previous": rate(stage_counts[stage], previous),
+                "rate_from_applied": rate(stage_counts[stage], applied),
+                "median_hours_from_applied": median_stage_hours[stage],
+            }
+        )
+        previous = stage_counts[stage]
+
+    return {
+        "applied": applied,
+        "replied": replied,
+        "reply_rate": rate(replied, applied),
+        "reply_hours": {f"p{round(q * 100)}": hours for q, hours in zip(RESPONSE_QUANTILES, response_hours)},
+        "stages": stages,
+    }
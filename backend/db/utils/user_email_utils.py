@@ -1,12 +1,48 @@
-from db.user_emails import UserEmails
+from db.applications import Applications
+from db.companies import Companies
+from db.job_status import JobStatus
+from db.job_titles import JobTitles
+from db.user_emails import UserEmailData, UserEmails
+from db.utils import dictionary_utils
+from db.utils.company_utils import canonicalize_company_names
+from db.utils.application_utils import assign_applications
 from datetime import datetime, timezone
+import base64
+import binascii
 import email.utils
+import io
+import json
 import logging
-from database import engine
-from sqlmodel import Session, select
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+import database
+from utils import metrics_utils
+from utils.config_utils import get_settings
+import sqlalchemy as sa
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select, desc, func, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+# columns written by copy_user_emails, in COPY order
+COPY_COLUMNS = (
+    "id", "user_id", "company_id", "status_id", "received_at",
+    "subject", "job_title_id", "email_from", "prompt_version", "application_id",
+)
+# fields of user_emails stored in the dictionary tables, selected through the joins of job_emails_query
+DICTIONARY_COLUMNS = {
+    "company_name": Companies.company_name,
+    "application_status": JobStatus.status_name,
+    "job_title": JobTitles.job_title,
+}
+# COPY text format: backslash escapes, tab separated, \N for NULL
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
 def parse_email_date(date_str: str) -> datetime:
     """
     Converts an email date string into a Python datetime object
@@ -22,7 +58,7 @@ def check_email_exists(user_id: str, email_id: str) -> bool:
     """
     Checks if an email with the given emailId and userId exists in the database.
     """
-    with Session(engine) as session:
+    with Session(database.ingest_engine) as session:
         statement = select(UserEmails).where(
             (UserEmails.user_id == user_id) & (UserEmails.id == email_id)
         )
@@ -30,17 +66,228 @@ def check_email_exists(user_id: str, email_id: str) -> bool:
         return result is not None
 
 
-def create_user_email(user, message_data: dict) -> UserEmails:
+def user_emails_query(columns: Optional[List[str]] = None):
+    """
+    Builds a select of the given columns of user_emails (all of UserEmailData's by
+    default), with company_name, application_status and job_title joined in from
+    the dictionary tables.
+    """
+    return select(*(
+        DICTIONARY_COLUMNS[column].label(column) if column in DICTIONARY_COLUMNS else getattr(UserEmails, column)
+        for column in columns or UserEmailData.model_fields
+    )).select_from(UserEmails).join(JobStatus, JobStatus.status_id == UserEmails.status_id).join(
+        Companies, Companies.company_id == UserEmails.company_id
+    ).join(JobTitles, JobTitles.job_title_id == UserEmails.job_title_id)
+
+
+def job_emails_query(
+    user_id: str,
+    status: Optional[str] = None,
+    company: Optional[str] = None,
+    received_after: Optional[datetime] = None,
+    received_before: Optional[datetime] = None,
+    columns: Optional[List[str]] = None,
+):
+    """
+    Builds a newest-first user_emails_query of the user's job-related emails. Emails
+    labeled "unknown" (or with no status) are filtered out in SQL, as are the optional
+    status/company (case-insensitive) and received_at range filters.
+    """
+    statement = user_emails_query(columns).where(
+        UserEmails.user_id == user_id,
+        JobStatus.status_name != "",
+        func.lower(JobStatus.status_name) != "unknown",
+    )
+    if status:
+        statement = statement.where(func.lower(JobStatus.status_name) == status.lower())
+    if company:
+        statement = statement.where(func.lower(Companies.company_name) == company.lower())
+    if received_after:
+        statement = statement.where(UserEmails.received_at >= received_after)
+    if received_before:
+        statement = statement.where(UserEmails.received_at < received_before)
+    return statement.order_by(desc(UserEmails.received_at), desc(UserEmails.id))
+
+
+def job_emails_export_query(user_id: str, columns: List[str]):
+    """
+    Like job_emails_query, with the current state of each email's application added as
+    latest_application_status and application_first_seen (NULL when it has none).
+    """
+    return job_emails_query(user_id, columns=columns).add_columns(
+        Applications.last_status.label("latest_application_status"),
+        Applications.first_seen_at.label("application_first_seen"),
+    ).outerjoin(Applications, (Applications.id == UserEmails.application_id) & Applications.has_known_status)
+
+
+def get_user_emails(db_session: Session, user_id: str) -> List[UserEmailData]:
+    """
+    Returns all of the user's job-related emails, newest first.
+    """
+    return [UserEmailData(**row) for row in db_session.exec(job_emails_query(user_id)).mappings()]
+
+
+def encode_email_cursor(received_at: datetime, email_id: str) -> str:
+    """
+    Encodes the (received_at, id) position of an email as an opaque page cursor.
+    """
+    raw = json.dumps([received_at.isoformat(), email_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_email_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decodes a cursor from encode_email_cursor. Raises ValueError if it is malformed.
+    """
+    try:
+        received_at, email_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(received_at), str(email_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def user_emails_page_query(
+    user_id: str,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[datetime, str]] = None,
+    fields: Optional[List[str]] = None,
+    **filters,
+):
+    """
+    Builds the query for one page of get_user_emails_page, which also selects the
+    received_at and id of every row for the next page's cursor.
+    """
+    columns = list(dict.fromkeys([*(fields or UserEmailData.model_fields), "received_at", "id"]))
+    statement = job_emails_query(user_id, columns=columns, **filters)
+    if after:
+        statement = statement.where(tuple_(UserEmails.received_at, UserEmails.id) < after)
+    if limit is not None:
+        statement = statement.limit(limit + 1)
+    return statement
+
+
+def to_user_emails_page(
+    rows: List, limit: Optional[int] = None, fields: Optional[List[str]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    fields = fields or list(UserEmailData.model_fields)
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_email_cursor(rows[-1]["received_at"], rows[-1]["id"])
+    return [{field: row[field] for field in fields} for row in rows], next_cursor
+
+
+def get_user_emails_page(
+    db_session: Session,
+    user_id: str,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[datetime, str]] = None,
+    fields: Optional[List[str]] = None,
+    **filters,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Returns one page of the user's job-related emails as dicts, newest first, and
+    the cursor for the next page (None on the last page, or when limit is None).
+    Pages are keyed on (received_at, id), with `after` being the decoded cursor of
+    the previous page, so each page costs the same regardless of how deep it is.
+    Only the requested fields are selected when fields is given.
+    """
+    statement = user_emails_page_query(user_id, limit, after, fields, **filters)
+    return to_user_emails_page(db_session.exec(statement).mappings().all(), limit, fields)
+
+
+async def get_user_emails_page_async(
+    db_session: AsyncSession,
+    user_id: str,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[datetime, str]] = None,
+    fields: Optional[List[str]] = None,
+    **filters,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    get_user_emails_page for async routes.
+    """
+    statement = user_emails_page_query(user_id, limit, after, fields, **filters)
+    return to_user_emails_page((await db_session.exec(statement)).mappings().all(), limit, fields)
+
+
+def search_text_query(text: str) -> Optional[str]:
+    """
+    Turns what the user typed into a to_tsquery expression matching emails that contain
+    every word, each as a prefix so results show up while a word is being typed.
+    None if the text has no words.
+    """
+    words = re.findall(r"[^\W_]+", text.lower())
+    return " & ".join(f"{word}:*" for word in words) or None
+
+
+def search_user_emails_query(user_id: str, text_query: str, limit: int, offset: int = 0):
+    """
+    Builds the query for search_user_emails: the user's job-related emails matching
+    the search_text_query, best match first (newest first among equal matches), from
+    the GIN index on search_vector.
+    """
+    query = func.to_tsquery("simple", text_query)
+    columns = list(UserEmailData.model_fields)
+    return (
+        job_emails_query(user_id, columns=columns)
+        .where(UserEmails.search_vector.op("@@")(query))
+        .order_by(None)
+        .order_by(
+            desc(func.ts_rank_cd(UserEmails.search_vector, query)),
+            desc(UserEmails.received_at),
+            desc(UserEmails.id),
+        )
+        .offset(offset)
+        .limit(limit + 1)
+    )
+
+
+def to_search_page(rows: List, limit: int, offset: int) -> Tuple[List[dict], Optional[int]]:
+    next_offset = offset + limit if len(rows) > limit else None
+    return [dict(row) for row in rows[:limit]], next_offset
+
+
+def search_user_emails(
+    db_session: Session, user_id: str, text: str, limit: int, offset: int = 0
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Returns one page of the user's job-related emails whose company, job title, subject
+    or sender match the search text, as dicts, and the offset of the next page (None on
+    the last page).
+    """
+    text_query = search_text_query(text)
+    if text_query is None:
+        return [], None
+    statement = search_user_emails_query(user_id, text_query, limit, offset)
+    return to_search_page(db_session.exec(statement).mappings().all(), limit, offset)
+
+
+async def search_user_emails_async(
+    db_session: AsyncSession, user_id: str, text: str, limit: int, offset: int = 0
+) -> Tuple[List[dict], Optional[int]]:
     """
-    Creates a UserEmail record instance from the provided data.
+    search_user_emails for async routes.
+    """
+    text_query = search_text_query(text)
+    if text_query is None:
+        return [], None
+    statement = search_user_emails_query(user_id, text_query, limit, offset)
+    return to_search_page((await db_session.exec(statement)).mappings().all(), limit, offset)
+
+
+def create_user_email(user, message_data: dict) -> UserEmailData:
+    """
+    Creates an email to pass to store_user_emails from the provided data.
     """
     try:
         received_at_str = message_data["received_at"]
         received_at = parse_email_date(received_at_str)  # parse_email_date function was created as different date formats were being pulled from the data
         if check_email_exists(user.user_id, message_data["id"]):
             logger.info(f"Email with ID {message_data['id']} already exists in the database.")
+            metrics_utils.INGEST_CACHE_HITS.inc()
             return None
-        return UserEmails(
+        return UserEmailData(
             id=message_data["id"],
             user_id=user.user_id,
             company_name=message_data["company_name"],
@@ -48,8 +295,125 @@ def create_user_email(user, message_data: dict) -> UserEmails:
             received_at=received_at,
             subject=message_data["subject"],
             job_title=message_data["job_title"],
-            email_from=message_data["from"]
+            email_from=message_data["from"],
+            prompt_version=message_data.get("prompt_version"),
         )
     except Exception as e:
         logger.error(f"Error creating UserEmail record: {e}")
         return None
+
+
+def copy_text_row(values: Iterable) -> bytes:
+    return ("\t".join(
+        "\\N" if value is None else str(value).translate(COPY_ESCAPES) for value in values
+    ) + "\n").encode()
+
+
+class CopyRowReader(io.RawIOBase):
+    """File-like view of rows in COPY text format, encoded as they are read."""
+
+    def __init__(self, rows: Iterable[Iterable]):
+        super().__init__()
+        self.lines: Iterator[bytes] = (copy_text_row(row) for row in rows)
+        self.buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunks = [self.buffer]
+        size = len(self.buffer)
+        for line in self.lines:
+            chunks.append(line)
+            size += len(line)
+            if size >= len(b):
+                break
+        data = b"".join(chunks)
+        b[:min(len(b), len(data))] = data[:len(b)]
+        self.buffer = data[len(b):]
+        return min(len(b), len(data))
+
+
+def copy_user_emails(db_session: Session, user_emails: Iterable[UserEmailData]) -> set:
+    """
+    Writes the emails with COPY FROM STDIN into a temporary staging table and merges
+    that into user_emails, replacing emails that are already stored. Much cheaper
+    per row than the ORM for large batches; the emails are not added to the session.
+    Returns the ids of the applications the replaced emails belonged to before.
+    """
+    user_emails = dictionary_utils.encode_user_emails(db_session, list(user_emails))
+    connection = db_session.connection()
+    # received_at as timestamptz, so offsets are converted the same way as by the ORM
+    staged_columns = ", ".join(
+        "received_at::timestamptz AS received_at" if column == "received_at" else column for column in COPY_COLUMNS
+    )
+    connection.exec_driver_sql(
+        f"CREATE TEMPORARY TABLE user_emails_staging ON COMMIT DROP AS "
+        f"SELECT {staged_columns} FROM user_emails WITH NO DATA"
+    )
+    rows = ([getattr(user_email, column) for column in COPY_COLUMNS] for user_email in user_emails)
+    with connection.connection.dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY user_emails_staging ({', '.join(COPY_COLUMNS)}) FROM STDIN", CopyRowReader(rows)
+        )
+
+    staging = sa.table("user_emails_staging", *(sa.column(column) for column in COPY_COLUMNS))
+    replaced_application_ids = set(db_session.exec(
+        select(UserEmails.application_id)
+        .join(staging, (UserEmails.user_id == staging.c.user_id) & (UserEmails.id == staging.c.id))
+        .where(UserEmails.application_id.is_not(None))
+        .distinct()
+    ).all())
+    merge = pg_insert(UserEmails).from_select(
+        COPY_COLUMNS,
+        # the last of duplicate emails wins, as one INSERT can't update a row twice
+        select(*(staging.c[column] for column in COPY_COLUMNS))
+        .distinct(staging.c.user_id, staging.c.id)
+        .order_by(staging.c.user_id, staging.c.id, sa.literal_column("ctid").desc()),
+    )
+    db_session.exec(merge.on_conflict_do_update(
+        index_elements=[UserEmails.id, UserEmails.user_id],
+        set_={column: merge.excluded[column] for column in COPY_COLUMNS[2:]},
+    ))
+    connection.exec_driver_sql("DROP TABLE user_emails_staging")
+    return replaced_application_ids
+
+
+def store_user_emails(db_session: Session, user_id: str, user_emails: List[UserEmailData]) -> set:
+    """
+    Stores new emails of the user and assigns them to applications. Returns the ids of
+    the applications to pass to refresh_user_analytics. Company names are canonicalized
+    first (see db/utils/company_utils.py), so spellings of a company share its
+    applications. Batches of at least settings.COPY_MIN_EMAILS emails are written with
+    copy_user_emails.
+    """
+    canonicalize_company_names(db_session, user_emails)
+    application_ids = assign_applications(db_session, user_id, user_emails)
+    if len(user_emails) < settings.COPY_MIN_EMAILS:
+        add_user_emails(db_session, user_emails)
+        return application_ids
+    return application_ids | copy_user_emails(db_session, user_emails)
+
+
+def add_user_emails(db_session: Session, user_emails: List[UserEmailData]) -> None:
+    """
+    Adds new emails to the session as UserEmails rows, as they are, without assigning
+    them to applications.
+    """
+    db_session.add_all(dictionary_utils.encode_user_emails(db_session, user_emails))
+
+
+def update_user_emails(db_session: Session, user_emails: List[UserEmailData]) -> None:
+    """
+    Stores the labels, prompt_version and application_id of emails that are already
+    stored, in one executemany UPDATE by primary key.
+    """
+    if not user_emails:
+        return
+    db_session.execute(update(UserEmails), [
+        {
+            column: getattr(user_email, column)
+            for column in ("id", "user_id", "company_id", "status_id", "job_title_id", "prompt_version", "application_id")
+        }
+        for user_email in dictionary_utils.encode_user_emails(db_session, user_emails)
+    ])
@@ -28,11 +28,11 @@ def user_exists(user) -> Tuple[bool, Optional[datetime]]:
     """
     with Session(engine) as session:
         existing_user = session.exec(select(Users).where(Users.user_id == user.user_id)).first()
-        if not existing_user:
-            return False, None
-        else:
-            last_fetched_date = get_last_email_date(user.user_id)
-            return True, last_fetched_date
+    if not existing_user:
+        return False, None
+    # after the first session is closed, so a login holds one pooled connection at a time
+    last_fetched_date = get_last_email_date(user.user_id)
+    return True, last_fetched_date
 
 def add_user(user, request, start_date=None) -> Users:
     """
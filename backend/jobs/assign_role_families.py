@@ -0,0 +1,53 @@
+"""
+Clusters the job titles that don't have a role family yet (see
+db/utils/job_title_utils.py).
+
+The rollup refreshes after each write cluster the titles of the applications they
+touched, so this is only needed for titles stored before role families existed,
+or to catch up after a failure. Titles are assigned in batches, each in its own
+transaction.
+
+Usage, from the backend directory:
+    python -m jobs.assign_role_families [--batch-size N]
+"""
+
+import argparse
+import logging
+
+from sqlmodel import Session, select
+
+import database
+from db.job_titles import JobTitles
+from db.utils.job_title_utils import assign_role_families as assign_title_families
+
+logger = logging.getLogger(__name__)
+
+
+def assign_role_families(batch_size: int = 10_000) -> int:
+    """
+    Assigns the role family of every title without one. Returns the number of titles assigned.
+    """
+    assigned = 0
+    with Session(database.ingest_engine) as db_session:
+        while True:
+            batch = (
+                select(JobTitles.job_title_id)
+                .where(JobTitles.role_family.is_(None))
+                .order_by(JobTitles.job_title_id)
+                .limit(batch_size)
+            )
+            batch_assigned = assign_title_families(db_session, batch.scalar_subquery())
+            db_session.commit()
+            if not batch_assigned:
+                break
+            assigned += batch_assigned
+            logger.info("Assigned role families to %s job titles", assigned)
+    return assigned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-size", type=int, default=10_000, help="titles assigned per transaction")
+    args = parser.parse_args()
+
+    assign_role_families(args.batch_size)
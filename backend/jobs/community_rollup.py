@@ -0,0 +1,85 @@
+"""
+Folds per-user statistics from user_stats into the community-wide quantile
+sketches in community_stats, which /stats/community reads.
+
+Only users whose statistics changed since the last run are touched: their old
+contribution is removed from each sketch and the new one added, so a run costs
+time proportional to the number of changed users. Users with no emails left drop
+out as their values become empty. Deleting a user should go through
+community_utils.remove_user_contribution; if the sketches count more users than
+user_stats does (rows deleted some other way), the run rebuilds them instead.
+Meant to run periodically (e.g. every few minutes from cron); --rebuild recomputes
+the sketches from scratch.
+
+Usage, from the backend directory:
+    python -m jobs.community_rollup [--rebuild]
+"""
+
+import argparse
+import logging
+
+from sqlmodel import Session, func, select, or_
+
+import database
+from db.user_stats import UserStats
+from db.utils.community_utils import COMMUNITY_METRICS, load_sketches, save_sketches
+from utils.config_utils import get_settings
+from utils.sketch_utils import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def rollup_community_stats(rebuild: bool = False) -> int:
+    """
+    Applies the changes in user_stats to the community sketches.
+    Returns the number of users whose contribution changed.
+    """
+    with Session(database.ingest_engine) as db_session:
+        sketches = load_sketches(db_session, for_update=True)
+        if not rebuild:
+            counted_users = db_session.exec(
+                select(*(func.count(getattr(UserStats, counted)) for _, counted in COMMUNITY_METRICS.values()))
+            ).one()
+            if any(sketches[name].count != count for name, count in zip(COMMUNITY_METRICS, counted_users)):
+                logger.warning("Community sketches count users that are gone from user_stats, rebuilding them")
+                rebuild = True
+        statement = select(UserStats)
+        if rebuild:
+            sketches = {name: QuantileSketch(settings.COMMUNITY_SKETCH_ACCURACY) for name in COMMUNITY_METRICS}
+        else:
+            statement = statement.where(
+                or_(
+                    *(
+                        getattr(UserStats, value).is_distinct_from(getattr(UserStats, counted))
+                        for value, counted in COMMUNITY_METRICS.values()
+                    )
+                )
+            )
+
+        changed_users = 0
+        for user_stats in db_session.exec(statement.execution_options(yield_per=1000)):
+            for name, (value, counted) in COMMUNITY_METRICS.items():
+                new_value = getattr(user_stats, value)
+                old_value = None if rebuild else getattr(user_stats, counted)
+                if old_value is not None:
+                    sketches[name].remove(old_value)
+                if new_value is not None:
+                    sketches[name].add(new_value)
+                setattr(user_stats, counted, new_value)
+            changed_users += 1
+
+        save_sketches(db_session, sketches)
+        db_session.commit()
+
+    logger.info("Community stats updated for %s users", changed_users)
+    return changed_users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rebuild", action="store_true", help="recompute the sketches from all users")
+    args = parser.parse_args()
+
+    rollup_community_stats(args.rebuild)
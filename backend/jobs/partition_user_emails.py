@@ -0,0 +1,78 @@
+"""
+Copies the existing rows of user_emails into user_emails_partitioned, between the
+migrations that add the partitioned table (2f6b8d4e1c95) and swap it in
+(d4a7c2e9f316), while the app keeps running.
+
+Rows are copied in primary key order, one short transaction per batch, so ingest
+is never blocked for long. Writes made meanwhile are copied by the trigger the
+first migration added; the copied rows are locked FOR KEY SHARE so they can't be
+deleted between being read and being copied. Rows that are already there are
+skipped, so a run that is stopped can simply be started again.
+
+Usage, from the backend directory:
+    python -m jobs.partition_user_emails [--batch-size N] [--pause-seconds S]
+"""
+
+import argparse
+import logging
+import time
+
+import sqlalchemy as sa
+from sqlmodel import Session
+
+import database
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "id, user_id, company_id, status_id, job_title_id, received_at, subject, email_from, "
+    "prompt_version, application_id"
+)
+
+COPY_BATCH = sa.text(
+    f"""
+    WITH batch AS (
+        SELECT {COLUMNS} FROM user_emails
+        WHERE (id, user_id) > (:id, :user_id)
+        ORDER BY id, user_id
+        LIMIT :batch_size
+        FOR KEY SHARE
+    ), copied AS (
+        INSERT INTO user_emails_partitioned ({COLUMNS})
+        SELECT {COLUMNS} FROM batch
+        ON CONFLICT (id, user_id) DO NOTHING
+    )
+    SELECT id, user_id, (SELECT count(*) FROM batch) FROM batch ORDER BY id DESC, user_id DESC LIMIT 1
+    """
+)
+
+
+def partition_user_emails(batch_size: int = 10000, pause_seconds: float = 0.0) -> int:
+    """Copies every row of user_emails to user_emails_partitioned. Returns the number of rows read."""
+    rows = 0
+    last_id, last_user_id = "", ""
+    started = time.perf_counter()
+    with Session(database.ingest_engine) as db_session:
+        while True:
+            last = db_session.exec(
+                COPY_BATCH, params={"id": last_id, "user_id": last_user_id, "batch_size": batch_size}
+            ).first()
+            db_session.commit()
+            if last is None:
+                break
+            last_id, last_user_id, count = last
+            rows += count
+            logger.info("Copied %s rows to user_emails_partitioned, up to id %s", rows, last_id)
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    logger.info("Copied %s rows to user_emails_partitioned in %.1fs", rows, time.perf_counter() - started)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--pause-seconds", type=float, default=0.0, help="wait between batches to limit the load")
+    args = parser.parse_args()
+
+    partition_user_emails(args.batch_size, args.pause_seconds)
@@ -0,0 +1,46 @@
+"""
+Rebuilds the applications and user_stats rollups from user_emails.
+
+The rollups are kept up to date as emails are written, so this is only needed to
+repair them (e.g. after editing user_emails by hand or changing how they are
+computed). Each user is rebuilt in its own transaction.
+
+Usage, from the backend directory:
+    python -m jobs.rebuild_analytics [--user-id USER_ID]
+"""
+
+import argparse
+import logging
+from typing import Optional
+
+from sqlmodel import Session, select
+
+import database
+from db.users import Users
+from db.utils.application_utils import rebuild_user_analytics
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_analytics(user_id: Optional[str] = None) -> int:
+    """
+    Rebuilds the rollups of one user, or of every user. Returns the number of users rebuilt.
+    """
+    with Session(database.ingest_engine) as db_session:
+        user_ids = [user_id] if user_id else db_session.exec(select(Users.user_id)).all()
+        for rebuild_user_id in user_ids:
+            user_stats = rebuild_user_analytics(db_session, rebuild_user_id)
+            db_session.commit()
+            logger.info(
+                "user_id:%s rebuilt analytics, %s applications from %s emails",
+                rebuild_user_id, user_stats.application_count, user_stats.email_count,
+            )
+        return len(user_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--user-id", help="only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    rebuild_analytics(args.user_id)
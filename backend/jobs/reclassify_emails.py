@@ -0,0 +1,209 @@
+"""
+Re-labels stored emails that were labeled with an older version of the prompt in
+utils/llm_utils.py, without fetching anything from Gmail.
+
+Progress is tracked per user in reclassification_task_runs. Emails are only marked
+as up to date once they have been re-labeled, so a run that is stopped (or runs out
+of budget) can simply be started again and continues where it left off.
+
+Usage, from the backend directory:
+    python -m jobs.reclassify_emails [--user-id USER_ID] [--max-llm-calls N] [--batch-size N]
+"""
+
+import argparse
+import logging
+from typing import List, Optional
+
+import sqlalchemy as sa
+from sqlmodel import Session, select, func, or_
+
+import database
+from db.user_emails import UserEmailData, UserEmails
+from db.users import Users
+from db.reclassification_tasks import ReclassificationRuns, STARTED, FINISHED
+from db.utils.application_utils import assign_applications, refresh_user_analytics
+from db.utils.company_utils import canonicalize_company_names
+from db.utils.user_email_utils import update_user_emails, user_emails_query
+from utils.config_utils import get_settings
+from utils import llm_utils
+from utils.llm_utils import PROMPT_VERSION, process_emails_batch
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def is_stale():
+    """SQL condition matching emails labeled with an older prompt version."""
+    return or_(
+        UserEmails.prompt_version.is_(None),
+        UserEmails.prompt_version < PROMPT_VERSION,
+    )
+
+
+def get_email_text(user_email: UserEmailData) -> str:
+    """
+    The email bodies are not stored, so the subject and sender stand in for the
+    email text when re-labeling.
+    """
+    return f"{user_email.subject}\nFrom: {user_email.email_from}"
+
+
+def is_known(value: Optional[str]) -> bool:
+    return bool(value) and value.strip().lower() != "unknown"
+
+
+def apply_result(user_email: UserEmailData, result: dict) -> bool:
+    """
+    Stores the new labels of an email, unless they say less than the current ones.
+    The stored text is much shorter than the email the labels came from, so a result
+    without a status or company (including a false positive) leaves the email as it
+    is. Returns whether the labels were changed.
+    """
+    user_email.prompt_version = PROMPT_VERSION
+    status = (result.get("job_application_status") or "").strip()
+    if not is_known(status) or status.lower() == "false positive" or not is_known(result.get("company_name")):
+        return False
+    user_email.application_status = status
+    user_email.company_name = result["company_name"]
+    # keep the title we already know when the model can't find one in the text
+    if is_known(result.get("job_title")):
+        user_email.job_title = result["job_title"]
+    return True
+
+
+def get_users_with_stale_emails(db_session: Session) -> List[str]:
+    statement = (
+        select(UserEmails.user_id)
+        .join(Users, Users.user_id == UserEmails.user_id)
+        .where(is_stale())
+        .distinct()
+    )
+    return list(db_session.exec(statement).all())
+
+
+def start_or_resume_run(db_session: Session, user_id: str) -> ReclassificationRuns:
+    run = db_session.get(ReclassificationRuns, user_id)
+    if run and run.status == STARTED and run.prompt_version == PROMPT_VERSION:
+        logger.info(
+            "user_id:%s resuming re-classification at %s of %s emails",
+            user_id, run.processed_emails, run.total_emails,
+        )
+        return run
+
+    if run is None:
+        run = ReclassificationRuns(user_id=user_id, prompt_version=PROMPT_VERSION, status=STARTED)
+        db_session.add(run)
+    run.prompt_version = PROMPT_VERSION
+    run.status = STARTED
+    run.processed_emails = 0
+    run.llm_calls = 0
+    run.total_emails = db_session.exec(
+        select(func.count())
+        .select_from(UserEmails)
+        .where(UserEmails.user_id == user_id, is_stale())
+    ).one()
+    db_session.commit()
+    return run
+
+
+def reclassify_user_emails(
+    db_session: Session, user_id: str, max_llm_calls: int, batch_size: int
+) -> int:
+    """
+    Re-labels the user's stale emails, oldest first, until they are all done or
+    max_llm_calls is used up. Batches are cut to the calls left, so the budget is
+    never exceeded. Returns the number of model calls that were made.
+    """
+    run = start_or_resume_run(db_session, user_id)
+    calls_at_start = llm_utils.rate_limiter.calls
+    # emails the model failed to label stay stale, the cursor makes sure we
+    # only try each of them once per run
+    cursor = None
+
+    while True:
+        calls_left = max_llm_calls - (llm_utils.rate_limiter.calls - calls_at_start)
+        statement = user_emails_query().where(UserEmails.user_id == user_id, is_stale())
+        if cursor:
+            statement = statement.where(
+                sa.tuple_(UserEmails.received_at, UserEmails.id) > cursor
+            )
+        # a batch takes one call, or one more per email when the model's answer
+        # doesn't match the emails up
+        statement = statement.order_by(UserEmails.received_at, UserEmails.id).limit(
+            min(batch_size, max(calls_left - 1, 1))
+        )
+        batch = [UserEmailData(**row) for row in db_session.exec(statement).mappings()]
+        if not batch:
+            run.status = FINISHED
+            db_session.commit()
+            logger.info("user_id:%s re-classification complete", user_id)
+            break
+        if calls_left <= 0:
+            logger.info("user_id:%s re-classification paused, out of budget", user_id)
+            break
+
+        calls_before_batch = llm_utils.rate_limiter.calls
+        results = process_emails_batch([get_email_text(user_email) for user_email in batch])
+        relabeled = []
+        for user_email, result in zip(batch, results):
+            if not result:
+                logger.warning(
+                    "user_id:%s failed to re-label email with id %s", user_id, user_email.id
+                )
+            elif apply_result(user_email, result):
+                relabeled.append(user_email)
+
+        cursor = (batch[-1].received_at, batch[-1].id)
+        # a re-label can move an email to another application, refresh both
+        touched_applications = {user_email.application_id for user_email in relabeled}
+        canonicalize_company_names(db_session, relabeled)
+        touched_applications |= assign_applications(db_session, user_id, relabeled)
+        # every email of the batch has a new prompt_version
+        update_user_emails(db_session, batch)
+        refresh_user_analytics(db_session, user_id, touched_applications)
+        run.processed_emails += sum(1 for result in results if result)
+        run.llm_calls += llm_utils.rate_limiter.calls - calls_before_batch
+        db_session.commit()
+        logger.info(
+            "user_id:%s re-labeled %s of %s emails",
+            user_id, run.processed_emails, run.total_emails,
+        )
+
+    return llm_utils.rate_limiter.calls - calls_at_start
+
+
+def reclassify_emails(
+    max_llm_calls: int = settings.RECLASSIFY_MAX_LLM_CALLS,
+    batch_size: int = settings.LLM_BATCH_SIZE,
+    user_id: Optional[str] = None,
+) -> int:
+    """
+    Re-labels stale emails for one user, or for every user that has some.
+    Returns the number of model calls that were made.
+    """
+    with Session(database.ingest_engine) as db_session:
+        user_ids = [user_id] if user_id else get_users_with_stale_emails(db_session)
+        logger.info(
+            "Re-classifying emails for %s users with prompt version %s", len(user_ids), PROMPT_VERSION
+        )
+
+        llm_calls = 0
+        for stale_user_id in user_ids:
+            if llm_calls >= max_llm_calls:
+                logger.info("Reached the budget of %s model calls, stopping", max_llm_calls)
+                break
+            llm_calls += reclassify_user_emails(
+                db_session, stale_user_id, max_llm_calls - llm_calls, batch_size
+            )
+        return llm_calls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--user-id", help="only re-label this user's emails")
+    parser.add_argument("--max-llm-calls", type=int, default=settings.RECLASSIFY_MAX_LLM_CALLS)
+    parser.add_argument("--batch-size", type=int, default=settings.LLM_BATCH_SIZE)
+    args = parser.parse_args()
+
+    reclassify_emails(args.max_llm_calls, args.batch_size, args.user_id)
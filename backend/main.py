@@ -16,9 +16,11 @@ from utils.config_utils import get_settings
 from session.session_layer import validate_session
 from contextlib import asynccontextmanager
 from database import create_db_and_tables
+from utils.timing_utils import RequestTimingMiddleware
+from utils.profiling_utils import SamplingProfilerMiddleware
 
 # Import routes
-from routes import email_routes, auth_routes, file_routes, users_routes, start_date_routes
+from routes import email_routes, auth_routes, file_routes, users_routes, start_date_routes, metrics_routes, stats_routes
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -37,6 +39,8 @@ app.include_router(email_routes.router)
 app.include_router(file_routes.router)
 app.include_router(users_routes.router)
 app.include_router(start_date_routes.router)
+app.include_router(metrics_routes.router)
+app.include_router(stats_routes.router)
 
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter  # Ensure limiter is assigned
@@ -63,6 +67,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor", "X-Next-Offset"],  # /get-emails and /search-emails pagination
 )
 
 app.add_middleware(
@@ -71,8 +76,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor", "X-Next-Offset"],  # /get-emails and /search-emails pagination
 )
 
+# Record per-route latency and database time, added last so it times the whole request
+if settings.PROFILING_SAMPLE_RATE > 0:
+    app.add_middleware(SamplingProfilerMiddleware)
+app.add_middleware(RequestTimingMiddleware)
+
 # Set up Jinja2 templates
 templates = Jinja2Templates(directory="templates")
 
@@ -0,0 +1,107 @@
+"""
+Throwaway benchmark users: creating a synthetic account directly in the database,
+and removing everything stored for a user afterwards.
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlmodel import Session, delete
+
+from db.applications import Applications
+from db.processing_tasks import TaskRuns
+from db.reclassification_tasks import ReclassificationRuns
+from db.user_emails import UserEmailData, UserEmails
+from db.user_stats import UserStats
+from db.users import Users
+from db.utils.community_utils import remove_user_contribution
+from db.utils.user_email_utils import copy_user_emails
+from perf.fake_gmail import COMPANIES, JOB_TITLES, USER_EMAIL
+from utils.normalization_utils import normalize_company_name, normalize_job_title
+
+# (status, probability that an application gets it, days after applying)
+APPLICATION_STEPS = [
+    ("Assessment sent", 0.2, 5),
+    ("Interview invitation", 0.15, 10),
+    ("Offer made", 0.03, 25),
+    ("Rejection", 0.5, 14),
+    ("Information request", 0.1, 3),
+]
+
+
+def create_user(db_session: Session, prefix: str = "benchmark") -> str:
+    user_id = f"{prefix}-{uuid.uuid4().hex[:12]}"
+    db_session.add(Users(user_id=user_id, user_email=USER_EMAIL, start_date="2025-01-01"))
+    db_session.commit()
+    return user_id
+
+
+def delete_user(db_session: Session, user_id: str) -> None:
+    """Removes the user and every row that references them."""
+    user_stats = db_session.get(UserStats, user_id)
+    if user_stats is not None:
+        remove_user_contribution(db_session, user_stats)
+    for model in (UserEmails, Applications, UserStats, TaskRuns, ReclassificationRuns):
+        db_session.exec(delete(model).where(model.user_id == user_id))
+    db_session.exec(delete(Users).where(Users.user_id == user_id))
+    db_session.commit()
+
+
+def create_synthetic_account(
+    db_session: Session, num_emails: int, seed: int = 0, start: Optional[datetime] = None, chunk_size: int = 10_000
+) -> str:
+    """
+    Creates a user with about num_emails labeled emails spread over a year, grouped
+    into applications the way ingestion would (application_id set, but the
+    applications rollup columns left for rebuild_user_analytics to fill in).
+    Returns the new user's id.
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2025, 1, 1)
+    user_id = create_user(db_session)
+
+    emails = []
+    applications = []
+    while len(emails) < num_emails:
+        index = len(applications)
+        company = f"{rng.choice(COMPANIES)} {index // len(JOB_TITLES)}"
+        title = JOB_TITLES[index % len(JOB_TITLES)]
+        applied_at = start + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        applications.append(
+            Applications(
+                user_id=user_id,
+                company_key=normalize_company_name(company),
+                title_key=normalize_job_title(title),
+                company_name=company,
+                job_title=title,
+            )
+        )
+        steps = [("Application confirmation", 0)] + [
+            (status, days) for status, probability, days in APPLICATION_STEPS if rng.random() < probability
+        ]
+        for status, days in steps:
+            emails.append(
+                {
+                    "id": f"{user_id}-{len(emails)}",
+                    "user_id": user_id,
+                    "company_name": company,
+                    "application_status": status,
+                    "received_at": applied_at + timedelta(days=days, minutes=rng.randrange(24 * 60)),
+                    "subject": f"{status}: {title} at {company}",
+                    "job_title": title,
+                    "email_from": f"jobs@{company.split()[0].lower()}.example.com",
+                    "application": index,
+                }
+            )
+
+    # inserted in batches, with the generated ids returned
+    db_session.add_all(applications)
+    db_session.flush()
+    for email in emails:
+        email["application_id"] = applications[email.pop("application")].id
+    for offset in range(0, len(emails), chunk_size):
+        copy_user_emails(db_session, [UserEmailData(**email) for email in emails[offset:offset + chunk_size]])
+    db_session.commit()
+    return user_id
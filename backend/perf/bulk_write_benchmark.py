@@ -0,0 +1,80 @@
+"""
+Throughput benchmark of writing new emails to user_emails: the ORM (encoded rows
+added with add_all and a flush) against copy_user_emails (COPY into a staging table and a merge), at a few
+batch sizes. Runs against the database configured in .env, as a throwaway user
+that is removed afterwards.
+
+Usage, from the backend directory:
+    python -m perf.bulk_write_benchmark [--batch-sizes 100,500,1000,10000,100000]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+from sqlmodel import Session, delete
+
+import database
+from db.user_emails import UserEmailData, UserEmails
+from db.utils import dictionary_utils
+from db.utils.user_email_utils import copy_user_emails
+from perf.accounts import create_user, delete_user
+from perf.fake_gmail import COMPANIES, JOB_TITLES
+
+
+def make_emails(user_id: str, count: int, prefix: str) -> List[UserEmailData]:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        UserEmailData(
+            id=f"{prefix}-{index}",
+            user_id=user_id,
+            company_name=COMPANIES[index % len(COMPANIES)],
+            application_status="Application confirmation",
+            received_at=start + timedelta(minutes=index),
+            subject=f"Thanks for applying to {COMPANIES[index % len(COMPANIES)]}",
+            job_title=JOB_TITLES[index % len(JOB_TITLES)],
+            email_from="jobs@example.com",
+            prompt_version=1,
+        )
+        for index in range(count)
+    ]
+
+
+def orm_write(db_session: Session, user_emails: List[UserEmailData]) -> None:
+    db_session.add_all(dictionary_utils.encode_user_emails(db_session, user_emails))
+    db_session.flush()
+
+
+def rows_per_second(db_session: Session, user_id: str, count: int, write: Callable) -> float:
+    user_emails = make_emails(user_id, count, write.__name__)
+    started = time.perf_counter()
+    write(db_session, user_emails)
+    db_session.commit()
+    elapsed = time.perf_counter() - started
+    db_session.exec(delete(UserEmails).where(UserEmails.user_id == user_id))
+    db_session.commit()
+    db_session.expunge_all()
+    return count / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-sizes", default="100,500,1000,10000,100000")
+    args = parser.parse_args()
+
+    database.create_db_and_tables()
+    with Session(database.ingest_engine) as db_session:
+        user_id = create_user(db_session)
+        try:
+            print(f"{'emails':>8} {'ORM rows/s':>12} {'COPY rows/s':>12}")
+            for count in (int(size) for size in args.batch_sizes.split(",")):
+                orm = rows_per_second(db_session, user_id, count, orm_write)
+                copy = rows_per_second(db_session, user_id, count, copy_user_emails)
+                print(f"{count:>8} {orm:>12,.0f} {copy:>12,.0f}")
+        finally:
+            delete_user(db_session, user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+An in-memory stand-in for the Gmail API client returned by
+googleapiclient.discovery.build("gmail", "v1", ...), backed by a synthetic mailbox.
+
+Only the calls the app makes are implemented:
+    service.users().messages().list(...).execute()
+    service.users().messages().get(..., format="raw").execute()
+    service.users().history().list(...).execute()
+    service.new_batch_http_request(callback=...)
+"""
+
+import base64
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+from typing import Callable, Dict, List, Optional
+
+COMPANIES = [
+    "Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises",
+    "Wonka", "Tyrell", "Cyberdyne", "Soylent", "Vandelay Industries", "Pied Piper", "Massive Dynamic",
+]
+JOB_TITLES = [
+    "Software Engineer", "Senior Software Engineer", "Data Scientist", "Product Manager",
+    "Backend Engineer", "Frontend Engineer", "Engineering Manager", "Data Engineer",
+]
+# (subject template, body template), picked at random for each message
+TEMPLATES = [
+    ("Thank you for applying to {company}",
+     "We have received your application for the {title} position at {company}."),
+    ("Your application to {company}",
+     "Unfortunately we will not be proceeding with your application for {title}."),
+    ("Interview invitation: {title} at {company}",
+     "We would like to invite you to interview for the {title} role at {company}."),
+    ("{company} - availability for a call",
+     "Please let us know your availability for a call about the {title} role."),
+    ("Your {company} coding challenge",
+     "Please complete the attached assessment for the {title} position."),
+    ("{company} newsletter",
+     "Join us for our annual conference! This is our monthly newsletter."),
+]
+USER_EMAIL = "jobseeker@example.com"
+
+
+class SyntheticMailbox:
+    """
+    A deterministic mailbox of `size` job search emails.
+    Messages are built on demand from their index, so even very large mailboxes
+    only hold their ids in memory.
+
+    attachment_ratio: fraction of messages with a PDF attachment of attachment_kb
+    html_ratio: fraction of messages with an HTML part
+    html_kb: approximate size of each HTML part, to simulate heavy marketing markup
+    """
+
+    def __init__(
+        self,
+        size: int,
+        attachment_ratio: float = 0.1,
+        attachment_kb: int = 50,
+        html_ratio: float = 0.8,
+        html_kb: int = 20,
+        seed: int = 0,
+        user_email: str = USER_EMAIL,
+    ):
+        self.size = size
+        self.attachment_ratio = attachment_ratio
+        self.attachment_kb = attachment_kb
+        self.html_ratio = html_ratio
+        self.html_kb = html_kb
+        self.seed = seed
+        self.user_email = user_email
+        self.start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        # newest first, like Gmail
+        self.message_ids = [self.message_id(index) for index in reversed(range(size))]
+
+    def message_id(self, index: int) -> str:
+        return f"{self.seed:04x}{index:012x}"
+
+    def index(self, message_id: str) -> int:
+        return int(message_id[4:], 16)
+
+    def history_id(self, index: int) -> str:
+        return str(1000 + index)
+
+    def build_message(self, message_id: str) -> dict:
+        """Returns the message in the shape of a messages().get(format="raw") response."""
+        index = self.index(message_id)
+        if not 0 <= index < self.size:
+            raise KeyError(message_id)
+        rng = random.Random(self.seed * 1_000_003 + index)
+        company = rng.choice(COMPANIES)
+        title = rng.choice(JOB_TITLES)
+        subject, body = rng.choice(TEMPLATES)
+
+        mime_msg = EmailMessage()
+        mime_msg["From"] = f"{company} Recruiting <no-reply@{company.lower().replace(' ', '')}.com>"
+        mime_msg["To"] = self.user_email
+        mime_msg["Subject"] = subject.format(company=company, title=title)
+        mime_msg["Date"] = format_datetime(self.start + timedelta(minutes=17 * index))
+        text = body.format(company=company, title=title)
+        mime_msg.set_content(text)
+        if rng.random() < self.html_ratio:
+            filler = "<td style=\"padding:0 8px;font-family:Arial\">&nbsp;</td>" * (self.html_kb * 20)
+            mime_msg.add_alternative(
+                f"<html><body><table><tr>{filler}</tr></table><p>{text}</p></body></html>",
+                subtype="html",
+            )
+        if rng.random() < self.attachment_ratio:
+            mime_msg.add_attachment(
+                rng.randbytes(self.attachment_kb * 1024),
+                maintype="application",
+                subtype="pdf",
+                filename="details.pdf",
+            )
+
+        return {
+            "id": message_id,
+            "threadId": message_id,
+            "historyId": self.history_id(index),
+            "raw": base64.urlsafe_b64encode(mime_msg.as_bytes()).decode("ASCII"),
+        }
+
+
+class FakeRequest:
+    """Mimics googleapiclient.http.HttpRequest: nothing happens until execute()."""
+
+    def __init__(self, service: "FakeGmailService", method: str, handler: Callable[[], dict], **params):
+        self.service = service
+        self.method = method
+        self.params = params
+        self.handler = handler
+
+    def execute(self) -> dict:
+        self.service.record_call(self.method)
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        return self.handler()
+
+
+class FakeBatchHttpRequest:
+    """Mimics googleapiclient.http.BatchHttpRequest."""
+
+    def __init__(self, callback: Optional[Callable] = None):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: FakeRequest, callback: Optional[Callable] = None, request_id: Optional[str] = None):
+        request_id = request_id or str(len(self.requests) + 1)
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self) -> None:
+        for request_id, request, callback in self.requests:
+            response, exception = None, None
+            try:
+                response = request.execute()
+            except Exception as e:
+                exception = e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeMessages:
+    def __init__(self, service: "FakeGmailService"):
+        self.service = service
+
+    def list(self, userId: str, q: Optional[str] = None, pageToken: Optional[str] = None,
+             maxResults: Optional[int] = None, includeSpamTrash: bool = False) -> FakeRequest:
+        # the query is not evaluated, every message in the mailbox matches
+        def handler():
+            mailbox = self.service.mailbox
+            page_size = min(maxResults or self.service.page_size, 500)
+            start = int(pageToken or 0)
+            page = mailbox.message_ids[start:start + page_size]
+            response = {
+                "messages": [{"id": message_id, "threadId": message_id} for message_id in page],
+                "resultSizeEstimate": mailbox.size,
+            }
+            if start + page_size < mailbox.size:
+                response["nextPageToken"] = str(start + page_size)
+            return response
+
+        return FakeRequest(self.service, "messages.list", handler, userId=userId, q=q, pageToken=pageToken)
+
+    def get(self, userId: str, id: str, format: str = "raw") -> FakeRequest:
+        return FakeRequest(
+            self.service, "messages.get", lambda: self.service.mailbox.build_message(id),
+            userId=userId, id=id, format=format,
+        )
+
+
+class FakeHistory:
+    def __init__(self, service: "FakeGmailService"):
+        self.service = service
+
+    def list(self, userId: str, startHistoryId: str, pageToken: Optional[str] = None,
+             maxResults: Optional[int] = None, historyTypes: Optional[List[str]] = None) -> FakeRequest:
+        def handler():
+            mailbox = self.service.mailbox
+            page_size = min(maxResults or self.service.page_size, 500)
+            first_index = max(int(startHistoryId) - 1000 + 1, 0)
+            start = first_index + int(pageToken or 0)
+            end = min(start + page_size, mailbox.size)
+            response = {
+                "history": [
+                    {
+                        "id": mailbox.history_id(index),
+                        "messagesAdded": [
+                            {"message": {"id": mailbox.message_id(index), "threadId": mailbox.message_id(index)}}
+                        ],
+                    }
+                    for index in range(start, end)
+                ],
+                "historyId": mailbox.history_id(mailbox.size - 1),
+            }
+            if end < mailbox.size:
+                response["nextPageToken"] = str(end - first_index)
+            return response
+
+        return FakeRequest(self.service, "history.list", handler, userId=userId, startHistoryId=startHistoryId)
+
+
+class FakeGmailService:
+    """
+    Drop-in replacement for the Gmail service object.
+    latency: seconds each execute() takes, to simulate the network round trip
+    Every call is counted in `calls` and the time of each messages.get is kept in
+    `get_times`, which the benchmark uses to measure per email latency.
+    """
+
+    def __init__(self, mailbox: SyntheticMailbox, page_size: int = 100, latency: float = 0.0):
+        self.mailbox = mailbox
+        self.page_size = page_size
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.get_times: List[float] = []
+        self._lock = threading.Lock()
+
+    def record_call(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if method == "messages.get":
+                self.get_times.append(time.perf_counter())
+
+    def users(self) -> "FakeGmailService":
+        return self
+
+    def messages(self) -> FakeMessages:
+        return FakeMessages(self)
+
+    def history(self) -> FakeHistory:
+        return FakeHistory(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> FakeBatchHttpRequest:
+        return FakeBatchHttpRequest(callback)
@@ -0,0 +1,92 @@
+"""
+An offline stand-in for google.generativeai.GenerativeModel that labels the
+synthetic emails from perf/fake_gmail.py by keyword instead of calling Gemini.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+from perf.fake_gmail import COMPANIES, JOB_TITLES
+
+# first matching keyword wins
+STATUS_KEYWORDS = [
+    ("newsletter", "False positive"),
+    ("conference", "False positive"),
+    ("not be proceeding", "Rejection"),
+    ("invite you to interview", "Interview invitation"),
+    ("availability", "Availability request"),
+    ("assessment", "Assessment sent"),
+    ("received your application", "Application confirmation"),
+]
+BATCH_EMAIL_PATTERN = re.compile(r"^\s*Email \d+:\s*$", re.MULTILINE)
+# longest first, so "Senior Software Engineer" wins over "Software Engineer"
+TITLES_BY_LENGTH = sorted(JOB_TITLES, key=len, reverse=True)
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        candidates_tokens = len(text) // 4
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=candidates_tokens,
+            total_token_count=prompt_tokens + candidates_tokens,
+        )
+
+    def resolve(self) -> None:
+        pass
+
+
+class FakeGenerativeModel:
+    """
+    latency: seconds each generate_content call takes
+    rate_limit_ratio: fraction of calls that fail with a 429, like an exhausted quota
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit_ratio: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.calls = 0
+        self.rate_limited_calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+            rate_limited = self._rng.random() < self.rate_limit_ratio
+            if rate_limited:
+                self.rate_limited_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if rate_limited:
+            raise Exception("429 Resource has been exhausted (e.g. check quota).")
+
+        email_texts = self.get_email_texts(prompt)
+        labels = [self.label(email_text) for email_text in email_texts]
+        answer = labels[0] if len(labels) == 1 and "Email 1:" not in prompt else labels
+        return FakeResponse(f"```json\n{json.dumps(answer)}\n```", prompt_tokens=len(prompt) // 4)
+
+    @staticmethod
+    def get_email_texts(prompt: str) -> List[str]:
+        if BATCH_EMAIL_PATTERN.search(prompt):
+            return BATCH_EMAIL_PATTERN.split(prompt)[1:]
+        return [prompt.rsplit("Email:", 1)[-1]]
+
+    @staticmethod
+    def label(email_text: str) -> dict:
+        lowered = email_text.lower()
+        status = next(
+            (status for keyword, status in STATUS_KEYWORDS if keyword in lowered),
+            "Action required from company",
+        )
+        if status == "False positive":
+            return {"job_application_status": status}
+        company = next((company for company in COMPANIES if company in email_text), "")
+        title = next((title for title in TITLES_BY_LENGTH if title in email_text), "")
+        return {"company_name": company, "job_application_status": status, "job_title": title}
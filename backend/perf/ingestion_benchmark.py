@@ -0,0 +1,160 @@
+"""
+End-to-end throughput benchmark of fetch_emails_to_db, using the offline Gmail and
+Gemini fakes instead of Google's services, or replaying a cassette recorded with
+CASSETTE_MODE=record (see utils/cassette_utils.py). Emails are written to the
+database configured in .env, under throwaway users that are removed afterwards.
+
+Each run happens in its own process, so peak RSS is measured per run.
+
+Usage, from the backend directory:
+    python -m perf.ingestion_benchmark --sizes 100 1000 10000 50000
+    python -m perf.ingestion_benchmark --cassette cassettes/session.jsonl.gz --latency-scale 0
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import resource
+import time
+from types import SimpleNamespace
+from typing import List, Optional
+from unittest import mock
+
+from fastapi import Request
+from sqlmodel import Session
+
+from perf.fake_gmail import FakeGmailService, SyntheticMailbox, USER_EMAIL
+from perf.fake_llm import FakeGenerativeModel
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, values must be sorted."""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def run_ingestion(size: Optional[int], options: dict) -> dict:
+    # imported here so the app (and its settings) is only loaded in the worker process
+    import database
+    from perf.accounts import create_user, delete_user
+    from routes import email_routes
+    from utils import llm_utils
+    from utils.cassette_utils import Cassette, ReplayGmailService, ReplayModel, REPLAY
+
+    logging.getLogger().setLevel(options["log_level"])
+
+    if options["cassette"]:
+        cassette = Cassette(options["cassette"], REPLAY, latency_scale=options["latency_scale"])
+        service = ReplayGmailService(cassette)
+        model = ReplayModel(cassette)
+    else:
+        mailbox = SyntheticMailbox(
+            size,
+            attachment_ratio=options["attachment_ratio"],
+            attachment_kb=options["attachment_kb"],
+            html_ratio=options["html_ratio"],
+            html_kb=options["html_kb"],
+            seed=options["seed"],
+        )
+        service = FakeGmailService(mailbox, latency=options["gmail_latency"])
+        model = FakeGenerativeModel(
+            latency=options["llm_latency"], rate_limit_ratio=options["rate_limit_ratio"], seed=options["seed"]
+        )
+
+    # emails are processed one after the other, so each email takes from the
+    # start of its get_email call until the next one (or the end of the run)
+    get_times = []
+    get_email = email_routes.get_email
+
+    def timed_get_email(*args, **kwargs):
+        get_times.append(time.perf_counter())
+        return get_email(*args, **kwargs)
+
+    database.create_db_and_tables()
+    with Session(database.engine) as db_session:
+        user_id = create_user(db_session)
+
+    user = SimpleNamespace(creds=None, user_id=user_id, user_email=USER_EMAIL)
+    request = Request({"type": "http", "session": {}})
+    try:
+        with (
+            mock.patch.object(email_routes, "build", return_value=service),
+            mock.patch.object(email_routes, "get_email", timed_get_email),
+            mock.patch.object(email_routes.cassette_utils, "get_cassette", return_value=None),
+            mock.patch.object(llm_utils, "model", model),
+            mock.patch.object(llm_utils, "rate_limiter", llm_utils.RateLimiter(0)),
+            mock.patch.object(llm_utils, "RATE_LIMIT_RETRY_DELAY_SECONDS", options["retry_delay"]),
+        ):
+            started = time.perf_counter()
+            email_routes.fetch_emails_to_db(user, request, user_id=user_id)
+            finished = time.perf_counter()
+    finally:
+        with Session(database.engine) as db_session:
+            delete_user(db_session, user_id)
+
+    latencies = sorted(b - a for a, b in zip(get_times, get_times[1:] + [finished]))
+    elapsed = finished - started
+    size = len(get_times)
+    return {
+        "size": size,
+        "seconds": round(elapsed, 3),
+        "emails_per_second": round(size / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "llm_calls": getattr(model, "calls", "-"),
+        "llm_rate_limited": getattr(model, "rate_limited_calls", "-"),
+    }
+
+
+def run_in_worker(size: int, options: dict, results) -> None:
+    results.put(run_ingestion(size, options))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--cassette", help="replay this cassette instead of a synthetic mailbox")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="replayed latency multiplier")
+    parser.add_argument("--attachment-ratio", type=float, default=0.1)
+    parser.add_argument("--attachment-kb", type=int, default=50)
+    parser.add_argument("--html-ratio", type=float, default=0.8)
+    parser.add_argument("--html-kb", type=int, default=20)
+    parser.add_argument("--gmail-latency", type=float, default=0.0, help="seconds per Gmail call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per model call")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="fraction of model calls that get a 429")
+    parser.add_argument("--retry-delay", type=float, default=0.0, help="seconds to back off after a 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per size")
+    args = parser.parse_args()
+    options = {key: value for key, value in vars(args).items() if key not in ("sizes", "json")}
+
+    context = multiprocessing.get_context("spawn")
+    if not args.json:
+        print(f"{'emails':>8} {'seconds':>9} {'emails/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS MB':>12} {'LLM calls':>10} {'429s':>6}")
+    for size in [None] if args.cassette else args.sizes:
+        results = context.Queue()
+        worker = context.Process(target=run_in_worker, args=(size, options, results))
+        worker.start()
+        worker.join()
+        if worker.exitcode != 0:
+            raise SystemExit(f"Benchmark of {size or args.cassette} failed")
+        result = results.get()
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['size']:>8} {result['seconds']:>9} {result['emails_per_second']:>9} "
+                f"{result['p50_ms']:>8} {result['p99_ms']:>8} {result['peak_rss_mb']:>12} "
+                f"{result['llm_calls']:>10} {result['llm_rate_limited']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
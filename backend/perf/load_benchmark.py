@@ -0,0 +1,136 @@
+"""
+Load test of the dashboard's read requests: many concurrent users polling
+/processing and paging through /get-emails against one uvicorn worker, reporting
+p50/p99 latency per route.
+
+The app runs in a separate process on a local port, with sessions and rate
+limits bypassed, against the database configured in .env. All virtual users share one synthetic
+account, created directly in the database and removed afterwards.
+
+Usage, from the backend directory:
+    python -m perf.load_benchmark [--users 200] [--duration 20] [--emails 2000]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import uvicorn
+from sqlmodel import Session
+
+import database
+from db.processing_tasks import TaskRuns, FINISHED
+from perf.accounts import create_synthetic_account, delete_user
+
+# what an open dashboard requests, in order
+DASHBOARD_REQUESTS = [
+    ("/processing", {}),
+    ("/get-emails", {"limit": 100}),
+]
+
+
+def serve(port: int, user_id: str) -> None:
+    # imported here so the app is only loaded in the server process
+    from main import app
+    from routes import email_routes
+    from session.session_layer import validate_session
+
+    app.dependency_overrides[validate_session] = lambda: user_id
+    email_routes.limiter.enabled = False
+    app.state.limiter.enabled = False
+    uvicorn.run(app, port=port, log_level="warning", lifespan="off")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def virtual_user(client: httpx.AsyncClient, deadline: float, latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        for path, params in DASHBOARD_REQUESTS:
+            started = time.perf_counter()
+            try:
+                resp = await client.get(path, params=params)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[path].append(time.perf_counter() - started)
+            else:
+                errors[path] += 1
+
+
+async def run_load(base_url: str, users: int, duration: float):
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(virtual_user(client, deadline, latencies, errors) for _ in range(users)))
+    return latencies, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=0, help="default: any free port")
+    args = parser.parse_args()
+    port = args.port or free_port()
+
+    database.create_db_and_tables()
+    with Session(database.engine) as db_session:
+        user_id = create_synthetic_account(db_session, args.emails)
+        db_session.add(TaskRuns(user_id=user_id, status=FINISHED))
+        db_session.commit()
+        server = multiprocessing.get_context("spawn").Process(target=serve, args=(port, user_id), daemon=True)
+        server.start()
+        try:
+            wait_for_port(port)
+            latencies, errors = asyncio.run(run_load(f"http://127.0.0.1:{port}", args.users, args.duration))
+        finally:
+            server.terminate()
+            server.join()
+            delete_user(db_session, user_id)
+
+    print(f"{args.users} users for {args.duration:.0f}s")
+    print(f"{'route':<14} {'requests':>9} {'errors':>7} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for path, _ in DASHBOARD_REQUESTS:
+        values = latencies[path]
+        if not values:
+            print(f"{path:<14} {0:>9} {errors[path]:>7}")
+            continue
+        print(
+            f"{path:<14} {len(values):>9} {errors[path]:>7} {len(values) / args.duration:>7.0f} "
+            f"{statistics.median(values) * 1000:>8.1f} {percentile(values, 99) * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Per-user query latency with user_emails at tens of millions of rows: other users'
+emails are generated in SQL as filler (kept between runs, so the same filler can
+be measured before and after a schema change), then the queries behind the
+dashboard and ingest are timed for one synthetic account of typical size.
+Runs against the database configured in .env.
+
+Usage, from the backend directory:
+    python -m perf.partition_benchmark [--filler-emails 10000000] [--filler-users 10000] [--emails 2000]
+    python -m perf.partition_benchmark --drop-filler
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List
+
+import sqlalchemy as sa
+from sqlmodel import Session
+
+import database
+from db.utils import dictionary_utils
+from db.utils.application_utils import get_stage_counts, rebuild_user_analytics
+from db.utils.stats_utils import get_funnel, get_timeline
+from db.utils.user_email_utils import check_email_exists, get_user_emails_page, search_user_emails
+from perf.accounts import create_synthetic_account, delete_user
+
+FILLER_PREFIX = "filler-"
+
+
+def create_filler(db_session: Session, emails: int, users: int) -> None:
+    """Adds `users` users with `emails` emails between them, unless they are already there."""
+    existing = db_session.exec(
+        sa.text("SELECT count(*) FROM users WHERE user_id LIKE :prefix"), params={"prefix": f"{FILLER_PREFIX}%"}
+    ).one()[0]
+    if existing:
+        print(f"Using the existing filler of {existing} users")
+        return
+    started = time.perf_counter()
+    company_ids = list(dictionary_utils.companies.ids(db_session, [(f"Filler {i}", "filler.example.com") for i in range(200)]).values())
+    status_ids = list(dictionary_utils.job_statuses.ids(db_session, [("Application confirmation",), ("Rejection",)]).values())
+    title_ids = list(dictionary_utils.job_titles.ids(db_session, [("Software Engineer",)]).values())
+    db_session.exec(
+        sa.text(
+            "INSERT INTO users (user_id, user_email, start_date) "
+            "SELECT :prefix || n, 'filler' || n || '@example.com', '2025-01-01' FROM generate_series(1, :users) n"
+        ),
+        params={"prefix": FILLER_PREFIX, "users": users},
+    )
+    db_session.exec(
+        sa.text(
+            "INSERT INTO user_emails (id, user_id, company_id, status_id, job_title_id, received_at, subject, email_from) "
+            "SELECT 'f' || n, :prefix || (n % :users + 1), (:company_ids)[n % cardinality(:company_ids) + 1], "
+            "(:status_ids)[n % cardinality(:status_ids) + 1], (:title_ids)[1], "
+            "timestamp '2024-01-01' + n * interval '3 seconds', 'Your application', 'jobs@filler.example.com' "
+            "FROM generate_series(1, :emails) n"
+        ),
+        params={
+            "prefix": FILLER_PREFIX, "users": users, "emails": emails,
+            "company_ids": company_ids, "status_ids": status_ids, "title_ids": title_ids,
+        },
+    )
+    db_session.commit()
+    print(f"Created {emails} filler emails for {users} users in {time.perf_counter() - started:.1f}s")
+
+
+def drop_filler(db_session: Session) -> None:
+    db_session.exec(sa.text("DELETE FROM user_emails WHERE user_id LIKE :prefix"), params={"prefix": f"{FILLER_PREFIX}%"})
+    db_session.exec(sa.text("DELETE FROM users WHERE user_id LIKE :prefix"), params={"prefix": f"{FILLER_PREFIX}%"})
+    db_session.commit()
+
+
+def time_query(query: Callable[[], object], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--filler-emails", type=int, default=10_000_000)
+    parser.add_argument("--filler-users", type=int, default=10_000)
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--drop-filler", action="store_true", help="remove the filler and exit")
+    args = parser.parse_args()
+
+    database.create_db_and_tables()
+    with Session(database.engine) as db_session:
+        if args.drop_filler:
+            drop_filler(db_session)
+            return
+        create_filler(db_session, args.filler_emails, args.filler_users)
+        user_id = create_synthetic_account(db_session, args.emails)
+        db_session.exec(sa.text("ANALYZE user_emails, companies, job_titles, job_statuses"))
+        rebuild_user_analytics(db_session, user_id)
+        db_session.commit()
+        try:
+            total, table_bytes = db_session.exec(
+                sa.text(
+                    "SELECT (SELECT count(*) FROM user_emails), "
+                    "sum(pg_total_relation_size(relid)) FROM pg_partition_tree('user_emails')"
+                )
+            ).one()
+            print(f"user_emails: {total} rows, {table_bytes / 2**30:.2f} GiB with indexes")
+            rng = random.Random(0)
+            queries = {
+                "check_email_exists": lambda: check_email_exists(user_id, f"{user_id}-{rng.randrange(args.emails)}"),
+                "emails page (50)": lambda: get_user_emails_page(db_session, user_id, limit=50),
+                "all emails": lambda: get_user_emails_page(db_session, user_id),
+                "timeline (week)": lambda: get_timeline(db_session, user_id, "week"),
+                "funnel": lambda: get_funnel(db_session, user_id),
+                "stage counts": lambda: get_stage_counts(db_session, user_id),
+                # a rare prefix, and a word in nearly every email of every user
+                "search (prefix)": lambda: search_user_emails(db_session, user_id, "hoo", limit=20),
+                "search (common)": lambda: search_user_emails(db_session, user_id, "engineer", limit=20),
+            }
+            print(f"{'query':<20} {'median ms':>10} {'p95 ms':>9}")
+            for name, query in queries.items():
+                query()  # warm up
+                timings = sorted(time_query(query, args.repeat))
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(f"{name:<20} {statistics.median(timings) * 1000:>10.2f} {p95 * 1000:>9.2f}")
+        finally:
+            db_session.rollback()
+            delete_user(db_session, user_id)
+
+
+if __name__ == "__main__":
+    main()
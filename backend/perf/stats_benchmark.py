@@ -0,0 +1,87 @@
+"""
+Latency benchmark of the /stats queries on a large synthetic account, created
+directly in the database configured in .env and removed afterwards.
+
+It also reports the size of user_emails (table and index sizes are only
+meaningful on an otherwise empty database), and for comparison times loading
+every email of the account, which is what computing the same statistics in
+Python would start with.
+
+Usage, from the backend directory:
+    python -m perf.stats_benchmark [--emails 100000] [--repeat 5]
+"""
+
+import argparse
+import logging
+import statistics
+import time
+from typing import Callable, List
+
+import sqlalchemy as sa
+from sqlmodel import Session
+
+import database
+from db.utils.application_utils import rebuild_user_analytics
+from db.utils.stats_utils import get_funnel, get_timeline
+from db.utils.user_email_utils import get_user_emails
+from perf.accounts import create_synthetic_account, delete_user
+
+logger = logging.getLogger(__name__)
+
+
+def time_query(query: Callable[[], object], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--emails", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    database.create_db_and_tables()
+    with Session(database.engine) as db_session:
+        started = time.perf_counter()
+        user_id = create_synthetic_account(db_session, args.emails, seed=args.seed)
+        # as autovacuum would have by the time a real account got this large
+        db_session.exec(sa.text("ANALYZE user_emails, companies, job_titles, job_statuses"))
+        rebuild_user_analytics(db_session, user_id)
+        db_session.commit()
+        print(f"Created {args.emails} emails in {time.perf_counter() - started:.1f}s")
+        try:
+            db_session.exec(sa.text("ANALYZE user_emails"))
+            row_bytes = db_session.exec(
+                sa.text("SELECT sum(pg_column_size(user_emails.*)) FROM user_emails WHERE user_id = :user_id"),
+                params={"user_id": user_id},
+            ).one()[0]
+            table_bytes, index_bytes = db_session.exec(
+                sa.text("SELECT pg_table_size('user_emails'), pg_indexes_size('user_emails')")
+            ).one()
+            print(
+                f"user_emails: {row_bytes / 2**20:.1f} MiB of rows for this user, "
+                f"table {table_bytes / 2**20:.1f} MiB, indexes {index_bytes / 2**20:.1f} MiB"
+            )
+            queries = {
+                "funnel": lambda: get_funnel(db_session, user_id),
+                "timeline (week)": lambda: get_timeline(db_session, user_id, "week"),
+                "timeline (day)": lambda: get_timeline(db_session, user_id, "day"),
+                "rebuild rollups": lambda: rebuild_user_analytics(db_session, user_id),
+                "load all emails": lambda: (get_user_emails(db_session, user_id), db_session.expunge_all()),
+            }
+            print(f"{'query':<18} {'min ms':>9} {'median ms':>10}")
+            for name, query in queries.items():
+                timings = time_query(query, args.repeat)
+                print(f"{name:<18} {min(timings) * 1000:>9.1f} {statistics.median(timings) * 1000:>10.1f}")
+        finally:
+            db_session.rollback()
+            delete_user(db_session, user_id)
+
+
+if __name__ == "__main__":
+    main()
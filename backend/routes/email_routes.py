@@ -1,16 +1,25 @@
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Request, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from sqlmodel import Session, select, desc
+from fastapi import APIRouter, Depends, Request, HTTPException, BackgroundTasks, Query
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, RedirectResponse
+from sqlmodel import Session, select
 from googleapiclient.discovery import build
-from db.user_emails import UserEmails
+from db.user_emails import UserEmailData, UserEmails
 from db import processing_tasks as task_models
-from db.utils.user_email_utils import create_user_email
+from db.utils.application_utils import refresh_user_analytics
+from db.utils.company_utils import company_index
+from db.utils.user_email_utils import (
+    create_user_email,
+    decode_email_cursor,
+    get_user_emails_page_async,
+    search_user_emails_async,
+    store_user_emails,
+)
 from utils.auth_utils import AuthenticatedUser
 from utils.email_utils import get_email_ids, get_email
-from utils.llm_utils import process_email
+from utils.llm_utils import process_email_with_rules, PROMPT_VERSION
 from utils.config_utils import get_settings
+from utils import cassette_utils, metrics_utils
 from session.session_layer import validate_session
 import database
 from google.oauth2.credentials import Credentials
@@ -36,13 +45,13 @@ SECONDS_BETWEEN_FETCHING_EMAILS = 1 * 60 * 60  # 1 hour
 router = APIRouter()
 
 @router.get("/processing", response_class=HTMLResponse)
-async def processing(request: Request, db_session: database.DBSession, user_id: str = Depends(validate_session)):
+async def processing(request: Request, db_session: database.AsyncDBSession, user_id: str = Depends(validate_session)):
     logging.info("user_id:%s processing", user_id)
     if not user_id:
         logger.info("user_id: not found, redirecting to login")
         return RedirectResponse("/logout", status_code=303)
 
-    process_task_run: task_models.TaskRuns = db_session.get(task_models.TaskRuns, user_id)
+    process_task_run: task_models.TaskRuns = await db_session.get(task_models.TaskRuns, user_id)
 
     if process_task_run is None:
         raise HTTPException(
@@ -69,32 +78,102 @@ async def processing(request: Request, db_session: database.DBSession, user_id:
         )
 
 
-@router.get("/get-emails", response_model=List[UserEmails])
+EMAIL_PAGE_SIZE_DEFAULT = 100
+EMAIL_PAGE_SIZE_MAX = 500
+
+
+@router.get("/get-emails", response_model=List[UserEmailData])
 @limiter.limit("5/minute")
-def query_emails(request: Request, db_session: database.DBSession, user_id: str = Depends(validate_session)) -> None:
+async def query_emails(
+    request: Request,
+    db_session: database.AsyncDBSession,
+    user_id: str = Depends(validate_session),
+    limit: Optional[int] = Query(None, ge=1, le=EMAIL_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status: Optional[str] = None,
+    company: Optional[str] = None,
+    received_after: Optional[datetime] = None,
+    received_before: Optional[datetime] = None,
+) -> ORJSONResponse:
+    """
+    Returns the user's job-related emails, newest first, optionally filtered by
+    status, company and received_at range. Pass `fields` (comma separated) to
+    return only those columns. Pass `limit` to paginate: the cursor for the next
+    page is returned in the X-Next-Cursor header and passed back as `cursor`, with
+    pages of 100 if `limit` isn't passed again. Without `limit` or `cursor` the full
+    history is returned, which the dashboard still relies on.
+    """
+    selected_fields = None
+    if fields:
+        selected_fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown_fields = set(selected_fields) - set(UserEmailData.model_fields)
+        if unknown_fields:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}")
+    after = None
+    if cursor:
+        try:
+            after = decode_email_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        limit = limit or EMAIL_PAGE_SIZE_DEFAULT
+
     try:
         logger.info(f"Fetching emails for user_id: {user_id}")
 
-        # Query emails sorted by date (newest first)
-        statement = select(UserEmails).where(UserEmails.user_id == user_id).order_by(desc(UserEmails.received_at))
-        user_emails = db_session.exec(statement).all()
-
-        # Filter out records with "unknown" application status
-        filtered_emails = [
-            email for email in user_emails 
-            if email.application_status and email.application_status.lower() != "unknown"
-        ]
+        user_emails, next_cursor = await get_user_emails_page_async(
+            db_session,
+            user_id,
+            limit=limit,
+            after=after,
+            fields=selected_fields,
+            status=status,
+            company=company,
+            received_after=received_after,
+            received_before=received_before,
+        )
 
-        logger.info(f"Found {len(user_emails)} total emails, returning {len(filtered_emails)} after filtering out 'unknown' status")
-        return filtered_emails  # Return filtered list
+        logger.info(f"Returning {len(user_emails)} emails after filtering out 'unknown' status")
+        # rows are plain dicts, serialized by orjson without building a model per row
+        response = ORJSONResponse(content=user_emails)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
 
     except Exception as e:
         logger.error(f"Error fetching emails for user_id {user_id}: {e}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
-        
 
+
+EMAIL_SEARCH_PAGE_SIZE_MAX = 100
+
+
+@router.get("/search-emails", response_model=List[UserEmailData])
+@limiter.limit("60/minute")
+async def search_emails(
+    request: Request,
+    db_session: database.AsyncDBSession,
+    user_id: str = Depends(validate_session),
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=EMAIL_SEARCH_PAGE_SIZE_MAX),
+    offset: int = Query(0, ge=0),
+) -> ORJSONResponse:
+    """
+    Returns the user's job-related emails whose company, job title, subject or sender
+    contain every word of `q` (as a prefix, so partial words match), best match
+    first. The offset of the next page is returned in the X-Next-Offset header.
+    """
+    logger.info("user_id:%s searching emails", user_id)
+    user_emails, next_offset = await search_user_emails_async(db_session, user_id, q, limit, offset)
+    response = ORJSONResponse(content=user_emails)
+    if next_offset is not None:
+        response.headers["X-Next-Offset"] = str(next_offset)
+    return response
+
+
+# Sync, so its queries and the rollup refresh run in the threadpool
 @router.delete("/delete-email/{email_id}")
-async def delete_email(request: Request, db_session: database.DBSession, email_id: str, user_id: str = Depends(validate_session)):
+def delete_email(request: Request, db_session: database.DBSession, email_id: str, user_id: str = Depends(validate_session)):
     """
     Delete an email record by its ID for the authenticated user.
     """
@@ -115,6 +194,7 @@ async def delete_email(request: Request, db_session: database.DBSession, email_i
         # Delete the email record
         db_session.delete(email_record)
         db_session.flush()
+        refresh_user_analytics(db_session, user_id, [email_record.application_id])
 
         logger.info(f"Email with id {email_id} deleted successfully for user_id {user_id}")
         return {"message": "Item deleted successfully"}
@@ -162,7 +242,11 @@ async def start_fetch_emails(
 def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated: Optional[datetime] = None, *, user_id: str) -> None:
     logger.info(f"Fetching emails to db for user_id: {user_id}")
 
-    with Session(database.engine) as db_session:
+    with (
+        Session(database.ingest_engine) as db_session,
+        metrics_utils.INGEST_RUNS_IN_FLIGHT.track_in_progress(),
+        metrics_utils.collect_run() as run_metrics,
+    ):
         # we track starting and finishing fetching of emails for each user
         process_task_run = (
             db_session.query(task_models.TaskRuns).filter_by(user_id=user_id).one_or_none()
@@ -212,7 +296,7 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
                 f"user_id:{user_id} Fetching all emails (no last_date maybe with start date)"
             )
 
-        service = build("gmail", "v1", credentials=user.creds)
+        service = cassette_utils.gmail_service(lambda: build("gmail", "v1", credentials=user.creds))
 
         messages = get_email_ids(
             query=query, gmail_instance=service
@@ -224,6 +308,7 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
             logger.info(f"user_id:{user_id} No job application emails found.")
             process_task_run = db_session.get(task_models.TaskRuns, user_id)
             process_task_run.status = task_models.FINISHED
+            process_task_run.metrics_summary = run_metrics.summary()
             db_session.commit()
             return
 
@@ -232,6 +317,8 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
         db_session.commit()
 
         email_records = []  # list to collect email records
+        # the companies known for sender domains, used by the extraction rules
+        company_index.refresh(db_session)
 
         for idx, message in enumerate(messages):
             message_data = {}
@@ -241,13 +328,17 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
                 f"user_id:{user_id} begin processing for email {idx + 1} of {len(messages)} with id {msg_id}"
             )
             process_task_run.processed_emails = idx + 1
-            db_session.commit()
+            with metrics_utils.stage("db_write"):
+                db_session.commit()
 
             msg = get_email(message_id=msg_id, gmail_instance=service, user_email=user.user_email)
+            metrics_utils.INGEST_EMAILS.inc()
 
             if msg:
                 try:
-                    result = process_email(msg["text_content"])
+                    result = process_email_with_rules(
+                        msg["subject"], msg["from"], msg["text_content"], company_index.company_for_domain
+                    )
                     # if values are empty strings or null, set them to "unknown"
                     for key in result.keys():
                         if not result[key]:
@@ -265,6 +356,7 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
                         logger.info(
                             f"user_id:{user_id} email {idx + 1} of {len(messages)} with id {msg_id} is a false positive, not related to job search"
                         )
+                        metrics_utils.INGEST_FALSE_POSITIVES.inc()
                         continue  # skip this email if it's a false positive
                 else:  # processing returned unknown which is also likely false positive
                     logger.warning(
@@ -280,6 +372,7 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
                     "subject": msg.get("subject", "unknown"),
                     "job_title": result.get("job_title", "unknown"),
                     "from": msg.get("from", "unknown"),
+                    "prompt_version": PROMPT_VERSION,
                 }
                 email_record = create_user_email(user, message_data)
                 if email_record:
@@ -287,12 +380,16 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
 
         # batch insert all records at once
         if email_records:
-            db_session.add_all(email_records)
+            with metrics_utils.stage("db_write"):
+                application_ids = store_user_emails(db_session, user_id, email_records)
+                refresh_user_analytics(db_session, user_id, application_ids)
+                db_session.commit()
             logger.info(
                 f"Added {len(email_records)} email records for user {user_id}"
             )
 
         process_task_run.status = task_models.FINISHED
+        process_task_run.metrics_summary = run_metrics.summary()
         db_session.commit()
 
-        logger.info(f"user_id:{user_id} Email fetching complete.")
+        logger.info(f"user_id:{user_id} Email fetching complete. {process_task_run.metrics_summary}")
@@ -1,16 +1,20 @@
 import csv
-import os
+import io
 import logging
-import plotly.graph_objects as go
-from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import FileResponse, RedirectResponse
+from typing import Iterator, Literal
+from fastapi import APIRouter, HTTPException, Request, Response, Depends
+from fastapi.responses import RedirectResponse, StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from sqlmodel import Session
 import database
-from utils.file_utils import get_user_filepath
 from session.session_layer import validate_session
-from routes.email_routes import query_emails
+from db.user_emails import UserEmailData
+from db.utils.application_utils import get_stage_counts
+from db.utils.user_email_utils import job_emails_export_query, job_emails_query
 from utils.config_utils import get_settings
+from utils.export_utils import EXPORT_FORMATS, EXPORT_TYPES, export_chunks
+from utils.sankey_utils import SANKEY_FORMATS, render_sankey
 
 settings = get_settings()
 
@@ -21,37 +25,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
 
-@router.get("/download-file")
-async def download_file(request: Request, user_id: str = Depends(validate_session)):
-    if not user_id:
-        return RedirectResponse("/logout", status_code=303)
-    directory = get_user_filepath(user_id)
-    filename = "emails.csv"
-    filepath = f"{directory}/{filename}"
-    if os.path.exists(filepath):
-        logger.info("user_id:%s downloading from filepath %s", user_id, filepath)
-        return FileResponse(filepath)
-    raise HTTPException(status_code=400, detail="File not found")
-
+# Emails fetched per round trip while streaming the CSV export
+CSV_BATCH_SIZE = 1000
+# Rows per record batch (and Parquet row group) of the typed exports
+EXPORT_BATCH_SIZE = 10000
 
-# Write and download csv
-@router.get("/process-csv")
-@limiter.limit("2/minute")
-async def process_csv(request: Request, db_session: database.DBSession, user_id: str = Depends(validate_session)):
-    if not user_id:
-        return RedirectResponse("/logout", status_code=303)
-
-    directory = get_user_filepath(user_id)
-    filename = "emails.csv"
-    filepath = os.path.join(directory, filename)
-    
-    # Get job related email data from DB
-    emails = query_emails(request, db_session=db_session, user_id=user_id)
-    if not emails:
-        raise HTTPException(status_code=400, detail="No data found to write")
-    # Ensure the directory exists
-    os.makedirs(directory, exist_ok=True)
 
+def csv_field_mapping() -> dict:
     # Key: DB field name; Value: Human-readable field name
     field_mapping = {
         "company_name": "Company Name",
@@ -61,106 +41,130 @@ async def process_csv(request: Request, db_session: database.DBSession, user_id:
         "subject": "Subject",
         "email_from": "Sender"
     }
-
     if not settings.is_publicly_deployed:
         logger.info("DEBUG: Adding message id to output")
         field_mapping.update({"id": "Message ID"})
+    return field_mapping
+
+
+def email_csv_chunks(user_id: str, field_mapping: dict) -> Iterator[str]:
+    """
+    Yields the CSV export of the user's emails a batch of rows at a time. Rows are
+    read through a server-side cursor, so memory use doesn't grow with the number
+    of emails. Opens its own session, since the request's is closed before the
+    response body is sent.
+    """
+    # the same columns as the file this used to write; application-level fields are in /export
+    statement = job_emails_query(user_id, columns=list(field_mapping)).execution_options(yield_per=CSV_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(field_mapping.values())
+    with Session(database.read_engine()) as db_session:
+        for rows in db_session.exec(statement).partitions():
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def check_has_emails(db_session: Session, user_id: str) -> None:
+    if db_session.exec(job_emails_query(user_id, columns=["id"]).limit(1)).first() is None:
+        raise HTTPException(status_code=400, detail="No data found to write")
 
-    selected_fields = list(field_mapping.keys())
-    headers = list(field_mapping.values())
-
-    # Filter out unwanted fields
-    processed_emails = [
-        {key: value for key, value in email if key in selected_fields} for email in emails
-    ]
-
-    # Write to CSV
-    with open(filepath, mode="w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(headers)
-        for row in processed_emails:
-            writer.writerow([row[field] for field in selected_fields])
-
-    logger.info("CSV file created at %s", filepath)
-    
-    # Download CSV
-    if os.path.exists(filepath):
-        logger.info("user_id:%s downloading from filepath %s", user_id, filepath)
-        return FileResponse(filepath)
-    
-    # File not found error
-    raise HTTPException(status_code=400, detail="File not found")
-
-
-# Write and download sankey diagram
+
+def email_csv_response(db_session: Session, user_id: str) -> StreamingResponse:
+    check_has_emails(db_session, user_id)
+    logger.info("user_id:%s streaming emails csv", user_id)
+    return StreamingResponse(
+        email_csv_chunks(user_id, csv_field_mapping()),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=emails.csv"},
+    )
+
+
+def email_export_chunks(user_id: str, export_format: str) -> Iterator[bytes]:
+    """
+    Yields a typed export of the user's emails, one record batch per EXPORT_BATCH_SIZE
+    rows of a server-side cursor.
+    """
+    email_fields = [field for field in EXPORT_TYPES if field in UserEmailData.model_fields]
+    if settings.is_publicly_deployed:
+        # as in the CSV, message ids are only exported in development
+        email_fields.remove("id")
+    statement = job_emails_export_query(user_id, email_fields).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    fields = email_fields + ["latest_application_status", "application_first_seen"]
+    with Session(database.read_engine()) as db_session:
+        yield from export_chunks(db_session.exec(statement).partitions(), export_format, fields)
+
+
+# Same export as /process-csv, kept for existing clients; nothing is stored on disk anymore
+@router.get("/download-file")
+@limiter.limit("2/minute")
+def download_file(request: Request, db_session: database.ReadOnlyDBSession, user_id: str = Depends(validate_session)):
+    if not user_id:
+        return RedirectResponse("/logout", status_code=303)
+    return email_csv_response(db_session, user_id)
+
+
+# Stream the csv. Sync routes run in the threadpool, so the export doesn't block the event loop
+@router.get("/process-csv")
+@limiter.limit("2/minute")
+def process_csv(request: Request, db_session: database.ReadOnlyDBSession, user_id: str = Depends(validate_session)):
+    if not user_id:
+        return RedirectResponse("/logout", status_code=303)
+    return email_csv_response(db_session, user_id)
+
+
+# Download all emails in a typed format for analysis (see utils/export_utils.py)
+@router.get("/export")
+@limiter.limit("2/minute")
+def export_emails(
+    request: Request,
+    db_session: database.ReadOnlyDBSession,
+    format: Literal["parquet", "arrow", "ndjson"] = "parquet",
+    user_id: str = Depends(validate_session),
+):
+    if not user_id:
+        return RedirectResponse("/logout", status_code=303)
+    check_has_emails(db_session, user_id)
+    media_type, extension = EXPORT_FORMATS[format]
+    logger.info("user_id:%s streaming %s export", user_id, format)
+    return StreamingResponse(
+        email_export_chunks(user_id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=emails.{extension}"},
+    )
+
+
+# Download the sankey diagram (see utils/sankey_utils.py). Sync, so the query and
+# waiting for the render pool happen in the threadpool rather than on the event loop
 @router.get("/process-sankey")
 @limiter.limit("2/minute")
-async def process_sankey(request: Request, db_session: database.DBSession, user_id: str = Depends(validate_session)):
+def process_sankey(
+    request: Request,
+    db_session: database.ReadOnlyDBSession,
+    format: Literal["png", "svg", "json"] = "png",
+    user_id: str = Depends(validate_session),
+):
     # Validate user session, redirect if invalid
     if not user_id:
         return RedirectResponse("/logout", status_code=303)
-    
-    num_applications = 0
-    num_offers = 0
-    num_rejected = 0
-    num_request_for_availability = 0
-    num_interview_scheduled = 0
-    num_no_response = 0
-
-    # Get job related email data from DB
-    emails = query_emails(request, db_session=db_session, user_id=user_id)
-    if not emails:
+
+    # Count the user's applications by the furthest stage they reached
+    stage_counts = get_stage_counts(db_session, user_id)
+    if not stage_counts["applications"]:
         raise HTTPException(status_code=400, detail="No data found to write")
- 
-    for email in emails:
-        # normalize the output
-        status = email.application_status.strip().lower()
-        num_applications += 1   
-        if status == "offer":
-            num_offers += 1
-        elif status == "rejected":
-            num_rejected += 1
-        elif status == "request for availability":
-            num_request_for_availability += 1
-        elif status == "interview scheduled":
-            num_interview_scheduled += 1
-        elif status == "no response":
-            num_no_response += 1
-
-    # Create the Sankey diagram
-    fig = go.Figure(go.Sankey(
-        node=dict(label=[f"Applications ({num_applications})", 
-                         f"Offers ({num_offers})", 
-                         f"Rejected ({num_rejected})", 
-                         f"Request for Availability ({num_request_for_availability})", 
-                         f"Interview Scheduled ({num_interview_scheduled})", 
-                         f"No Response ({num_no_response})"]),
-        link=dict(source=[0, 0, 0, 0, 0], target=[1, 2, 3, 4, 5], 
-                  value=[num_offers, num_rejected, num_request_for_availability, num_interview_scheduled, num_no_response])))
-
-
-    # Define the user's file path and ensure the directory exists
-    directory = get_user_filepath(user_id)
-    filename = "sankey_diagram.png"
-    filepath = os.path.join(directory, filename)
-
-    # Ensure the directory exists
-    os.makedirs(directory, exist_ok=True)
 
     try:
-        # Save the Sankey diagram as PNG
-        fig.write_image(filepath)  # Requires Kaleido for image export
-        logger.info("user_id:%s Sankey diagram saved to %s", user_id, filepath)
-
-        # Return the file with correct headers and explicit filename
-        return FileResponse(
-            filepath,
-            media_type="image/png",  # Correct media type for PNG
-            filename=filename, 
-            headers={"Content-Disposition": f"attachment; filename={filename}"}  # Ensure correct filename in header
-        )
+        content = render_sankey(stage_counts, format)
     except Exception as e:
         logger.error("Error generating Sankey diagram for user_id:%s - %s", user_id, str(e))
         raise HTTPException(status_code=500, detail="Error generating Sankey diagram")
 
-   
\ No newline at end of file
+    logger.info("user_id:%s downloading Sankey diagram as %s", user_id, format)
+    filename = f"sankey_diagram.{format}"
+    return Response(
+        content,
+        media_type=SANKEY_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -0,0 +1,36 @@
+import logging
+import secrets
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from utils.config_utils import get_settings
+from utils import metrics_utils
+
+# Logger setup
+logger = logging.getLogger(__name__)
+
+# Get settings
+settings = get_settings()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# FastAPI router for metrics routes
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(request: Request):
+    """
+    Process metrics in the Prometheus text format. Scrapers have to send
+    METRICS_TOKEN as a bearer token; only local (non deployed) environments may
+    leave it unset to serve metrics openly.
+    """
+    if settings.is_publicly_deployed and not settings.METRICS_TOKEN:
+        logger.error("Rejected /metrics request, METRICS_TOKEN is not set")
+        raise HTTPException(status_code=403, detail="Metrics are not enabled")
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if not secrets.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+            logger.warning("Rejected /metrics request without a valid token")
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+    return PlainTextResponse(metrics_utils.REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,125 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+
+from cachetools import LRUCache
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse, RedirectResponse
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+import database
+from db.utils.application_utils import get_user_stats
+from db.utils.stats_utils import get_funnel, get_timeline
+from db.utils.community_utils import COMMUNITY_METRICS, load_sketches
+from session.session_layer import validate_session
+from utils.config_utils import get_settings
+
+# Logger setup
+logger = logging.getLogger(__name__)
+
+# Get settings
+settings = get_settings()
+
+# Time periods offered on the stats page, see docs/use_cases/application_response_rates.md
+PERIODS = {
+    "all": None,
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "3months": timedelta(days=90),
+}
+
+COMMUNITY_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+# Results are cached per user and versioned by user_stats.updated, which changes
+# whenever the user's emails are ingested, deleted or re-labeled
+stats_cache = LRUCache(maxsize=settings.STATS_CACHE_SIZE)
+stats_cache_lock = threading.Lock()
+
+# FastAPI router for stats routes
+router = APIRouter(prefix="/stats")
+limiter = Limiter(key_func=get_remote_address)
+
+
+def cached_stats(key: tuple, compute):
+    with stats_cache_lock:
+        if key in stats_cache:
+            return stats_cache[key]
+    value = compute()
+    with stats_cache_lock:
+        stats_cache[key] = value
+    return value
+
+
+@router.get("/timeline")
+@limiter.limit("2/minute")
+def timeline(
+    request: Request,
+    db_session: database.ReadOnlyDBSession,
+    user_id: str = Depends(validate_session),
+    granularity: Literal["day", "week", "month"] = "week",
+    period: Literal["all", "week", "month", "3months"] = "all",
+):
+    """
+    Number of applications, responses and interviews (and emails per status) in
+    each day, week or month of the selected period.
+    """
+    if not user_id:
+        return RedirectResponse("/logout", status_code=303)
+
+    since = until = None
+    if PERIODS[period]:
+        # relative periods end at the end of today (UTC), so results are stable within a day
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        until = today + timedelta(days=1)
+        since = until - PERIODS[period]
+
+    version = get_user_stats(db_session, user_id).updated
+    buckets = cached_stats(
+        ("timeline", user_id, version, granularity, since),
+        lambda: get_timeline(db_session, user_id, granularity, since=since, until=until),
+    )
+    logger.info("user_id:%s timeline with %s %s buckets", user_id, len(buckets), granularity)
+    return ORJSONResponse({"granularity": granularity, "period": period, "buckets": buckets})
+
+
+@router.get("/funnel")
+@limiter.limit("2/minute")
+def funnel(request: Request, db_session: database.ReadOnlyDBSession, user_id: str = Depends(validate_session)):
+    """
+    How many applications reached the assessment, interview and offer stages, the
+    conversion between stages, and how long replies took.
+    """
+    if not user_id:
+        return RedirectResponse("/logout", status_code=303)
+
+    version = get_user_stats(db_session, user_id).updated
+    result = cached_stats(("funnel", user_id, version), lambda: get_funnel(db_session, user_id))
+    return ORJSONResponse(result)
+
+
+@router.get("/community")
+@limiter.limit("2/minute")
+def community(request: Request, db_session: database.ReadOnlyDBSession, user_id: str = Depends(validate_session)):
+    """
+    Percentiles of response rate and hours to first response across all users,
+    next to the user's own values and where they rank. Served from the sketches
+    maintained by jobs/community_rollup.py, so the cost doesn't grow with users.
+    """
+    if not user_id:
+        return RedirectResponse("/logout", status_code=303)
+
+    user_stats = get_user_stats(db_session, user_id)
+    sketches = load_sketches(db_session)
+    result = {}
+    for name, (value, _) in COMMUNITY_METRICS.items():
+        sketch = sketches[name]
+        user_value = getattr(user_stats, value)
+        result[name] = {
+            "users": sketch.count,
+            **{f"p{round(q * 100)}": sketch.quantile(q) for q in COMMUNITY_QUANTILES},
+            "you": user_value,
+            "your_percentile": None if user_value is None or not sketch.count else round(sketch.rank(user_value) * 100, 1),
+        }
+    return ORJSONResponse(result)
@@ -1,10 +1,10 @@
 import logging
+import string
 from fastapi import APIRouter, Depends, Request, HTTPException
-from sqlmodel import select
-from db.user_emails import UserEmails
 from utils.config_utils import get_settings
 from session.session_layer import validate_session
-from routes.email_routes import query_emails
+from db.utils.application_utils import get_user_applications, get_user_stats
+from db.utils.job_title_utils import get_role_families
 import database
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -25,59 +25,33 @@ limiter = Limiter(key_func=get_remote_address)
 
 @router.get("/get-response-rate")   
 @limiter.limit("2/minute")    
-def response_rate_by_job_title(request: Request, db_session: database.DBSession, user_id: str = Depends(validate_session)):
+def response_rate_by_job_title(request: Request, db_session: database.ReadOnlyDBSession, user_id: str = Depends(validate_session)):
     
     try:
-        # Get job related email data from DB
-        user_emails = query_emails(request, db_session=db_session, user_id=user_id)
-
-        # Create unique application IDs based on company_name only (ignore job_title for now)
-        applications = {}
-        
-        for email in user_emails:
-            if email.company_name:
-                app_id = email.company_name  # Use only company name as unique identifier
-                
-                if app_id not in applications:
-                    applications[app_id] = {
-                        "company": email.company_name,
-                        "job_title": email.job_title,
-                        "statuses": set()
-                    }
-                
-                if email.application_status:
-                    status = email.application_status.strip().lower()
-                    # Ignore "unknown" statuses
-                    if status != "unknown":
-                        applications[app_id]["statuses"].add(status)
+        # Group the user's applications by role family, so "Sr. SWE" and "Senior Software
+        # Engineer II" count as one role
+        applications = get_user_applications(db_session, user_id)
+        role_families = get_role_families(
+            db_session, {application.job_title for application in applications if application.job_title}
+        )
+        job_title_applications = {}
 
-        # Filter out applications that only have unknown statuses (no valid statuses)
-        valid_applications = {}
-        for app_id, app_data in applications.items():
-            if app_data["statuses"]:  # Only include applications that have at least one valid status
-                valid_applications[app_id] = app_data
+        for application in applications:
+            role_family = role_families.get(application.job_title)
 
-        # Group applications by job title
-        job_title_applications = {}
-        
-        for app_id, app_data in valid_applications.items():
-            job_title = app_data["job_title"]
-            
             # Skip applications with "unknown" job titles
-            if job_title and job_title.lower() != "unknown":
+            if role_family:
+                job_title = string.capwords(role_family)
                 if job_title not in job_title_applications:
                     job_title_applications[job_title] = {
                         "total": 0,
                         "responses": 0
                     }
-                
+
                 job_title_applications[job_title]["total"] += 1
-                
+
                 # Check if this application received any response beyond initial confirmation/rejection
-                statuses = app_data["statuses"]
-                has_response = any(status not in ["application confirmation", "rejection"] for status in statuses)
-                
-                if has_response:
+                if application.has_response:
                     job_title_applications[job_title]["responses"] += 1
 
         # Calculate response rates for each job title
@@ -97,80 +71,14 @@ def response_rate_by_job_title(request: Request, db_session: database.DBSession,
 
 @router.get("/user-response-rate")
 def calculate_response_rate(
-    request: Request, db_session: database.DBSession, user_id: str = Depends(validate_session)
+    request: Request, db_session: database.ReadOnlyDBSession, user_id: str = Depends(validate_session)
 ) -> dict:
-    user_emails = db_session.exec(
-        select(UserEmails).where(UserEmails.user_id == user_id)
-    ).all()
-
-    # if user has no emails just return 0.0
-    if not user_emails:
-        return {"value": 0.0}
-
-    # Create unique application IDs based on company_name only (ignore job_title for now)
-    applications = {}
-    
-    logger.info(f"DEBUG: Processing {len(user_emails)} total emails")
-    
-    for email in user_emails:
-        if email.company_name:
-            app_id = email.company_name  # Use only company name as unique identifier
-            
-            logger.info(f"DEBUG: Email from {email.company_name} - {email.job_title} - Status: {email.application_status}")
-            
-            if app_id not in applications:
-                applications[app_id] = {
-                    "company": email.company_name,
-                    "job_title": email.job_title,
-                    "statuses": set(),
-                    "received_at": email.received_at
-                }
-            
-            if email.application_status:
-                status = email.application_status.strip().lower()
-                # Ignore "unknown" statuses
-                if status != "unknown":
-                    applications[app_id]["statuses"].add(status)
-
-    logger.info(f"DEBUG: All applications before filtering: {len(applications)}")
-    for app_id, app_data in applications.items():
-        logger.info(f"DEBUG:   {app_id} - Statuses: {list(app_data['statuses'])}")
+    user_stats = get_user_stats(db_session, user_id)
 
-    # Filter out applications that only have unknown statuses (no valid statuses)
-    valid_applications = {}
-    for app_id, app_data in applications.items():
-        if app_data["statuses"]:  # Only include applications that have at least one valid status
-            valid_applications[app_id] = app_data
-
-    # Calculate response rate
-    total_applications = len(valid_applications)
-    if total_applications == 0:
+    # if user has no applications just return 0.0
+    if not user_stats.application_count:
         return {"value": 0.0}
 
-    # Count applications that received a response (not just application confirmation or rejection)
-    responses_received = 0
-    
-    # Debug logging
-    logger.info(f"DEBUG: Total valid applications: {total_applications}")
-    
-    for app_id, app_data in valid_applications.items():
-        statuses = app_data["statuses"]
-        company = app_data["company"]
-        job_title = app_data["job_title"]
-        
-        # Check if this application received any response beyond initial confirmation/rejection
-        has_response = any(status not in ["application confirmation", "rejection"] for status in statuses)
-        
-        logger.info(f"DEBUG: Application {app_id} ({company} - {job_title})")
-        logger.info(f"DEBUG:   Statuses: {list(statuses)}")
-        logger.info(f"DEBUG:   Has response: {has_response}")
-        
-        if has_response:
-            responses_received += 1
-
-    logger.info(f"DEBUG: Total responses received: {responses_received}")
-    logger.info(f"DEBUG: Response rate calculation: {responses_received}/{total_applications} = {(responses_received/total_applications)*100}%")
-
-    response_rate_percent = (responses_received / total_applications) * 100
+    # Share of applications that received a response (not just application confirmation or rejection)
+    response_rate_percent = (user_stats.responded_application_count / user_stats.application_count) * 100
     return {"value": round(response_rate_percent, 1)}
-    
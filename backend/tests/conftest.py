@@ -1,17 +1,22 @@
 import sys
 import os
+from datetime import datetime
 
 import pytest
 from testcontainers.postgres import PostgresContainer
 import sqlalchemy as sa
-from sqlalchemy.orm import Session
-from sqlmodel import SQLModel
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel
 
 # Add the parent directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 os.chdir("./backend")
 
 import database  # noqa: E402
+from db.user_emails import UserEmailData  # noqa: E402
+from db.utils import company_utils, dictionary_utils, job_title_utils  # noqa: E402
+from db.utils.application_utils import assign_applications, refresh_user_analytics  # noqa: E402
+from db.utils.user_email_utils import add_user_emails  # noqa: E402
 
 
 @pytest.fixture(scope="session")
@@ -22,18 +27,23 @@ def postgres_container():
 
 @pytest.fixture
 def engine(postgres_container: PostgresContainer, monkeypatch):
-    test_engine = sa.create_engine(
-        sa.URL.create(
-            "postgresql",
-            username=postgres_container.username,
-            password=postgres_container.password,
-            host=postgres_container.get_container_host_ip(),
-            port=postgres_container.get_exposed_port(postgres_container.port),
-            database=postgres_container.dbname,
-        )
+    url = sa.URL.create(
+        "postgresql",
+        username=postgres_container.username,
+        password=postgres_container.password,
+        host=postgres_container.get_container_host_ip(),
+        port=postgres_container.get_exposed_port(postgres_container.port),
+        database=postgres_container.dbname,
     )
+    test_engine = sa.create_engine(url)
 
     monkeypatch.setattr(database, "engine", test_engine)
+    monkeypatch.setattr(database, "ingest_engine", test_engine)
+    monkeypatch.setattr(database, "replica_router", database.ReplicaRouter(test_engine, None, 30.0, 5.0))
+    # TestClient runs each request in a new event loop, so async connections can't be pooled
+    monkeypatch.setattr(
+        database, "async_engine", create_async_engine(database.async_database_url(url), poolclass=sa.NullPool)
+    )
 
     database.create_db_and_tables()
 
@@ -45,9 +55,56 @@ def engine(postgres_container: PostgresContainer, monkeypatch):
         )
         for table in SQLModel.metadata.tables.values():
             transaction.execute(table.delete())
+    # the cached ids and companies are gone with the rows
+    dictionary_utils.clear_caches()
+    company_utils.company_index.clear()
+    job_title_utils.role_families.clear()
 
 
 @pytest.fixture
 def db_session(engine, monkeypatch):
     with Session(database.engine) as session:
         yield session
+
+
+@pytest.fixture
+def make_email():
+    """Builds a job email of user 123, with the fields a test doesn't care about filled in."""
+    def make(
+        email_id: str,
+        company_name: str,
+        status: str,
+        received_at: datetime,
+        job_title: str = "Engineer",
+        user_id: str = "123",
+        **fields,
+    ) -> UserEmailData:
+        return UserEmailData(
+            id=email_id,
+            user_id=user_id,
+            company_name=company_name,
+            application_status=status,
+            received_at=received_at,
+            job_title=job_title,
+            **{"subject": "Your application", "email_from": "jobs@example.com", **fields},
+        )
+
+    return make
+
+
+@pytest.fixture
+def add_emails(db_session, make_email):
+    """
+    Stores a user's emails, given as make_email arguments (email_id, company_name,
+    status, received_at[, job_title]), with their applications and rollups, and
+    commits them since routes read through their own sessions.
+    """
+    def add(user_id: str, emails, **fields):
+        user_emails = [make_email(*email, user_id=user_id, **fields) for email in emails]
+        application_ids = assign_applications(db_session, user_id, user_emails)
+        add_user_emails(db_session, user_emails)
+        refresh_user_analytics(db_session, user_id, application_ids)
+        db_session.commit()
+        return user_emails
+
+    return add
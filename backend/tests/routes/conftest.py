@@ -5,13 +5,22 @@ import pytest
 from fastapi.testclient import TestClient
 
 from db.users import Users
+from routes import auth_routes, email_routes, file_routes, start_date_routes, stats_routes, users_routes
 import database
 import main
 
 
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    # limits are kept in memory per router, so tests would otherwise share them
+    for router_module in (auth_routes, email_routes, file_routes, start_date_routes, stats_routes, users_routes):
+        router_module.limiter.reset()
+
+
 @pytest.fixture
 def client(db_session):
     main.app.dependency_overrides[database.request_session] = lambda: db_session
+    main.app.dependency_overrides[database.read_only_request_session] = lambda: db_session
     test_client = TestClient(main.app)
 
     return test_client
@@ -8,12 +8,13 @@ from google.oauth2.credentials import Credentials
 
 from db.users import Users
 from db.processing_tasks import TaskRuns, FINISHED, STARTED
-from routes.email_routes import fetch_emails_to_db
+from routes.email_routes import EMAIL_PAGE_SIZE_DEFAULT, EMAIL_PAGE_SIZE_MAX, fetch_emails_to_db
 
 
 def test_processing(db_session, client, logged_in_user):
     db_session.add(TaskRuns(user=logged_in_user, status=STARTED))
-    db_session.flush()
+    # async routes read through their own connection
+    db_session.commit()
 
     # make request to check on processing status
     resp = client.get("/processing", follow_redirects=False)
@@ -28,6 +29,126 @@ def test_processing_404(db_session, client, logged_in_user):
     assert resp.status_code == 404
 
 
+def test_get_emails_excludes_unknown_and_sorts_newest_first(client, logged_in_user, add_emails):
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("a", "Acme", "Rejected", datetime(2024, 1, 1)),
+            ("b", "Acme", "Unknown", datetime(2024, 1, 2)),
+            ("c", "Acme", "offer", datetime(2024, 1, 3)),
+            ("d", "Acme", "", datetime(2024, 1, 4)),
+        ],
+    )
+
+    resp = client.get("/get-emails")
+
+    assert resp.status_code == 200
+    assert [email["id"] for email in resp.json()] == ["c", "a"]
+
+
+def test_get_emails_paginates_with_cursor(client, logged_in_user, add_emails):
+    # "b" and "c" share a timestamp, so the cursor has to break ties on id
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("a", "Acme", "offer", datetime(2024, 1, 1)),
+            ("b", "Acme", "offer", datetime(2024, 1, 2)),
+            ("c", "Acme", "offer", datetime(2024, 1, 2)),
+            ("d", "Acme", "offer", datetime(2024, 1, 3)),
+        ],
+    )
+
+    seen = []
+    cursor = None
+    for _ in range(3):
+        params = {"limit": 2, "fields": "id,company_name"}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get("/get-emails", params=params)
+        assert resp.status_code == 200
+        assert all(set(email) == {"id", "company_name"} for email in resp.json())
+        seen += [email["id"] for email in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == ["d", "c", "b", "a"]
+
+
+def test_get_emails_pages_only_when_asked(client, logged_in_user, add_emails):
+    add_emails(
+        logged_in_user.user_id,
+        [
+            (f"{minute:03d}", "Acme", "offer", datetime(2024, 1, 1, 0, minute // 60, minute % 60))
+            for minute in range(EMAIL_PAGE_SIZE_DEFAULT + 2)
+        ],
+    )
+
+    resp = client.get("/get-emails", params={"fields": "id"})
+    assert len(resp.json()) == EMAIL_PAGE_SIZE_DEFAULT + 2
+    assert "X-Next-Cursor" not in resp.headers
+
+    resp = client.get("/get-emails", params={"fields": "id", "limit": 1})
+    assert resp.json() == [{"id": f"{EMAIL_PAGE_SIZE_DEFAULT + 1:03d}"}]
+    # a cursor without limit pages by the default size
+    resp = client.get("/get-emails", params={"fields": "id", "cursor": resp.headers["X-Next-Cursor"]})
+    assert len(resp.json()) == EMAIL_PAGE_SIZE_DEFAULT
+    resp = client.get("/get-emails", params={"fields": "id", "cursor": resp.headers["X-Next-Cursor"]})
+    assert resp.json() == [{"id": "000"}]
+    assert "X-Next-Cursor" not in resp.headers
+    assert client.get("/get-emails", params={"limit": EMAIL_PAGE_SIZE_MAX + 1}).status_code == 422
+
+
+def test_get_emails_filters(client, logged_in_user, add_emails):
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("a", "Acme", "Offer", datetime(2024, 1, 1)),
+            ("b", "Acme", "rejected", datetime(2024, 1, 2)),
+            ("c", "Globex", "offer", datetime(2024, 1, 3)),
+            ("d", "acme", "offer", datetime(2024, 1, 4)),
+        ],
+    )
+
+    resp = client.get(
+        "/get-emails",
+        params={"status": "offer", "company": "ACME", "received_before": "2024-01-04T00:00:00"},
+    )
+
+    assert [email["id"] for email in resp.json()] == ["a"]
+
+
+def test_get_emails_rejects_bad_params(client, logged_in_user):
+    assert client.get("/get-emails", params={"fields": "id,password"}).status_code == 400
+    assert client.get("/get-emails", params={"limit": 2, "cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_search_emails(client, logged_in_user, add_emails):
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("a", "Stripe", "offer", datetime(2024, 1, 1)),
+            ("b", "Acme", "offer", datetime(2024, 1, 2)),
+            ("c", "Stripe", "Unknown", datetime(2024, 1, 3)),
+            ("d", "Stripe", "rejected", datetime(2024, 1, 4)),
+        ],
+    )
+
+    resp = client.get("/search-emails", params={"q": "stri", "limit": 1}, headers={"Origin": "http://localhost:3000"})
+    assert resp.status_code == 200
+    assert [email["id"] for email in resp.json()] == ["d"]
+    assert resp.headers["X-Next-Offset"] == "1"
+    # readable by the frontend's fetch()
+    assert "X-Next-Offset" in resp.headers["Access-Control-Expose-Headers"]
+    resp = client.get("/search-emails", params={"q": "stri", "limit": 1, "offset": 1})
+    assert [email["id"] for email in resp.json()] == ["a"]
+    assert "X-Next-Offset" not in resp.headers
+
+    assert [email["id"] for email in client.get("/search-emails", params={"q": "acme engineer"}).json()] == ["b"]
+    assert client.get("/search-emails", params={"q": "?!"}).json() == []
+    assert client.get("/search-emails", params={"q": ""}).status_code == 422
+
+
 def test_fetch_emails_to_db(db_session: Session):
     test_user_id = "123"
 
@@ -0,0 +1,101 @@
+import csv
+import io
+import os
+from datetime import datetime
+
+import orjson
+import pyarrow
+import pyarrow.ipc
+import pyarrow.parquet
+import pytest
+
+from routes import file_routes
+from utils.file_utils import get_user_filepath
+
+
+def test_process_csv_streams_emails(client, logged_in_user, monkeypatch, add_emails):
+    monkeypatch.setattr(file_routes, "CSV_BATCH_SIZE", 1)
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("1", "Acme", "Application confirmation", datetime(2025, 1, 1)),
+            ("2", "Acme", "Rejection", datetime(2025, 1, 3)),
+            ("3", "Globex", "unknown", datetime(2025, 1, 4)),
+            ("4", "Globex", "Interview invitation", datetime(2025, 1, 2)),
+        ],
+    )
+
+    resp = client.get("/process-csv")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.headers["content-disposition"] == "attachment; filename=emails.csv"
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert list(rows[0]) == list(file_routes.csv_field_mapping().values())
+    assert [row["Message ID"] for row in rows] == ["2", "4", "1"]
+    assert rows[0]["Company Name"] == "Acme"
+    assert rows[0]["Received At"] == str(datetime(2025, 1, 3))
+    assert not os.path.exists(get_user_filepath(logged_in_user.user_id))
+
+
+def test_download_file_is_rate_limited(client, logged_in_user, add_emails):
+    add_emails(logged_in_user.user_id, [("1", "Acme", "Application confirmation", datetime(2025, 1, 1))])
+
+    assert [client.get("/download-file").status_code for _ in range(3)] == [200, 200, 429]
+
+
+def test_process_csv_without_emails(client, logged_in_user):
+    resp = client.get("/process-csv")
+
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "No data found to write"}
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow", "ndjson"])
+def test_export_is_typed(client, logged_in_user, monkeypatch, export_format, add_emails):
+    monkeypatch.setattr(file_routes, "EXPORT_BATCH_SIZE", 1)
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("1", "Acme", "Application confirmation", datetime(2025, 1, 1)),
+            ("2", "Acme", "Rejection", datetime(2025, 1, 3)),
+            ("3", "Globex", "Interview invitation", datetime(2025, 1, 2)),
+        ],
+    )
+
+    resp = client.get("/export", params={"format": export_format})
+
+    assert resp.status_code == 200
+    if export_format == "parquet":
+        table = pyarrow.parquet.read_table(io.BytesIO(resp.content))
+    elif export_format == "arrow":
+        table = pyarrow.ipc.open_stream(resp.content).read_all()
+    else:
+        rows = [orjson.loads(line) for line in resp.content.splitlines()]
+        assert rows[0]["received_at"] == "2025-01-03T00:00:00"
+        assert [row["company_name"] for row in rows] == ["Acme", "Globex", "Acme"]
+        return
+    assert table.schema.field("received_at").type == pyarrow.timestamp("us")
+    assert pyarrow.types.is_dictionary(table.schema.field("company_name").type)
+    assert table.column("id").to_pylist() == ["2", "3", "1"]
+    assert table.column("received_at").to_pylist()[0] == datetime(2025, 1, 3)
+    assert table.column("latest_application_status").to_pylist() == ["rejection", "interview invitation", "rejection"]
+
+
+def test_process_sankey_svg(client, logged_in_user, add_emails):
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("1", "Acme", "Application confirmation", datetime(2025, 1, 1)),
+            ("2", "Acme", "Rejection", datetime(2025, 1, 3)),
+            ("3", "Globex", "Offer made", datetime(2025, 1, 2)),
+        ],
+    )
+
+    resp = client.get("/process-sankey", params={"format": "svg"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/svg+xml"
+    assert resp.headers["content-disposition"] == "attachment; filename=sankey_diagram.svg"
+    assert "Offers (1)" in resp.text
+    assert "Rejected (1)" in resp.text
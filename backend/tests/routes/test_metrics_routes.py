@@ -0,0 +1,46 @@
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import main
+from db.processing_tasks import TaskRuns, STARTED
+from utils import metrics_utils
+
+
+def test_metrics():
+    metrics_utils.LLM_RATE_LIMITED.inc()
+
+    resp = TestClient(main.app).get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE llm_rate_limited_total counter" in resp.text
+
+
+def test_metrics_requires_token_when_configured():
+    client = TestClient(main.app)
+    with mock.patch("routes.metrics_routes.settings.METRICS_TOKEN", "secret"):
+        assert client.get("/metrics").status_code == 401
+        resp = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        assert resp.status_code == 200
+
+
+def test_metrics_are_off_when_deployed_without_token():
+    with (
+        mock.patch("routes.metrics_routes.settings.METRICS_TOKEN", ""),
+        mock.patch("routes.metrics_routes.settings.ENV", "prod"),
+    ):
+        assert TestClient(main.app).get("/metrics").status_code == 403
+
+
+def test_request_timing_records_route_latency_and_db_time(db_session, client, logged_in_user):
+    db_session.add(TaskRuns(user=logged_in_user, status=STARTED))
+    # /processing reads through its own (async) connection
+    db_session.commit()
+    db_queries_before = metrics_utils.HTTP_REQUEST_DB_QUERIES.sum(method="GET", route="/processing")
+
+    resp = client.get("/processing")
+
+    assert resp.status_code == 200
+    assert metrics_utils.HTTP_REQUEST_SECONDS.count(method="GET", route="/processing", status="200") >= 1
+    assert metrics_utils.HTTP_REQUEST_DB_QUERIES.sum(method="GET", route="/processing") > db_queries_before
@@ -0,0 +1,167 @@
+from datetime import datetime
+
+import pytest
+
+from db.user_emails import UserEmails
+from db.user_stats import UserStats
+from db.users import Users
+from db.utils.community_utils import load_sketches, remove_user_contribution
+from jobs.community_rollup import rollup_community_stats
+from db.utils.application_utils import refresh_user_analytics
+from routes import stats_routes
+from db.utils.application_utils import settings
+
+
+def test_timeline_buckets_by_week(db_session, client, logged_in_user, add_emails):
+    stats_routes.stats_cache.clear()
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("a", "Acme", "Application confirmation", datetime(2025, 1, 6, 9)),  # Monday
+            ("b", "Acme", "Application confirmation", datetime(2025, 1, 8, 9)),
+            ("c", "Acme", "Interview invitation", datetime(2025, 1, 9, 9)),
+            ("d", "Acme", "unknown", datetime(2025, 1, 10, 9)),
+            ("e", "Acme", "Rejection", datetime(2025, 1, 21, 9)),
+        ],
+    )
+
+    resp = client.get("/stats/timeline", params={"granularity": "week", "period": "all"})
+
+    assert resp.status_code == 200
+    assert resp.json()["buckets"] == [
+        {
+            "start": "2025-01-06T00:00:00",
+            "applications": 2,
+            "responses": 1,
+            "interviews": 1,
+            "counts": {"application confirmation": 2, "interview invitation": 1},
+        },
+        {"start": "2025-01-13T00:00:00", "applications": 0, "responses": 0, "interviews": 0, "counts": {}},
+        {"start": "2025-01-20T00:00:00", "applications": 0, "responses": 1, "interviews": 0, "counts": {"rejection": 1}},
+    ]
+
+
+def test_timeline_cache_is_invalidated_by_new_emails(db_session, client, logged_in_user, add_emails):
+    stats_routes.stats_cache.clear()
+    add_emails(logged_in_user.user_id, [("a", "Acme", "Application confirmation", datetime(2025, 1, 6))])
+    params = {"granularity": "month"}
+    assert [bucket["applications"] for bucket in client.get("/stats/timeline", params=params).json()["buckets"]] == [1]
+
+    add_emails(logged_in_user.user_id, [("b", "Acme", "Application confirmation", datetime(2025, 1, 7))])
+
+    assert [bucket["applications"] for bucket in client.get("/stats/timeline", params=params).json()["buckets"]] == [2]
+
+
+def test_timeline_rejects_unknown_granularity(client, logged_in_user):
+    assert client.get("/stats/timeline", params={"granularity": "hour"}).status_code == 422
+
+
+@pytest.mark.parametrize("path", ["/stats/timeline", "/stats/funnel", "/stats/community"])
+def test_stats_are_rate_limited(client, logged_in_user, path):
+    assert [client.get(path).status_code for _ in range(3)] == [200, 200, 429]
+
+
+def test_funnel(db_session, client, logged_in_user, add_emails):
+    stats_routes.stats_cache.clear()
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("a1", "Acme", "Application confirmation", datetime(2025, 1, 1)),
+            ("a2", "Acme", "Assessment sent", datetime(2025, 1, 2)),
+            ("a3", "Acme", "Interview invitation", datetime(2025, 1, 4)),
+        ],
+    )
+    add_emails(
+        logged_in_user.user_id,
+        [
+            ("b1", "Globex", "Application confirmation", datetime(2025, 1, 1)),
+            ("b2", "Globex", "Offer made", datetime(2025, 1, 11)),
+        ],
+    )
+    add_emails(logged_in_user.user_id, [("c1", "Initech", "Application confirmation", datetime(2025, 1, 1))])
+    # never applied, so not part of the funnel
+    add_emails(logged_in_user.user_id, [("d1", "Hooli", "Interview invitation", datetime(2025, 1, 1))])
+
+    resp = client.get("/stats/funnel")
+
+    assert resp.status_code == 200
+    funnel = resp.json()
+    assert (funnel["applied"], funnel["replied"], funnel["reply_rate"]) == (3, 2, 66.7)
+    assert funnel["reply_hours"]["p50"] == 24 * 5.5
+    assert [(stage["stage"], stage["count"], stage["rate_from_previous"]) for stage in funnel["stages"]] == [
+        ("applied", 3, None),
+        ("assessment", 2, 66.7),
+        ("interview", 2, 100.0),
+        ("offer", 1, 50.0),
+    ]
+    assert funnel["stages"][2]["median_hours_from_applied"] == 24 * 3
+
+
+def test_community_percentiles_follow_user_changes(db_session, client, logged_in_user, monkeypatch, add_emails):
+    monkeypatch.setattr(settings, "COMMUNITY_MIN_APPLICATIONS", 1)
+    other_user = Users(user_id="456", user_email="other@example.com", start_date=datetime(2000, 1, 1))
+    db_session.add(other_user)
+    # the logged in user heard back from 1 of 2 companies, a day after applying
+    add_emails(logged_in_user.user_id, [("a", "Acme", "Application confirmation", datetime(2025, 1, 1))])
+    add_emails(logged_in_user.user_id, [("b", "Acme", "Interview invitation", datetime(2025, 1, 2))])
+    add_emails(logged_in_user.user_id, [("c", "Globex", "Application confirmation", datetime(2025, 1, 1))])
+    # the other user heard back from their only application
+    add_emails(other_user.user_id, [("d", "Initech", "Offer made", datetime(2025, 1, 1))])
+
+    assert rollup_community_stats() == 2
+    resp = client.get("/stats/community")
+
+    assert resp.status_code == 200
+    response_rate = resp.json()["response_rate"]
+    assert response_rate["users"] == 2
+    assert response_rate["you"] == 50.0
+    assert response_rate["p25"] == pytest.approx(50, rel=0.01)
+    assert response_rate["your_percentile"] == 50.0
+    assert resp.json()["response_hours"]["you"] == 24.0
+
+    # only the user that changed is folded in again, replacing their old value
+    add_emails(logged_in_user.user_id, [("e", "Globex", "Rejection", datetime(2025, 1, 3))])
+    assert rollup_community_stats() == 0
+    add_emails(logged_in_user.user_id, [("f", "Globex", "Offer made", datetime(2025, 1, 4))])
+    assert rollup_community_stats() == 1
+    assert db_session.get(UserStats, logged_in_user.user_id).community_response_rate == 100.0
+    assert client.get("/stats/community").json()["response_rate"]["users"] == 2
+
+
+def test_community_percentiles_drop_users_without_emails(db_session, client, logged_in_user, monkeypatch, add_emails):
+    monkeypatch.setattr(settings, "COMMUNITY_MIN_APPLICATIONS", 1)
+    deleted_user = Users(user_id="456", user_email="deleted@example.com", start_date=datetime(2000, 1, 1))
+    emptied_user = Users(user_id="789", user_email="emptied@example.com", start_date=datetime(2000, 1, 1))
+    db_session.add_all([deleted_user, emptied_user])
+    add_emails(logged_in_user.user_id, [("a", "Acme", "Offer made", datetime(2025, 1, 1))])
+    add_emails(deleted_user.user_id, [("b", "Globex", "Offer made", datetime(2025, 1, 1))])
+    add_emails(emptied_user.user_id, [("c", "Initech", "Offer made", datetime(2025, 1, 1))])
+    assert rollup_community_stats() == 3
+
+    # every email of one user is deleted, and the other user is deleted with their stats
+    email = db_session.get(UserEmails, ("c", emptied_user.user_id))
+    db_session.delete(email)
+    db_session.flush()
+    refresh_user_analytics(db_session, emptied_user.user_id, [email.application_id])
+    remove_user_contribution(db_session, db_session.get(UserStats, deleted_user.user_id))
+    db_session.delete(db_session.get(UserStats, deleted_user.user_id))
+    db_session.commit()
+
+    assert rollup_community_stats() == 1
+    assert client.get("/stats/community").json()["response_rate"]["users"] == 1
+
+
+def test_community_rollup_rebuilds_after_untracked_deletes(db_session, logged_in_user, monkeypatch, add_emails):
+    monkeypatch.setattr(settings, "COMMUNITY_MIN_APPLICATIONS", 1)
+    other_user = Users(user_id="456", user_email="other@example.com", start_date=datetime(2000, 1, 1))
+    db_session.add(other_user)
+    add_emails(logged_in_user.user_id, [("a", "Acme", "Offer made", datetime(2025, 1, 1))])
+    add_emails(other_user.user_id, [("b", "Globex", "Offer made", datetime(2025, 1, 1))])
+    assert rollup_community_stats() == 2
+
+    db_session.delete(db_session.get(UserStats, other_user.user_id))
+    db_session.commit()
+
+    # a rebuild folds in every remaining user
+    assert rollup_community_stats() == 1
+    assert load_sketches(db_session)["response_rate"].count == 1
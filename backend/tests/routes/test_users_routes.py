@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from db.user_emails import UserEmailData
+from db.utils.application_utils import assign_applications, refresh_user_analytics
+from db.utils.user_email_utils import add_user_emails
+
+
+def test_response_rate_groups_title_variants(db_session, client, logged_in_user):
+    emails = [
+        ("a", "Acme", "Sr. Software Engineer", "Interview invitation"),
+        ("b", "Initech", "Senior SWE", "Application confirmation"),
+        ("c", "Globex", "Senior Software Engineer II", "Application confirmation"),
+        ("d", "Hooli", "Product Manager", "Interview invitation"),
+        ("e", "Umbrella", "unknown", "Interview invitation"),
+    ]
+    user_emails = [
+        UserEmailData(
+            id=email_id,
+            user_id=logged_in_user.user_id,
+            company_name=company_name,
+            application_status=status,
+            received_at=datetime(2025, 1, 1),
+            subject="Your application",
+            job_title=job_title,
+            email_from="jobs@example.com",
+        )
+        for email_id, company_name, job_title, status in emails
+    ]
+    application_ids = assign_applications(db_session, logged_in_user.user_id, user_emails)
+    add_user_emails(db_session, user_emails)
+    refresh_user_analytics(db_session, logged_in_user.user_id, application_ids)
+    db_session.flush()
+
+    resp = client.get("/get-response-rate")
+
+    assert resp.status_code == 200
+    assert sorted(resp.json(), key=lambda rate: rate["title"]) == [
+        {"title": "Product Manager", "rate": 100.0},
+        {"title": "Software Engineer", "rate": 33.33},
+    ]
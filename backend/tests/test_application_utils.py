@@ -0,0 +1,170 @@
+from datetime import datetime
+
+from sqlmodel import Session, select
+
+from db.applications import Applications
+from db.users import Users
+from db.user_emails import UserEmailData, UserEmails
+from db.user_stats import UserStats
+from db.utils import application_utils, user_email_utils
+from jobs.rebuild_analytics import rebuild_analytics
+from utils import llm_utils
+
+
+def get_application(db_session: Session, company_key: str, title_key: str) -> Applications:
+    return db_session.exec(
+        select(Applications).where(Applications.company_key == company_key, Applications.title_key == title_key)
+    ).one_or_none()
+
+
+def setup_user(db_session: Session, add_emails):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    add_emails(
+        "123",
+        [
+            ("1", "Acme, Inc.", "Application confirmation", datetime(2025, 1, 1), "Sr. Engineer"),
+            ("2", "ACME", " Interview invitation", datetime(2025, 1, 2), "Senior Engineer"),
+            # no title, so it belongs to the latest Acme application
+            ("3", "Acme", "Rejection", datetime(2025, 1, 5), "unknown"),
+            ("4", "Acme", "Application confirmation", datetime(2025, 1, 3), "Product Manager"),
+            ("5", "Globex", "Rejection", datetime(2025, 1, 3)),
+            ("6", "Initech", "unknown", datetime(2025, 1, 4)),
+            ("7", "unknown", "Offer made", datetime(2025, 1, 4)),
+        ],
+    )
+
+
+def test_emails_are_grouped_by_company_and_title(db_session: Session, add_emails):
+    setup_user(db_session, add_emails)
+
+    engineer = get_application(db_session, "acme", "senior engineer")
+    assert engineer.status_counts == {"application confirmation": 1, "interview invitation": 1}
+    assert engineer.company_name == "ACME"
+    assert engineer.job_title == "Senior Engineer"
+    assert engineer.first_seen_at == datetime(2025, 1, 1)
+    assert engineer.interview_at == engineer.first_response_at == datetime(2025, 1, 2)
+    assert engineer.has_response
+
+    product = get_application(db_session, "acme", "product manager")
+    assert product.status_counts == {"application confirmation": 1, "rejection": 1}
+    assert product.last_status == "rejection"
+    assert product.rejected_at == datetime(2025, 1, 5)
+    assert not product.has_response
+
+    assert not get_application(db_session, "initech", "engineer").has_known_status
+    assert db_session.get(UserEmails, ("7", "123")).application_id is None
+
+    user_stats = db_session.get(UserStats, "123")
+    assert (user_stats.email_count, user_stats.application_count, user_stats.responded_application_count) == (7, 3, 1)
+
+
+def test_refresh_after_delete_and_relabel(db_session: Session, add_emails):
+    setup_user(db_session, add_emails)
+    engineer_id = get_application(db_session, "acme", "senior engineer").id
+    globex_id = get_application(db_session, "globex", "engineer").id
+
+    db_session.delete(db_session.get(UserEmails, ("2", "123")))
+    globex_email = UserEmailData(**db_session.exec(
+        user_email_utils.user_emails_query().where(UserEmails.id == "5")
+    ).mappings().one())
+    globex_email.company_name = "Initech"
+    globex_email.application_status = "Offer made"
+    new_ids = application_utils.assign_applications(db_session, "123", [globex_email])
+    user_email_utils.update_user_emails(db_session, [globex_email])
+    application_utils.refresh_user_analytics(db_session, "123", {engineer_id, globex_id} | new_ids)
+
+    assert get_application(db_session, "acme", "senior engineer").has_response is False
+    assert get_application(db_session, "globex", "engineer") is None
+    initech = get_application(db_session, "initech", "engineer")
+    assert initech.status_counts == {"offer made": 1}
+    assert initech.offer_at == datetime(2025, 1, 3)
+    user_stats = db_session.get(UserStats, "123")
+    assert (user_stats.application_count, user_stats.responded_application_count) == (3, 1)
+
+
+def test_rebuild_matches_incremental(db_session: Session, add_emails):
+    setup_user(db_session, add_emails)
+
+    def snapshot():
+        return {
+            (application.company_key, application.title_key): application.model_dump(exclude={"id", "updated"})
+            for application in db_session.exec(select(Applications)).all()
+        }
+
+    incremental = snapshot()
+
+    assert rebuild_analytics() == 1
+
+    db_session.expire_all()
+    assert snapshot() == incremental
+
+
+def test_get_user_stats_does_not_build_missing_rollups(db_session: Session, make_email):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    user_email_utils.add_user_emails(db_session, [make_email("1", "Acme", "Offer made", datetime(2025, 1, 1))])
+    db_session.commit()
+
+    user_stats = application_utils.get_user_stats(db_session, "123")
+
+    assert (user_stats.application_count, user_stats.email_count) == (0, 0)
+    assert db_session.get(UserStats, "123") is None
+    assert db_session.exec(select(Applications)).all() == []
+
+
+def test_build_missing_user_analytics(db_session: Session, add_emails, make_email):
+    setup_user(db_session, add_emails)
+    db_session.add(Users(user_id="456", user_email="456@example.com", start_date=datetime(2000, 1, 1)))
+    user_email_utils.add_user_emails(
+        db_session, [make_email("8", "Acme", "Offer made", datetime(2025, 1, 1), user_id="456")]
+    )
+    db_session.commit()
+    built = db_session.get(UserStats, "123").updated
+
+    assert application_utils.build_missing_user_analytics(db_session) == 1
+    db_session.commit()
+
+    user_stats = db_session.get(UserStats, "456")
+    assert (user_stats.email_count, user_stats.application_count, user_stats.responded_application_count) == (1, 1, 1)
+    assert db_session.get(UserStats, "123").updated == built
+    assert application_utils.build_missing_user_analytics(db_session) == 0
+
+
+def test_first_write_builds_rollups_of_older_emails(db_session: Session, add_emails, make_email):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    user_email_utils.add_user_emails(db_session, [make_email("1", "Acme", "Offer made", datetime(2025, 1, 1))])
+    db_session.flush()
+
+    add_emails("123", [("2", "Globex", "Application confirmation", datetime(2025, 1, 2))])
+
+    user_stats = db_session.get(UserStats, "123")
+    assert (user_stats.email_count, user_stats.application_count, user_stats.responded_application_count) == (2, 2, 1)
+
+
+def test_get_stage_counts(db_session: Session, add_emails):
+    setup_user(db_session, add_emails)
+
+    assert application_utils.get_stage_counts(db_session, "123") == {
+        "applications": 3,
+        "offer": 0,
+        "rejected": 2,
+        "interview": 1,
+        "assessment": 0,
+        "no_response": 0,
+        "other": 0,
+    }
+
+
+def test_stage_statuses_use_the_labels_of_the_model():
+    labels = {label.lower() for label in llm_utils.APPLICATION_STATUS_LABELS}
+
+    assert set(application_utils.LABEL_STAGES) == set(llm_utils.APPLICATION_STATUS_LABELS)
+    assert application_utils.STAGE_STATUSES == {
+        "assessment_at": {"assessment sent"},
+        "interview_at": {"interview invitation", "availability request"},
+        "offer_at": {"offer made"},
+        "rejected_at": {"rejection"},
+    }
+
+    assert application_utils.NON_RESPONSE_STATUSES <= labels
+    for statuses in application_utils.STAGE_STATUSES.values():
+        assert statuses <= labels
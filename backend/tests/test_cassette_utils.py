@@ -0,0 +1,92 @@
+import gzip
+import json
+from unittest import mock
+
+import pytest
+
+from perf.fake_gmail import FakeGmailService, SyntheticMailbox
+from perf.fake_llm import FakeGenerativeModel
+from utils import cassette_utils, llm_utils
+from utils.cassette_utils import (
+    Cassette,
+    CassetteMissError,
+    CassetteSettingsError,
+    RecordingGmailService,
+    RecordingModel,
+    ReplayGmailService,
+    ReplayModel,
+    RECORD,
+    REPLAY,
+)
+from utils.email_utils import get_email, get_email_ids
+
+
+def fetch_and_label(service, model):
+    with (
+        mock.patch.object(llm_utils, "model", model),
+        mock.patch.object(llm_utils, "rate_limiter", llm_utils.RateLimiter(0)),
+    ):
+        messages = get_email_ids(query="label:jobs", gmail_instance=service)
+        emails = [get_email(message["id"], gmail_instance=service) for message in messages]
+        labels = [llm_utils.process_email(email["text_content"]) for email in emails]
+    return emails, labels
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "cassettes" / "session.jsonl.gz")
+    mailbox = SyntheticMailbox(12, seed=3)
+
+    recording = Cassette(path, RECORD)
+    recorded_emails, recorded_labels = fetch_and_label(
+        RecordingGmailService(recording, FakeGmailService(mailbox, page_size=5)),
+        RecordingModel(recording, FakeGenerativeModel()),
+    )
+
+    replay = Cassette(path, REPLAY, latency_scale=0)
+    replayed_emails, replayed_labels = fetch_and_label(ReplayGmailService(replay), ReplayModel(replay))
+
+    assert replayed_labels == recorded_labels
+    assert [email["subject"] for email in replayed_emails] == [email["subject"] for email in recorded_emails]
+    # sender addresses are scrubbed, but stay the same for the same sender
+    assert all(email["from"].endswith("@example.com>") for email in replayed_emails)
+    assert "@example.com" not in recorded_emails[0]["from"]
+
+    with pytest.raises(CassetteMissError):
+        ReplayGmailService(replay).users().messages().get(userId="me", id="not-recorded").execute()
+
+
+def test_replay_recorded_errors(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    model = FakeGenerativeModel(rate_limit_ratio=1.0)
+    with pytest.raises(Exception, match="429"):
+        RecordingModel(Cassette(path, RECORD), model).generate_content("prompt")
+
+    with pytest.raises(Exception, match="429"):
+        ReplayModel(Cassette(path, REPLAY, latency_scale=0)).generate_content("prompt")
+
+
+def test_cassette_off_by_default():
+    service = object()
+    assert cassette_utils.gmail_service(lambda: service) is service
+    assert cassette_utils.wrap_model(service) is service
+
+
+def test_replay_needs_the_recorded_settings(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.jsonl.gz")
+    RecordingModel(Cassette(path, RECORD), FakeGenerativeModel()).generate_content("prompt")
+
+    monkeypatch.setattr(cassette_utils.settings, "RULE_EXTRACTION_ENABLED", False)
+    with pytest.raises(CassetteSettingsError, match="RULE_EXTRACTION_ENABLED"):
+        Cassette(path, REPLAY, latency_scale=0)
+
+
+def test_legacy_cassettes_replay_without_rule_extraction(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.jsonl.gz")
+    entry = {"service": "gemini", "method": "generate_content", "key": "", "response": {"text": "{}"}, "error": None, "latency": 0}
+    with gzip.open(path, "wt", encoding="utf-8") as cassette_file:
+        cassette_file.write(json.dumps(entry) + "\n")
+
+    with pytest.raises(CassetteSettingsError):
+        Cassette(path, REPLAY, latency_scale=0)
+    monkeypatch.setattr(cassette_utils.settings, "RULE_EXTRACTION_ENABLED", False)
+    assert ReplayModel(Cassette(path, REPLAY, latency_scale=0)).generate_content("prompt").text == "{}"
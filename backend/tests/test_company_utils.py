@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sqlmodel import Session, select
+
+from db.applications import Applications
+from db.user_emails import UserEmailData
+from db.users import Users
+from db.utils import company_utils, dictionary_utils
+from db.utils.user_email_utils import store_user_emails, user_emails_query
+
+
+def make_email(email_id: str, company_name: str, email_from: str):
+    return UserEmailData(
+        id=email_id,
+        user_id="123",
+        company_name=company_name,
+        application_status="Application confirmation",
+        received_at=datetime(2025, 1, int(email_id)),
+        subject="Your application",
+        job_title="Engineer",
+        email_from=email_from,
+    )
+
+
+def test_company_domain():
+    assert company_utils.company_domain("jobs.stripe.com") == "stripe.com"
+    assert company_utils.company_domain("careers.acme.co.uk") == "acme.co.uk"
+    assert company_utils.company_domain("us.greenhouse-mail.io") == ""
+    assert company_utils.company_domain("eu.greenhouse-mail.io") == ""
+    assert company_utils.company_domain("gmail.com") == ""
+
+
+def test_canonicalize_company_names(db_session: Session):
+    dictionary_utils.companies.ids(
+        db_session, [("Stripe", "stripe.com"), ("Goldman Sachs", "gs.com"), ("JPMorgan Chase", "")]
+    )
+    db_session.commit()
+
+    user_emails = [
+        make_email("1", "Stripe, Inc.", "no-reply@us.greenhouse-mail.io"),
+        make_email("2", "unknown", "Stripe Recruiting <jobs@stripe.com>"),
+        make_email("3", "Stripe Payments", "jobs@stripe.com"),
+        make_email("4", "Goldmann Sachs", "recruiter@gmail.com"),
+        make_email("5", "JP Morgan Chase & Co.", "jobs@jpmchase.com"),
+        make_email("6", "unknown", "recruiter@gmail.com"),
+        make_email("7", "Initech", "no-reply@us.greenhouse-mail.io"),
+        make_email("8", "Initech LLC", "no-reply@us.greenhouse-mail.io"),
+    ]
+    company_utils.canonicalize_company_names(db_session, user_emails)
+
+    assert [user_email.company_name for user_email in user_emails] == [
+        "Stripe", "Stripe", "Stripe", "Goldman Sachs", "JPMorgan Chase", "unknown", "Initech", "Initech",
+    ]
+
+
+def test_spellings_share_an_application(db_session: Session):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    store_user_emails(db_session, "123", [make_email("1", "Stripe", "jobs@stripe.com")])
+    db_session.commit()
+    store_user_emails(db_session, "123", [make_email("2", "Stripe Payments", "interviews@stripe.com")])
+    db_session.commit()
+
+    assert len(db_session.exec(select(Applications)).all()) == 1
+    assert set(db_session.exec(user_emails_query(["company_name"])).all()) == {"Stripe"}
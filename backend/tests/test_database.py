@@ -0,0 +1,81 @@
+import threading
+from unittest import mock
+
+import sqlalchemy as sa
+
+import database
+
+
+def make_router(lag_seconds):
+    router = database.ReplicaRouter(
+        mock.sentinel.primary, mock.sentinel.replica, max_lag_seconds=30.0, check_interval_seconds=5.0
+    )
+    router.replica_lag_seconds = mock.Mock(side_effect=lag_seconds)
+    return router
+
+
+def test_read_engine_follows_replica_lag():
+    router = make_router([1.0, 45.0, None])
+
+    with mock.patch("database.time.monotonic", side_effect=[0.0, 1.0, 10.0, 20.0]):
+        assert router.read_engine() is mock.sentinel.replica
+        # checked again only after check_interval_seconds
+        assert router.read_engine() is mock.sentinel.replica
+        # too far behind
+        assert router.read_engine() is mock.sentinel.primary
+        # unreachable
+        assert router.read_engine() is mock.sentinel.primary
+
+    assert router.replica_lag_seconds.call_count == 3
+
+
+def test_read_engine_does_not_wait_for_a_lag_check():
+    router = make_router([1.0])
+    checking, finish_check = threading.Event(), threading.Event()
+
+    def slow_check():
+        checking.set()
+        finish_check.wait(5)
+        return 1.0
+
+    router.replica_lag_seconds = slow_check
+    check = threading.Thread(target=router.read_engine)
+    check.start()
+    checking.wait(5)
+    # served from the last decision while the check is running
+    assert router.read_engine() is mock.sentinel.primary
+    finish_check.set()
+    check.join(5)
+    assert router.read_engine() is mock.sentinel.replica
+
+
+def test_read_engine_without_replica_is_primary():
+    router = database.ReplicaRouter(mock.sentinel.primary, None, max_lag_seconds=30.0, check_interval_seconds=5.0)
+
+    assert router.read_engine() is mock.sentinel.primary
+
+
+def test_replica_lag_seconds(engine):
+    # a primary isn't in recovery, so it reports no lag
+    assert database.ReplicaRouter(engine, engine, 30.0, 5.0).replica_lag_seconds() == 0
+    unreachable = sa.create_engine("postgresql://postgres@127.0.0.1:1/postgres")
+    assert database.ReplicaRouter(engine, unreachable, 30.0, 5.0).replica_lag_seconds() is None
+    # e.g. a replica that isn't streaming from the primary
+    router = database.ReplicaRouter(engine, engine, 30.0, 5.0)
+    router.LAG_QUERY = sa.text("SELECT NULL")
+    assert router.replica_lag_seconds() is None
+
+
+def test_read_only_request_session_rejects_writes(engine):
+    sessions = database.read_only_request_session()
+    session = next(sessions)
+
+    assert session.info["read_only"]
+    try:
+        session.exec(sa.text("CREATE TEMPORARY TABLE t (id int)"))
+    except sa.exc.InternalError as e:
+        assert "read-only transaction" in str(e)
+    else:
+        raise AssertionError("write was allowed")
+    finally:
+        sessions.close()
@@ -0,0 +1,53 @@
+import importlib.util
+from pathlib import Path
+
+from sqlmodel import Session, select
+
+from db.companies import Companies
+from db.utils import dictionary_utils
+
+
+def test_sender_domain():
+    assert dictionary_utils.sender_domain("Acme Careers <Jobs@Acme.COM>") == "acme.com"
+    assert dictionary_utils.sender_domain("jobs@acme.com") == "acme.com"
+    assert dictionary_utils.sender_domain("unknown") == ""
+
+
+def test_migration_backfills_the_same_sender_domains():
+    path = Path(dictionary_utils.__file__).parents[2] / "alembic/versions/7c3e9a1f5d28_dictionary_encode_user_emails.py"
+    spec = importlib.util.spec_from_file_location("dictionary_encode_user_emails", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    for email_from in [
+        "Acme Careers <Jobs@Acme.COM>",
+        "jobs@acme.com",
+        "no-reply@us.greenhouse-mail.io",
+        '"Acme, Inc. <talent@acme.com>" <no-reply@Mail.Acme.com>',
+        "jobs@acme.com (Acme Careers)",
+        "  JOBS@ACME.COM  ",
+        "unknown",
+        "",
+        None,
+    ]:
+        assert migration.sender_domain(email_from) == dictionary_utils.sender_domain(email_from), email_from
+
+
+def test_ids_are_cached_once_committed(db_session: Session):
+    companies = dictionary_utils.companies
+
+    ids = companies.ids(db_session, [("Acme", "acme.com"), ("Globex", "")])
+    # an id inserted by an uncommitted transaction isn't cached
+    assert companies.cache == {}
+    db_session.rollback()
+    assert db_session.exec(select(Companies)).all() == []
+
+    ids = companies.ids(db_session, [("Acme", "acme.com")])
+    # still not cached when looked up again before the commit
+    assert companies.ids(db_session, [("Acme", "acme.com")]) == ids
+    assert companies.cache == {}
+    db_session.commit()
+    assert companies.ids(db_session, [("Acme", "acme.com")]) == ids
+    assert companies.cache == ids
+    # an id that is already stored is the same
+    assert companies.ids(db_session, [("Acme", "acme.com"), ("Globex", "")])[("Acme", "acme.com")] == ids[("Acme", "acme.com")]
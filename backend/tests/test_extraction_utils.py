@@ -0,0 +1,94 @@
+import pytest
+
+from constants import ATS_SENDER_DOMAINS, GENERIC_ATS_DOMAINS
+from utils import extraction_utils
+from utils.extraction_utils import ExtractedFields, extract_email_fields
+
+
+def test_domain_trie_matches_the_longest_suffix():
+    trie = extraction_utils.DomainTrie()
+    trie.add("lever.co", "lever")
+    trie.add("jobs.lever.co", "jobs")
+
+    assert trie.get("hire.lever.co") == "lever"
+    assert trie.get("eu.jobs.lever.co") == "jobs"
+    assert trie.get("clever.co") is None
+    assert trie.get("co", "none") == "none"
+
+
+def test_sender_kind():
+    assert extraction_utils.sender_kind("Acme <no-reply@eu.greenhouse-mail.io>") == "greenhouse"
+    assert extraction_utils.sender_kind("tenant@myworkday.com") == extraction_utils.ATS
+    assert extraction_utils.sender_kind("recruiter@gmail.com") == extraction_utils.PERSONAL
+    assert extraction_utils.sender_kind("jobs@stripe.com") == extraction_utils.COMPANY
+    assert all(extraction_utils.sender_kind(f"x@{domain}") != extraction_utils.COMPANY for domain in GENERIC_ATS_DOMAINS)
+
+
+@pytest.mark.parametrize(
+    "subject, email_from, email_text, expected",
+    [
+        (
+            "Thank you for applying to Acme!",
+            "Acme <no-reply@us.greenhouse-mail.io>",
+            "Thanks for your interest in Acme! We received your application for Senior Software Engineer, and we",
+            ExtractedFields("Acme", "Senior Software Engineer", "Application confirmation"),
+        ),
+        (
+            "Sam, your application was sent to Pied Piper",
+            "jobs-noreply@linkedin.com",
+            "",
+            ExtractedFields("Pied Piper", "", "Application confirmation"),
+        ),
+        (
+            "Interview invitation: Product Manager at Globex",
+            "recruiter@globex.com",
+            "",
+            ExtractedFields("Globex", "Product Manager", "Interview invitation"),
+        ),
+        (
+            "Your application to Initech",
+            "no-reply@initech.com",
+            "We received your application for the Data Engineer position. Unfortunately, we have decided not to move forward.",
+            ExtractedFields("Initech", "Data Engineer", ""),
+        ),
+        (
+            "Your application to Initech",
+            "no-reply@initech.com",
+            "We received your application for the Data Engineer position. The position has been filled.",
+            ExtractedFields("Initech", "Data Engineer", ""),
+        ),
+        # alerts and recommendations name companies and titles without being about an application
+        (
+            "Sam, your application was sent to Pied Piper",
+            "jobs-noreply@linkedin.com",
+            "Jobs you may like: Senior Engineer at Hooli",
+            ExtractedFields(),
+        ),
+        (
+            "Job alert: Data Engineer at Globex",
+            "alerts@globex.com",
+            "We received your application for the Data Engineer position at Globex.",
+            ExtractedFields(),
+        ),
+        ("Acme is hiring", "news@acme.com", "Interest in the Designer role at Acme.", ExtractedFields()),
+        ("Thank you for applying to us", "no-reply@acme.com", "", ExtractedFields()),
+        ("Quick chat?", "recruiter@gmail.com", "Are you open to new roles?", ExtractedFields()),
+    ],
+)
+def test_extract_email_fields(subject, email_from, email_text, expected):
+    assert extract_email_fields(subject, email_from, email_text) == expected
+
+
+def test_every_tracking_system_has_templates():
+    assert set(ATS_SENDER_DOMAINS) == set(extraction_utils.ATS_TEMPLATES)
+
+
+def test_company_of_a_known_sender_domain():
+    fields = extract_email_fields(
+        "Thank you!",
+        "jobs@stripe.com",
+        "We have received your application for the Data Scientist position.",
+        company_for_domain=lambda email_from: "Stripe",
+    )
+
+    assert fields == ExtractedFields("Stripe", "Data Scientist", "Application confirmation")
@@ -0,0 +1,87 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+from perf.fake_gmail import FakeGmailService, SyntheticMailbox, USER_EMAIL
+from perf.fake_llm import FakeGenerativeModel
+from db.processing_tasks import TaskRuns, FINISHED
+from db.user_emails import UserEmails
+from db.utils.user_email_utils import user_emails_query
+from db.users import Users
+from routes.email_routes import fetch_emails_to_db
+from utils import llm_utils
+from utils.email_utils import get_email, get_email_ids
+
+
+def test_fake_gmail_service_lists_and_gets_messages():
+    mailbox = SyntheticMailbox(250, attachment_ratio=0.5, html_ratio=0.5)
+    service = FakeGmailService(mailbox, page_size=100)
+
+    message_ids = get_email_ids(query="anything", gmail_instance=service)
+    assert len(message_ids) == 250
+    assert service.calls["messages.list"] == 3
+
+    email_data = get_email(message_ids[0]["id"], gmail_instance=service)
+    assert email_data["subject"]
+    assert email_data["text_content"]
+
+
+def test_fake_gmail_service_history_and_batch():
+    mailbox = SyntheticMailbox(10)
+    service = FakeGmailService(mailbox, page_size=4)
+
+    response = service.users().history().list(userId="me", startHistoryId=mailbox.history_id(4)).execute()
+    assert [h["messagesAdded"][0]["message"]["id"] for h in response["history"]] == [
+        mailbox.message_id(index) for index in range(5, 9)
+    ]
+    assert response["nextPageToken"]
+
+    responses = {}
+    batch = service.new_batch_http_request(
+        callback=lambda request_id, response, exception: responses.update({request_id: response})
+    )
+    for message_id in mailbox.message_ids[:3]:
+        batch.add(service.users().messages().get(userId="me", id=message_id), request_id=message_id)
+    batch.execute()
+    assert set(responses) == set(mailbox.message_ids[:3])
+
+
+def test_fetch_emails_to_db_with_fake_services(db_session: Session):
+    user_id = "123"
+    db_session.add(Users(user_id=user_id, user_email=USER_EMAIL, start_date=datetime(2000, 1, 1)))
+    db_session.commit()
+
+    mailbox = SyntheticMailbox(30, seed=1)
+    service = FakeGmailService(mailbox)
+    model = FakeGenerativeModel(rate_limit_ratio=0.1, seed=1)
+    with (
+        mock.patch("routes.email_routes.build", return_value=service),
+        mock.patch.object(llm_utils, "model", model),
+        mock.patch.object(llm_utils, "rate_limiter", llm_utils.RateLimiter(0)),
+        mock.patch.object(llm_utils, "RATE_LIMIT_RETRY_DELAY_SECONDS", 0),
+    ):
+        fetch_emails_to_db(
+            SimpleNamespace(creds=None, user_id=user_id, user_email=USER_EMAIL),
+            Request({"type": "http", "session": {}}),
+            user_id=user_id,
+        )
+
+    assert service.calls["messages.get"] == 30
+    assert model.rate_limited_calls > 0
+    task_run = db_session.get(TaskRuns, user_id)
+    assert task_run.status == FINISHED
+    assert task_run.processed_emails == 30
+    stages = task_run.metrics_summary["stages"]
+    assert {
+        f"ingest_stage_seconds:{stage}" for stage in ("list", "get", "parse", "html_to_text", "llm", "db_write")
+    } <= set(stages)
+    assert stages["ingest_stage_seconds:get"]["count"] == 30
+    assert task_run.metrics_summary["counters"]["ingest_emails_total"] == 30
+
+    stored = db_session.exec(user_emails_query().where(UserEmails.user_id == user_id)).all()
+    # newsletters are false positives and never stored
+    assert 0 < len(stored) < 30
+    assert all(email.company_name != "unknown" for email in stored)
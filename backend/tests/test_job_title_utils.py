@@ -0,0 +1,63 @@
+from sqlmodel import Session, select
+
+from db.job_titles import JobTitles
+from db.utils import dictionary_utils, job_title_utils
+from jobs.assign_role_families import assign_role_families
+
+
+def test_assign_role_families(db_session: Session):
+    titles = [
+        "Sr. Software Engineer",
+        "Senior SWE",
+        "Software Engineering Intern",
+        "Product Manager II",
+        "unknown",
+    ]
+    dictionary_utils.job_titles.ids(db_session, [(title,) for title in titles])
+
+    assert job_title_utils.assign_role_families(db_session) == 5
+    assert job_title_utils.assign_role_families(db_session) == 0
+    assert dict(db_session.exec(select(JobTitles.job_title, JobTitles.role_family)).all()) == {
+        "Sr. Software Engineer": "software engineer",
+        "Senior SWE": "software engineer",
+        "Software Engineering Intern": "software engineer",
+        "Product Manager II": "product manager",
+        "unknown": "",
+    }
+
+
+def test_assign_role_families_of_some_titles(db_session: Session):
+    ids = dictionary_utils.job_titles.ids(db_session, [("Senior SWE",), ("Product Manager II",)])
+
+    assert job_title_utils.assign_role_families(db_session, [ids[("Senior SWE",)]]) == 1
+    assert dict(db_session.exec(select(JobTitles.job_title, JobTitles.role_family)).all()) == {
+        "Senior SWE": "software engineer",
+        "Product Manager II": None,
+    }
+
+
+def test_assign_role_families_job(db_session: Session):
+    dictionary_utils.job_titles.ids(db_session, [("Senior SWE",), ("Product Manager II",), ("Data Scientist",)])
+    db_session.commit()
+
+    assert assign_role_families(batch_size=2) == 3
+    assert None not in db_session.exec(select(JobTitles.role_family)).all()
+
+
+def test_role_families_are_read_back(db_session: Session):
+    dictionary_utils.job_titles.ids(db_session, [("Software Engineer",)])
+    job_title_utils.assign_role_families(db_session)
+    db_session.commit()
+    # another process clusters new titles with the families stored so far
+    job_title_utils.role_families.clear()
+    dictionary_utils.job_titles.ids(db_session, [("Software Engineering Lead",)])
+
+    job_title_utils.assign_role_families(db_session)
+
+    assert job_title_utils.get_role_families(
+        db_session, ["Software Engineering Lead", "Staff Data Scientist"]
+    ) == {
+        "Software Engineering Lead": "software engineer",
+        # not stored yet, so only parsed
+        "Staff Data Scientist": "data scientist",
+    }
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from utils import llm_utils
+
+
+def test_process_emails_batch_returns_one_result_per_email():
+    batch_response = [
+        {"company_name": "Acme", "job_application_status": "Rejection", "job_title": "Engineer"},
+        {"job_application_status": "False positive"},
+    ]
+    with mock.patch("utils.llm_utils.generate_json", return_value=batch_response) as mock_generate:
+        results = llm_utils.process_emails_batch(["first email", "second email"])
+
+    assert results == batch_response
+    mock_generate.assert_called_once()
+    prompt = mock_generate.call_args.args[0]
+    assert "Email 1:\nfirst email" in prompt
+    assert "Email 2:\nsecond email" in prompt
+
+
+def test_process_emails_batch_falls_back_to_single_emails():
+    single_response = {"company_name": "Acme", "job_application_status": "Rejection", "job_title": "Engineer"}
+    # the model only answered for one of the two emails
+    with mock.patch(
+        "utils.llm_utils.generate_json", side_effect=[[single_response], single_response, None]
+    ) as mock_generate:
+        results = llm_utils.process_emails_batch(["first email", "second email"])
+
+    assert results == [single_response, None]
+    assert mock_generate.call_count == 3
+
+
+def test_rate_limiter_spaces_out_calls():
+    rate_limiter = llm_utils.RateLimiter(requests_per_minute=60)
+    with mock.patch("utils.llm_utils.time") as mock_time:
+        mock_time.monotonic.return_value = 100.0
+        rate_limiter.wait()
+        rate_limiter.wait()
+
+    mock_time.sleep.assert_called_once_with(1.0)
+    assert rate_limiter.calls == 2
+
+
+def test_rate_limiter_disabled():
+    rate_limiter = llm_utils.RateLimiter(requests_per_minute=0)
+    with mock.patch("utils.llm_utils.time") as mock_time:
+        rate_limiter.wait()
+        rate_limiter.wait()
+
+    mock_time.sleep.assert_not_called()
+
+
+def test_process_email_with_rules_asks_the_model_for_the_status_only():
+    with mock.patch(
+        "utils.llm_utils.generate_json", return_value={"job_application_status": "Rejection"}
+    ) as mock_generate:
+        result = llm_utils.process_email_with_rules(
+            "Your application to Acme", "no-reply@ashbyhq.com", "About your application for the Data Engineer role."
+        )
+
+    assert result == {"company_name": "Acme", "job_application_status": "Rejection", "job_title": "Data Engineer"}
+    assert llm_utils.STATUS_RESPONSE_FORMAT in mock_generate.call_args.args[0]
+
+
+def test_process_email_with_rules_without_the_model():
+    with mock.patch("utils.llm_utils.generate_json") as mock_generate:
+        result = llm_utils.process_email_with_rules(
+            "Thank you for applying to Acme",
+            "no-reply@acme.com",
+            "We have received your application for the Backend Engineer position.",
+        )
+
+    assert result == {
+        "company_name": "Acme", "job_application_status": "Application confirmation", "job_title": "Backend Engineer"
+    }
+    mock_generate.assert_not_called()
+
+
+def test_process_email_with_rules_falls_back_to_the_model():
+    response = {"company_name": "Acme", "job_application_status": "Offer made", "job_title": "Engineer"}
+    with mock.patch("utils.llm_utils.generate_json", return_value=response) as mock_generate:
+        result = llm_utils.process_email_with_rules("Good news", "recruiter@gmail.com", "We'd like to make you an offer")
+
+    assert result == response
+    assert llm_utils.STATUS_RESPONSE_FORMAT not in mock_generate.call_args.args[0]
+
+
+def test_process_email_with_rules_leaves_job_alerts_to_the_model():
+    response = {"job_application_status": "False positive"}
+    with mock.patch("utils.llm_utils.generate_json", return_value=response) as mock_generate:
+        result = llm_utils.process_email_with_rules(
+            "Job alert: Backend Engineer at Acme",
+            "alerts@acme.com",
+            "We have received your application for the Backend Engineer position.",
+        )
+
+    assert result == response
+    assert llm_utils.STATUS_RESPONSE_FORMAT not in mock_generate.call_args.args[0]
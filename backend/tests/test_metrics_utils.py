@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from utils import metrics_utils
+from utils.metrics_utils import Counter, Gauge, Histogram, Registry
+
+
+def test_render_prometheus_text_format():
+    registry = Registry()
+    emails = Counter("emails_total", "Emails seen.", labelnames=("outcome",), registry=registry)
+    in_flight = Gauge("in_flight", "Things running.", registry=registry)
+    latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0), registry=registry)
+
+    emails.inc(outcome="stored")
+    emails.inc(2, outcome="stored")
+    emails.inc(outcome='say "hi"')
+    in_flight.set(3)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP emails_total Emails seen.",
+        "# TYPE emails_total counter",
+        'emails_total{outcome="stored"} 3.0',
+        'emails_total{outcome="say \\"hi\\""} 1.0',
+        "# HELP in_flight Things running.",
+        "# TYPE in_flight gauge",
+        "in_flight 3.0",
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1.0',
+        'latency_seconds_bucket{le="1.0"} 2.0',
+        'latency_seconds_bucket{le="+Inf"} 3.0',
+        "latency_seconds_count 3.0",
+        "latency_seconds_sum 5.55",
+    ]
+
+
+def test_collect_run_summarizes_only_its_own_observations():
+    registry = Registry()
+    stage_seconds = Histogram("stage_seconds", "Stages.", labelnames=("stage",), registry=registry)
+    emails = Counter("emails_total", "Emails.", registry=registry)
+    tokens = Counter("tokens_total", "Tokens.", labelnames=("kind",), registry=registry)
+
+    stage_seconds.observe(1.0, stage="get")
+    with metrics_utils.collect_run() as run:
+        stage_seconds.observe(0.25, stage="get")
+        stage_seconds.observe(0.75, stage="get")
+        stage_seconds.observe(2.0, stage="llm")
+        emails.inc()
+        tokens.inc(10, kind="input")
+
+    assert run.summary() == {
+        "stages": {
+            "stage_seconds:get": {"count": 2, "seconds": 1.0, "max_seconds": 0.75},
+            "stage_seconds:llm": {"count": 1, "seconds": 2.0, "max_seconds": 2.0},
+        },
+        "counters": {"emails_total": 1, "tokens_total:input": 10},
+    }
+    assert stage_seconds.count(stage="get") == 3
+
+
+def test_metrics_need_a_collector():
+    class Untyped(metrics_utils.Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Untyped("untyped", "No collector.", registry=Registry())
+
+
+def test_stage_tracks_in_flight():
+    with metrics_utils.stage("parse"):
+        assert metrics_utils.INGEST_STAGE_IN_FLIGHT.get(stage="parse") == 1
+    assert metrics_utils.INGEST_STAGE_IN_FLIGHT.get(stage="parse") == 0
+
+
+def test_multiprocess_mode_adds_up_every_worker(tmp_path):
+    backend = Path(metrics_utils.__file__).resolve().parent.parent
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+
+    def run(code: str) -> str:
+        return subprocess.run(
+            [sys.executable, "-c", f"from utils import metrics_utils; {code}"],
+            cwd=backend, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+
+    # two workers, each serving part of the traffic
+    run("metrics_utils.LLM_RATE_LIMITED.inc(2)")
+    run("metrics_utils.LLM_RATE_LIMITED.inc(3)")
+
+    assert "llm_rate_limited_total 5.0" in run("print(metrics_utils.REGISTRY.render())")
@@ -0,0 +1,72 @@
+import pytest
+
+from utils.normalization_utils import (
+    NGramIndex,
+    normalize_company_name,
+    normalize_job_title,
+    normalize_status,
+    parse_job_title,
+)
+
+
+@pytest.mark.parametrize(
+    "company_name, expected",
+    [
+        ("Acme, Inc.", "acme"),
+        ("ACME", "acme"),
+        ("The Acme Company LLC", "acme"),
+        ("Co", "co"),
+        ("AT&T", "at&t"),
+        ("unknown", ""),
+        ("", ""),
+        (None, ""),
+    ],
+)
+def test_normalize_company_name(company_name, expected):
+    assert normalize_company_name(company_name) == expected
+
+
+@pytest.mark.parametrize(
+    "job_title, expected",
+    [
+        ("Sr. Software Eng.", "senior software engineer"),
+        ("Senior  Software Engineer", "senior software engineer"),
+        ("C++ Developer", "c++ developer"),
+        ("R&D Mgr", "r&d manager"),
+        ("Unknown", ""),
+    ],
+)
+def test_normalize_job_title(job_title, expected):
+    assert normalize_job_title(job_title) == expected
+
+
+@pytest.mark.parametrize(
+    "job_title, expected",
+    [
+        ("Senior Software Engineer II", ("software engineer", "senior", "ii")),
+        ("Sr. SWE", ("software engineer", "senior", "")),
+        ("Software Engineer, Payments (Remote)", ("software engineer", "", "")),
+        ("Staff Full Stack Developer - Contract", ("full stack engineer", "staff", "")),
+        ("ML Engineer L5 @ Acme", ("machine learning engineer", "", "l5")),
+        ("Unknown", ("", "", "")),
+    ],
+)
+def test_parse_job_title(job_title, expected):
+    assert parse_job_title(job_title) == expected
+
+
+def test_normalize_status():
+    assert normalize_status(" Offer made ") == "offer made"
+    assert normalize_status("Unknown") == ""
+
+
+def test_ngram_index_best_match():
+    index = NGramIndex(size=3)
+    for key in ["goldmansachs", "meta", "jpmorganchase"]:
+        index.add(key)
+
+    assert index.best_match("goldmannsachs", 0.6)[0] == "goldmansachs"
+    assert index.best_match("jpmorganchase&", 0.6)[0] == "jpmorganchase"
+    assert index.best_match("metal", 0.6) is None
+    assert index.best_match("meta", 0.6) == ("meta", 1.0)
+    assert len(index) == 3 and "meta" in index
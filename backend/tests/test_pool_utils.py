@@ -0,0 +1,29 @@
+import pytest
+import sqlalchemy as sa
+
+from utils import metrics_utils
+from utils.pool_utils import InstrumentedQueuePool, track_connections_in_use
+
+
+def test_pool_reports_connections_in_use_and_timeouts(engine):
+    test_engine = sa.create_engine(
+        engine.url,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name="test",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    track_connections_in_use(test_engine.pool)
+    checkouts_before = metrics_utils.DB_POOL_CHECKOUT_WAIT_SECONDS.count(pool="test")
+    timeouts_before = metrics_utils.DB_POOL_TIMEOUTS.get(pool="test")
+
+    with test_engine.connect():
+        assert metrics_utils.DB_POOL_CONNECTIONS_IN_USE.get(pool="test") == 1
+        with pytest.raises(sa.exc.TimeoutError):
+            test_engine.connect()
+
+    assert metrics_utils.DB_POOL_CONNECTIONS_IN_USE.get(pool="test") == 0
+    assert metrics_utils.DB_POOL_TIMEOUTS.get(pool="test") == timeouts_before + 1
+    assert metrics_utils.DB_POOL_CHECKOUT_WAIT_SECONDS.count(pool="test") == checkouts_before + 2
+    test_engine.dispose()
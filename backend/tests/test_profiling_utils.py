@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from utils.profiling_utils import SamplingProfilerMiddleware, route_filename
+
+
+def busy_handler(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class FakeRoute:
+    path = "/items/{item_id}"
+
+
+async def app(scope, receive, send):
+    scope["route"] = FakeRoute()
+    busy_handler(0.1)
+
+
+def test_sampling_profiler_writes_folded_stacks_per_route(tmp_path):
+    middleware = SamplingProfilerMiddleware(app, sample_rate=1.0, interval=0.001, output_dir=str(tmp_path))
+
+    asyncio.run(middleware({"type": "http", "method": "GET"}, None, None))
+
+    profile = tmp_path / "GET_items_item_id.folded"
+    for _ in range(100):  # the sampler thread writes the file once it stops
+        if profile.exists():
+            break
+        time.sleep(0.01)
+    lines = profile.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("busy_handler" in line for line in lines)
+
+
+def test_sampling_profiler_skips_unsampled_requests(tmp_path):
+    middleware = SamplingProfilerMiddleware(app, sample_rate=0.0, output_dir=str(tmp_path))
+
+    asyncio.run(middleware({"type": "http", "method": "GET"}, None, None))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_route_filename():
+    assert route_filename("DELETE", "/delete-email/{email_id}") == "DELETE_delete-email_email_id.folded"
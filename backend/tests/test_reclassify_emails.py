@@ -0,0 +1,113 @@
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from db.users import Users
+from db.user_emails import UserEmailData, UserEmails
+from db.applications import Applications
+from db.reclassification_tasks import ReclassificationRuns, STARTED, FINISHED
+from db.utils.user_email_utils import add_user_emails, user_emails_query
+from jobs import reclassify_emails
+from utils.llm_utils import PROMPT_VERSION
+
+
+def add_user_with_emails(db_session: Session, user_id: str, num_emails: int):
+    db_session.add(
+        Users(user_id=user_id, user_email=f"{user_id}@example.com", start_date=datetime(2000, 1, 1))
+    )
+    add_user_emails(db_session, [
+        UserEmailData(
+            id=f"{user_id}-{i}",
+            user_id=user_id,
+            company_name="Acme",
+            application_status="Application confirmation",
+            received_at=datetime(2025, 1, i + 1),
+            subject=f"Interview with Acme {i}",
+            job_title="Engineer",
+            email_from="jobs@acme.com",
+        )
+        for i in range(num_emails)
+    ])
+    db_session.commit()
+
+
+def label_as_interviews(email_texts):
+    return [
+        {"company_name": "Acme", "job_application_status": "Interview invitation", "job_title": ""}
+        for _ in email_texts
+    ]
+
+
+def test_reclassify_emails(db_session: Session):
+    add_user_with_emails(db_session, "123", 3)
+
+    with mock.patch(
+        "jobs.reclassify_emails.process_emails_batch", side_effect=label_as_interviews
+    ) as mock_batch:
+        reclassify_emails.reclassify_emails(max_llm_calls=10, batch_size=2)
+
+    assert mock_batch.call_count == 2
+    db_session.expire_all()
+    emails = db_session.exec(user_emails_query()).all()
+    assert {email.application_status for email in emails} == {"Interview invitation"}
+    assert {email.prompt_version for email in emails} == {PROMPT_VERSION}
+    # the model did not find a title, so the stored one is kept
+    assert {email.job_title for email in emails} == {"Engineer"}
+    application = db_session.exec(select(Applications).where(Applications.user_id == "123")).one()
+    assert application.status_counts == {"interview invitation": 3}
+    assert {email.application_id for email in emails} == {application.id}
+
+    run = db_session.get(ReclassificationRuns, "123")
+    assert run.status == FINISHED
+    assert run.processed_emails == 3
+    assert run.total_emails == 3
+
+
+def test_reclassify_emails_resumes_after_budget(db_session: Session):
+    add_user_with_emails(db_session, "123", 5)
+
+    def label_with_one_call(email_texts):
+        reclassify_emails.llm_utils.rate_limiter.calls += 1
+        return label_as_interviews(email_texts)
+
+    with mock.patch(
+        "jobs.reclassify_emails.process_emails_batch", side_effect=label_with_one_call
+    ) as mock_batch:
+        reclassify_emails.reclassify_emails(max_llm_calls=3, batch_size=5)
+
+        # a batch of n emails takes up to n + 1 calls if the model's answer doesn't match up
+        assert [len(call.args[0]) for call in mock_batch.call_args_list] == [2, 1, 1]
+        run = db_session.get(ReclassificationRuns, "123")
+        assert run.status == STARTED
+        assert run.processed_emails == 4
+
+        reclassify_emails.reclassify_emails(max_llm_calls=1, batch_size=5)
+
+    db_session.expire_all()
+    run = db_session.get(ReclassificationRuns, "123")
+    assert run.status == FINISHED
+    assert run.processed_emails == 5
+    assert run.llm_calls == 4
+
+
+def test_reclassify_emails_keeps_more_specific_labels(db_session: Session):
+    add_user_with_emails(db_session, "123", 3)
+    results = [
+        {"job_application_status": "False positive"},
+        {"company_name": "", "job_application_status": "Rejection", "job_title": ""},
+        {"company_name": "Acme", "job_application_status": "Rejection", "job_title": "Designer"},
+    ]
+
+    with mock.patch("jobs.reclassify_emails.process_emails_batch", return_value=results):
+        reclassify_emails.reclassify_emails(max_llm_calls=10, batch_size=3)
+
+    db_session.expire_all()
+    emails = db_session.exec(user_emails_query().order_by(UserEmails.id)).all()
+    assert [(email.application_status, email.job_title) for email in emails] == [
+        ("Application confirmation", "Engineer"),
+        ("Application confirmation", "Engineer"),
+        ("Rejection", "Designer"),
+    ]
+    assert {email.prompt_version for email in emails} == {PROMPT_VERSION}
@@ -0,0 +1,48 @@
+from unittest import mock
+
+import orjson
+
+from utils import sankey_utils
+
+STAGE_COUNTS = {
+    "applications": 10,
+    "offer": 1,
+    "rejected": 4,
+    "interview": 2,
+    "assessment": 0,
+    "no_response": 3,
+    "other": 0,
+}
+
+
+def test_svg_has_a_band_per_non_empty_stage():
+    svg = sankey_utils.sankey_svg(STAGE_COUNTS)
+
+    assert svg.startswith("<svg")
+    assert svg.count("<path") == 4
+    assert "Applications (10)" in svg
+    assert "Rejected (4)" in svg
+    assert "Assessment (0)" not in svg
+
+
+def test_json_is_the_plotly_figure():
+    figure = orjson.loads(sankey_utils.render_sankey(STAGE_COUNTS, "json"))
+
+    sankey = figure["data"][0]
+    assert sankey["type"] == "sankey"
+    assert sankey["link"]["value"] == [1, 4, 2, 0, 3, 0]
+
+
+def test_png_is_rendered_once_per_counts():
+    sankey_utils.sankey_cache.clear()
+    with mock.patch("utils.sankey_utils.get_render_pool") as mock_pool:
+        mock_pool.return_value.submit.return_value.result.return_value = b"png"
+
+        assert sankey_utils.render_sankey(STAGE_COUNTS, "png") == b"png"
+        assert sankey_utils.render_sankey(dict(STAGE_COUNTS), "png") == b"png"
+        assert sankey_utils.render_sankey({**STAGE_COUNTS, "offer": 2}, "png") == b"png"
+
+    assert mock_pool.return_value.submit.call_count == 2
+    function, figure_json = mock_pool.return_value.submit.call_args.args
+    assert function is sankey_utils.figure_to_png
+    assert orjson.loads(figure_json)["data"][0]["link"]["value"][0] == 2
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from utils.sketch_utils import QuantileSketch
+
+
+def test_quantiles_are_within_relative_accuracy():
+    values = [random.Random(0).lognormvariate(3, 1) for _ in range(10_000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    values.sort()
+    for q in (0.1, 0.5, 0.9, 0.99):
+        expected = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.01)
+
+
+def test_merge_and_remove():
+    left, right, combined = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in [0, 1, 2, 3]:
+        left.add(value)
+        combined.add(value)
+    for value in [10, 20, 30]:
+        right.add(value)
+        combined.add(value)
+
+    left.merge(right)
+    assert left.to_dict() == combined.to_dict()
+
+    for value in [10, 20, 30]:
+        left.remove(value)
+    assert left.count == 4
+    assert left.quantile(0) == 0.0
+    assert left.quantile(1) == pytest.approx(3, rel=0.01)
+    with pytest.raises(ValueError):
+        left.remove(30)
+
+
+def test_rank_and_round_trip():
+    sketch = QuantileSketch()
+    for value in range(1, 101):
+        sketch.add(value)
+
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+
+    assert restored.rank(50) == pytest.approx(0.5, abs=0.02)
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    assert QuantileSketch().quantile(0.5) is None
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+import re
+
+import sqlalchemy as sa
+
+from sqlmodel import Session, select
+
+from db.applications import Applications
+from db.user_emails import UserEmailData, UserEmails
+from db.users import Users
+from db.utils import user_email_utils
+from db.utils.application_utils import refresh_user_analytics
+
+
+def make_email(email_id: str, company_name: str, status: str, received_at: datetime, subject="Your application"):
+    return UserEmailData(
+        id=email_id,
+        user_id="123",
+        company_name=company_name,
+        application_status=status,
+        received_at=received_at,
+        subject=subject,
+        job_title="Engineer",
+        email_from="jobs@example.com",
+    )
+
+
+def store(db_session: Session, user_emails):
+    refresh_user_analytics(db_session, "123", user_email_utils.store_user_emails(db_session, "123", user_emails))
+    db_session.commit()
+    db_session.expire_all()
+
+
+def test_copy_matches_orm_path(db_session: Session, monkeypatch):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    monkeypatch.setattr(user_email_utils.settings, "COPY_MIN_EMAILS", 2)
+    store(db_session, [make_email("1", "Acme", "Application confirmation", datetime(2025, 1, 1))])
+
+    store(
+        db_session,
+        [
+            make_email("2", "Acme", "Rejection", datetime(2025, 1, 3, tzinfo=timezone(timedelta(hours=-5)))),
+            make_email("3", "Globex", "Offer made", datetime(2025, 1, 4, tzinfo=timezone.utc), subject="Tab\there, new\nline \\ and \\N"),
+        ],
+    )
+
+    emails = {user_email.id: user_email for user_email in db_session.exec(select(UserEmails)).all()}
+    assert emails["2"].received_at == datetime(2025, 1, 3, 5)
+    assert emails["3"].subject == "Tab\there, new\nline \\ and \\N"
+    assert emails["3"].prompt_version is None
+    acme = db_session.exec(select(Applications).where(Applications.company_key == "acme")).one()
+    assert emails["1"].application_id == emails["2"].application_id == acme.id
+    assert acme.email_count == 2
+    assert acme.last_status == "rejection"
+
+
+def test_copy_replaces_stored_emails(db_session: Session):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    store(db_session, [make_email("1", "Acme", "Application confirmation", datetime(2025, 1, 1))])
+    acme_id = db_session.exec(select(Applications.id)).one()
+
+    relabeled = make_email("1", "Globex", "Interview invitation", datetime(2025, 1, 1))
+    application_ids = user_email_utils.assign_applications(db_session, "123", [relabeled])
+    application_ids |= user_email_utils.copy_user_emails(db_session, [relabeled])
+    refresh_user_analytics(db_session, "123", application_ids)
+    db_session.commit()
+
+    stored = db_session.exec(user_email_utils.user_emails_query()).one()
+    assert (stored.company_name, stored.application_status) == ("Globex", "Interview invitation")
+    # the application the email was moved out of is refreshed, and deleted as it is now empty
+    assert acme_id in application_ids
+    assert db_session.exec(select(Applications.company_key)).all() == ["globex"]
+
+
+def test_a_users_emails_are_read_from_one_partition(db_session: Session):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    store(
+        db_session,
+        [
+            make_email("1", "Acme", "Application confirmation", datetime(2025, 1, 1)),
+            make_email("2", "Globex", "Rejection", datetime(2025, 1, 2)),
+        ],
+    )
+
+    partitions = db_session.exec(sa.text("SELECT DISTINCT tableoid::regclass::text FROM user_emails")).all()
+    assert len(partitions) == 1
+    plan = "\n".join(row[0] for row in db_session.exec(sa.text("EXPLAIN SELECT * FROM user_emails WHERE user_id = '123'")))
+    assert set(re.findall(r"user_emails_p\d+", plan)) == {partitions[0][0]}
+
+
+def test_search_text_query():
+    assert user_email_utils.search_text_query("Stripe, backend_eng!") == "stripe:* & backend:* & eng:*"
+    assert user_email_utils.search_text_query(" ?! ") is None
+
+
+def test_search_ranks_company_matches_first(db_session: Session):
+    db_session.add(Users(user_id="123", user_email="123@example.com", start_date=datetime(2000, 1, 1)))
+    store(
+        db_session,
+        [
+            make_email("1", "Stripe", "Rejection", datetime(2025, 1, 1)),
+            make_email("2", "Acme", "Rejection", datetime(2025, 1, 2), subject="Referred by a Stripe engineer"),
+            make_email("3", "Globex", "Rejection", datetime(2025, 1, 3)),
+        ],
+    )
+
+    user_emails, next_offset = user_email_utils.search_user_emails(db_session, "123", "stripe", limit=10)
+    assert [user_email["id"] for user_email in user_emails] == ["1", "2"]
+    assert user_emails[0]["company_name"] == "Stripe"
+    assert next_offset is None
+
+    # the search vector follows changes to the email
+    user_email_utils.update_user_emails(db_session, [make_email("3", "Stripe", "Rejection", datetime(2025, 1, 3))])
+    db_session.commit()
+    user_emails, _ = user_email_utils.search_user_emails(db_session, "123", "stripe", limit=10)
+    assert [user_email["id"] for user_email in user_emails] == ["3", "1", "2"]
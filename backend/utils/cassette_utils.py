@@ -0,0 +1,397 @@
+"""
+Record and replay of the Gmail and Gemini calls made while fetching emails.
+
+CASSETTE_MODE=record wraps the real Gmail service and Gemini model and appends every
+request, response and latency to a gzipped JSON lines cassette at CASSETTE_PATH.
+CASSETTE_MODE=replay serves those responses back without touching the network,
+sleeping for the recorded latency multiplied by CASSETTE_LATENCY_SCALE (0 for no delay).
+
+Everything is passed through the registered scrubbers before it is written, see
+register_scrubber. Email addresses are scrubbed by default.
+
+A cassette starts with the RECORDED_SETTINGS it was recorded with, as they change
+which calls ingest makes, and only replays under the same values. Re-record it
+(or set them back) after changing one.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.config_utils import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+GMAIL = "gmail"
+GEMINI = "gemini"
+
+EMAIL_ADDRESS_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+
+# settings that change which Gemini calls ingest makes for the same emails
+RECORDED_SETTINGS = ("RULE_EXTRACTION_ENABLED",)
+# what cassettes recorded before RECORDED_SETTINGS were stored in them ran with
+LEGACY_SETTINGS = {"RULE_EXTRACTION_ENABLED": False}
+
+# a scrubber gets the method name (e.g. "users.messages.get") and the entry about to
+# be written and returns the entry to write instead
+Scrubber = Callable[[str, dict], dict]
+_scrubbers: List[Scrubber] = []
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when the cassette has no response for a request."""
+
+
+class CassetteSettingsError(Exception):
+    """Raised when replaying a cassette recorded with other RECORDED_SETTINGS."""
+
+
+def recorded_settings() -> dict:
+    return {name: getattr(settings, name) for name in RECORDED_SETTINGS}
+
+
+def register_scrubber(scrubber: Scrubber) -> Scrubber:
+    """Adds a scrubber that removes PII from entries before they are recorded."""
+    _scrubbers.append(scrubber)
+    return scrubber
+
+
+def scrub_address(match: re.Match) -> str:
+    digest = hashlib.sha256(match.group(0).lower().encode()).hexdigest()[:10]
+    return f"user-{digest}@example.com"
+
+
+def scrub_email_addresses(text: str) -> str:
+    """Replaces each email address with a stable placeholder, so senders still group together."""
+    return EMAIL_ADDRESS_PATTERN.sub(scrub_address, text)
+
+
+@register_scrubber
+def scrub_gmail_email_addresses(method: str, entry: dict) -> dict:
+    response = entry.get("response")
+    if method == "users.messages.get" and response and response.get("raw"):
+        raw = base64.urlsafe_b64decode(response["raw"].encode("ASCII")).decode("utf-8", errors="ignore")
+        response["raw"] = base64.urlsafe_b64encode(scrub_email_addresses(raw).encode("utf-8")).decode("ASCII")
+    return entry
+
+
+def request_key(method: str, params: Any) -> str:
+    return hashlib.sha256(f"{method}:{json.dumps(params, sort_keys=True, default=str)}".encode()).hexdigest()
+
+
+class Cassette:
+    """
+    A gzipped JSON lines file of recorded calls.
+    In replay mode a request is answered with the recorded response for the same
+    request, or with the next unplayed response for the same method when the
+    request itself changed (for example a prompt built from scrubbed email text).
+    """
+
+    def __init__(self, path: str, mode: str, latency_scale: float = settings.CASSETTE_LATENCY_SCALE):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, deque] = defaultdict(deque)
+        self._by_method: Dict[str, deque] = defaultdict(deque)
+        if mode == REPLAY:
+            self.load()
+            return
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            with gzip.open(self.path, "wt", encoding="utf-8") as cassette_file:
+                cassette_file.write(json.dumps({"settings": recorded_settings()}) + "\n")
+
+    def load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as cassette_file:
+            for index, line in enumerate(cassette_file):
+                entry = json.loads(line)
+                if index == 0:
+                    # cassettes recorded before RECORDED_SETTINGS start with a call
+                    self.check_settings(entry.get("settings", LEGACY_SETTINGS))
+                    if "settings" in entry:
+                        continue
+                entry["played"] = False
+                self._by_key[entry["key"]].append(entry)
+                self._by_method[f"{entry['service']}:{entry['method']}"].append(entry)
+        logger.info("Loaded %s recorded calls from %s", sum(map(len, self._by_method.values())), self.path)
+
+    def check_settings(self, recorded: dict) -> None:
+        current = recorded_settings()
+        changed = {name: value for name, value in recorded.items() if current.get(name) != value}
+        if changed:
+            raise CassetteSettingsError(
+                f"{self.path} was recorded with {changed}, set them to replay it or record it again"
+            )
+
+    def record(self, service: str, method: str, params: Any, response: Any, error: Optional[str], latency: float) -> None:
+        entry = {
+            "service": service,
+            "method": method,
+            "key": request_key(method, params),
+            "response": response,
+            "error": error,
+            "latency": latency,
+        }
+        # scrub a copy, the response is also handed back to the caller
+        entry = json.loads(json.dumps(entry, default=str))
+        for scrubber in _scrubbers:
+            entry = scrubber(method, entry)
+        line = json.dumps(entry)
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as cassette_file:
+            cassette_file.write(line + "\n")
+
+    def play(self, service: str, method: str, params: Any) -> dict:
+        with self._lock:
+            entries = self._by_key.get(request_key(method, params))
+            entry = next((e for e in entries if not e["played"]), None) if entries else None
+            if entry is None:
+                entry = next((e for e in self._by_method[f"{service}:{method}"] if not e["played"]), None)
+            if entry is None:
+                raise CassetteMissError(f"No recorded {service} response for {method} {params}")
+            entry["played"] = True
+        if entry["latency"] and self.latency_scale:
+            time.sleep(entry["latency"] * self.latency_scale)
+        return entry
+
+
+def timed_call(call: Callable[[], Any]):
+    """Runs call and returns (result, error message, seconds taken), re-raising its exception."""
+    started = time.perf_counter()
+    try:
+        return call(), None, time.perf_counter() - started
+    except Exception as e:
+        return e, str(e), time.perf_counter() - started
+
+
+class RecordingRequest:
+    """Wraps a googleapiclient HttpRequest and records what execute() returns."""
+
+    def __init__(self, cassette: Cassette, method: str, params: dict, request):
+        self.cassette = cassette
+        self.method = method
+        self.params = params
+        self.request = request
+
+    def execute(self, *args, **kwargs):
+        response, error, latency = timed_call(lambda: self.request.execute(*args, **kwargs))
+        self.cassette.record(GMAIL, self.method, self.params, None if error else response, error, latency)
+        if error:
+            raise response
+        return response
+
+
+class RecordingBatch:
+    """Wraps a googleapiclient BatchHttpRequest and records the response of each request in it."""
+
+    def __init__(self, cassette: Cassette, batch):
+        self.cassette = cassette
+        self.batch = batch
+        self.started = 0.0
+
+    def add(self, request: RecordingRequest, callback=None, request_id=None):
+        def record_and_callback(request_id, response, exception):
+            error = str(exception) if exception else None
+            latency = time.perf_counter() - self.started
+            self.cassette.record(GMAIL, request.method, request.params, response, error, latency)
+            if callback:
+                callback(request_id, response, exception)
+
+        self.batch.add(request.request, callback=record_and_callback, request_id=request_id)
+
+    def execute(self, *args, **kwargs):
+        self.started = time.perf_counter()
+        return self.batch.execute(*args, **kwargs)
+
+
+class RecordingGmailService:
+    """Wraps a googleapiclient Resource, e.g. build("gmail", "v1", ...), at any depth."""
+
+    def __init__(self, cassette: Cassette, resource, path: str = ""):
+        self.cassette = cassette
+        self.resource = resource
+        self.path = path
+
+    def new_batch_http_request(self, callback=None):
+        return RecordingBatch(self.cassette, self.resource.new_batch_http_request(callback=callback))
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.resource, name)
+        method = f"{self.path}.{name}" if self.path else name
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return RecordingRequest(self.cassette, method, kwargs, result)
+            return RecordingGmailService(self.cassette, result, method)
+
+        return call
+
+
+class ReplayRequest:
+    def __init__(self, cassette: Cassette, method: str, params: dict):
+        self.cassette = cassette
+        self.method = method
+        self.params = params
+
+    def execute(self, *args, **kwargs):
+        entry = self.cassette.play(GMAIL, self.method, self.params)
+        if entry["error"]:
+            raise Exception(entry["error"])
+        return entry["response"]
+
+
+class ReplayBatch:
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: ReplayRequest, callback=None, request_id=None):
+        self.requests.append((request_id or str(len(self.requests) + 1), request, callback or self.callback))
+
+    def execute(self, *args, **kwargs):
+        for request_id, request, callback in self.requests:
+            response, exception = None, None
+            try:
+                response = request.execute()
+            except Exception as e:
+                exception = e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class ReplayGmailService:
+    """
+    Serves a recorded session in place of the Gmail service.
+    Calls without arguments, like users() and messages(), return the next level of
+    the resource; calls with arguments, like get(userId=..., id=...), are requests.
+    """
+
+    def __init__(self, cassette: Cassette, path: str = ""):
+        self.cassette = cassette
+        self.path = path
+
+    def new_batch_http_request(self, callback=None):
+        return ReplayBatch(callback)
+
+    def __getattr__(self, name: str):
+        method = f"{self.path}.{name}" if self.path else name
+
+        def call(*args, **kwargs):
+            if kwargs:
+                return ReplayRequest(self.cassette, method, kwargs)
+            return ReplayGmailService(self.cassette, method)
+
+        return call
+
+
+def serialize_model_response(response) -> dict:
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "text": response.text,
+        "prompt_token_count": getattr(usage, "prompt_token_count", 0),
+        "candidates_token_count": getattr(usage, "candidates_token_count", 0),
+        "total_token_count": getattr(usage, "total_token_count", 0),
+    }
+
+
+class ReplayResponse:
+    """Stands in for a GenerateContentResponse."""
+
+    def __init__(self, recorded: dict):
+        self.text = recorded["text"]
+        self.usage_metadata = UsageMetadata(recorded)
+
+    def resolve(self) -> None:
+        pass
+
+
+class UsageMetadata:
+    def __init__(self, recorded: dict):
+        self.prompt_token_count = recorded.get("prompt_token_count", 0)
+        self.candidates_token_count = recorded.get("candidates_token_count", 0)
+        self.total_token_count = recorded.get("total_token_count", 0)
+
+
+class RecordingModel:
+    """Wraps a GenerativeModel and records each generate_content call."""
+
+    def __init__(self, cassette: Cassette, model):
+        self.cassette = cassette
+        self.model = model
+
+    def generate_content(self, prompt, *args, **kwargs):
+        response, error, latency = timed_call(lambda: self.model.generate_content(prompt, *args, **kwargs))
+        recorded = None if error else serialize_model_response(response)
+        # only a hash of the prompt is stored, it contains the full email text
+        self.cassette.record(GEMINI, "generate_content", prompt, recorded, error, latency)
+        if error:
+            raise response
+        return response
+
+    def __getattr__(self, name: str):
+        return getattr(self.model, name)
+
+
+class ReplayModel:
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def generate_content(self, prompt, *args, **kwargs):
+        entry = self.cassette.play(GEMINI, "generate_content", prompt)
+        if entry["error"]:
+            raise Exception(entry["error"])
+        return ReplayResponse(entry["response"])
+
+
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The cassette for CASSETTE_MODE and CASSETTE_PATH, None when the mode is off."""
+    global _cassette
+    if settings.CASSETTE_MODE == OFF:
+        return None
+    if _cassette is None:
+        logger.warning("Cassette %s mode is on, using %s", settings.CASSETTE_MODE, settings.CASSETTE_PATH)
+        _cassette = Cassette(settings.CASSETTE_PATH, settings.CASSETTE_MODE)
+    return _cassette
+
+
+def gmail_service(build_service: Callable[[], Any]):
+    """
+    Returns the Gmail service to use: the real one from build_service(), wrapped for
+    recording when recording, or a replay of the cassette without calling build_service().
+    """
+    cassette = get_cassette()
+    if cassette and cassette.mode == REPLAY:
+        return ReplayGmailService(cassette)
+    service = build_service()
+    if cassette and cassette.mode == RECORD:
+        return RecordingGmailService(cassette, service)
+    return service
+
+
+def wrap_model(model):
+    """Returns the Gemini model to use, see gmail_service."""
+    cassette = get_cassette()
+    if cassette and cassette.mode == REPLAY:
+        return ReplayModel(cassette)
+    if cassette and cassette.mode == RECORD:
+        return RecordingModel(cassette, model)
+    return model
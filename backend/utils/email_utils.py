@@ -8,6 +8,7 @@ from bs4 import BeautifulSoup
 from email_validator import validate_email, EmailNotValidError
 
 from constants import GENERIC_ATS_DOMAINS
+from utils import metrics_utils
 
 logger = logging.getLogger(__name__)
 
@@ -75,8 +76,9 @@ def get_email_content(email_data: Dict[str, Any]) -> str:
         text_content += email_data["text_content"]
 
     if email_data["html_content"]:
-        soup = BeautifulSoup(email_data["html_content"], "html.parser")
-        html_content = soup.get_text(separator=" ", strip=True)
+        with metrics_utils.stage("html_to_text"):
+            soup = BeautifulSoup(email_data["html_content"], "html.parser")
+            html_content = soup.get_text(separator=" ", strip=True)
 
         text_content += "\n"
         text_content += html_content
@@ -87,69 +89,71 @@ def get_email_content(email_data: Dict[str, Any]) -> str:
 def get_email(message_id: str, gmail_instance=None, user_email: str = None):
     if gmail_instance:
         try:
-            message = (
-                gmail_instance.users()
-                .messages()
-                .get(userId="me", id=message_id, format="raw")
-                .execute()
-            )
-            msg_str = base64.urlsafe_b64decode(message["raw"].encode("ASCII")).decode(
-                "utf-8"
-            )
-            mime_msg = email.message_from_string(msg_str)
-            email_data = {
-                "id": message_id,
-                "threadId": message.get("threadId", None),
-                "from": None,
-                "to": None,
-                "subject": None,
-                "date": None,
-                "text_content": None,
-                "html_content": None,
-            }
-
-            # Getting email headers
-            email_data["from"] = clean_whitespace(mime_msg.get("From"))
-            email_data["to"] = clean_whitespace(mime_msg.get("To"))
-            email_data["subject"] = clean_whitespace(mime_msg.get("Subject"))
-            email_data["date"] = mime_msg.get("Date")
-
-            # Exclude if sender is user_email and to is not user_email
-            if user_email:
-                from_addr = email_data["from"] or ""
-                to_addr = email_data["to"] or ""
-                if user_email.lower() in from_addr.lower() and user_email.lower() not in to_addr.lower():
-                    return None
-
-            # Extract body of the email
-            if mime_msg.is_multipart():
-                for part in mime_msg.walk():
-                    content_type = part.get_content_type()
-                    content_disposition = str(part.get("Content-Disposition"))
-                    if (
-                        content_type == "text/plain"
-                        and "attachment" not in content_disposition
-                    ):
-                        email_data["text_content"] = part.get_payload(
+            with metrics_utils.stage("get"):
+                message = (
+                    gmail_instance.users()
+                    .messages()
+                    .get(userId="me", id=message_id, format="raw")
+                    .execute()
+                )
+            with metrics_utils.stage("parse"):
+                msg_str = base64.urlsafe_b64decode(message["raw"].encode("ASCII")).decode(
+                    "utf-8"
+                )
+                mime_msg = email.message_from_string(msg_str)
+                email_data = {
+                    "id": message_id,
+                    "threadId": message.get("threadId", None),
+                    "from": None,
+                    "to": None,
+                    "subject": None,
+                    "date": None,
+                    "text_content": None,
+                    "html_content": None,
+                }
+
+                # Getting email headers
+                email_data["from"] = clean_whitespace(mime_msg.get("From"))
+                email_data["to"] = clean_whitespace(mime_msg.get("To"))
+                email_data["subject"] = clean_whitespace(mime_msg.get("Subject"))
+                email_data["date"] = mime_msg.get("Date")
+
+                # Exclude if sender is user_email and to is not user_email
+                if user_email:
+                    from_addr = email_data["from"] or ""
+                    to_addr = email_data["to"] or ""
+                    if user_email.lower() in from_addr.lower() and user_email.lower() not in to_addr.lower():
+                        return None
+
+                # Extract body of the email
+                if mime_msg.is_multipart():
+                    for part in mime_msg.walk():
+                        content_type = part.get_content_type()
+                        content_disposition = str(part.get("Content-Disposition"))
+                        if (
+                            content_type == "text/plain"
+                            and "attachment" not in content_disposition
+                        ):
+                            email_data["text_content"] = part.get_payload(
+                                decode=True
+                            ).decode(encoding="utf-8", errors="ignore")
+                        elif (
+                            content_type == "text/html"
+                            and "attachment" not in content_disposition
+                        ):
+                            email_data["html_content"] = part.get_payload(
+                                decode=True
+                            ).decode(encoding="utf-8", errors="ignore")
+                else:
+                    content_type = mime_msg.get_content_type()
+                    if content_type == "text/plain":
+                        email_data["text_content"] = mime_msg.get_payload(
                             decode=True
                         ).decode(encoding="utf-8", errors="ignore")
-                    elif (
-                        content_type == "text/html"
-                        and "attachment" not in content_disposition
-                    ):
-                        email_data["html_content"] = part.get_payload(
+                    elif content_type == "text/html":
+                        email_data["html_content"] = mime_msg.get_payload(
                             decode=True
                         ).decode(encoding="utf-8", errors="ignore")
-            else:
-                content_type = mime_msg.get_content_type()
-                if content_type == "text/plain":
-                    email_data["text_content"] = mime_msg.get_payload(
-                        decode=True
-                    ).decode(encoding="utf-8", errors="ignore")
-                elif content_type == "text/html":
-                    email_data["html_content"] = mime_msg.get_payload(
-                        decode=True
-                    ).decode(encoding="utf-8", errors="ignore")
 
             email_data["raw_text_content"] = email_data["text_content"]
             email_data["text_content"] = get_email_content(email_data)
@@ -167,17 +171,18 @@ def get_email_ids(query: tuple = None, gmail_instance=None):
     page_token = None
 
     while True:
-        response = (
-            gmail_instance.users()
-            .messages()
-            .list(
-                userId="me",
-                q=query,
-                includeSpamTrash=True,
-                pageToken=page_token,
+        with metrics_utils.stage("list"):
+            response = (
+                gmail_instance.users()
+                .messages()
+                .list(
+                    userId="me",
+                    q=query,
+                    includeSpamTrash=True,
+                    pageToken=page_token,
+                )
+                .execute()
             )
-            .execute()
-        )
 
         if "messages" in response:
             email_ids.extend(response["messages"])
@@ -0,0 +1,231 @@
+"""
+Company and job title of an email from rules instead of the model.
+
+The sender's domain is looked up in a trie of domain suffixes, which tells emails
+sent by an applicant tracking system or job board (no-reply@us.greenhouse-mail.io)
+from those of a company's own domain or a personal mailbox. Each tracking system
+words its notifications the same way for every company, so templates of its subject
+lines and bodies, plus templates common to most senders, find the company and job
+title. Templates that only match one kind of application event (a confirmation that an
+application was received) also give the status, unless the email reads like a
+rejection. Job alerts, newsletters and recommendations name companies and titles
+too, without being about an application, so they are left to the model.
+
+Company names taken from a template are kept only if they are capitalized words,
+and a company's own domain gives the company already known for it, if any.
+"""
+
+import re
+from email.utils import parseaddr
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from constants import ATS_SENDER_DOMAINS, GENERIC_ATS_DOMAINS, PERSONAL_EMAIL_DOMAINS
+from utils.email_utils import get_email_domain_from_address, get_last_capitalized_words_in_line
+
+# how much of the email text body templates are matched against
+BODY_CHARS = 3000
+# how long a job title taken from a template can be
+TITLE_MAX_WORDS = 8
+# a status from a template is dropped if the email says any of these, as a
+# rejection can open with "we received your application"
+STATUS_VETO = re.compile(
+    r"unfortunately|regret|not (?:to |be )?(?:move|moving|proceed|proceeding) forward|not be proceeding"
+    r"|other candidates|other applicants|no longer|not (?:been )?selected|(?:has|have) been filled"
+    r"|(?:will not|won't|not) be (?:moving|progressing|continuing)|unable to offer|not a (?:fit|match)",
+    re.IGNORECASE,
+)
+# emails about jobs rather than about an application, which the rules leave to the model
+NOT_APPLICATION = re.compile(
+    r"job alert|jobs? you (?:may|might) (?:like|be interested in)|recommended (?:jobs|roles|for you)"
+    r"|new jobs? (?:for you|matching|near you)|jobs? (?:picked|selected) for you|top job picks|similar jobs"
+    r"|newsletter|weekly digest|\bis hiring\b|\bare hiring\b",
+    re.IGNORECASE,
+)
+
+
+class DomainTrie:
+    """Values by domain, looked up by the longest suffix of whole labels that was added."""
+
+    def __init__(self):
+        # label -> child node, and None -> the value of the domain ending at this node
+        self.root: Dict = {}
+
+    def add(self, domain: str, value) -> None:
+        node = self.root
+        for label in reversed(domain.lower().strip(".").split(".")):
+            node = node.setdefault(label, {})
+        node[None] = value
+
+    def get(self, domain: str, default=None):
+        node, value = self.root, default
+        for label in reversed(domain.lower().strip(".").split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            value = node.get(None, value)
+        return value
+
+
+PERSONAL = "personal"
+COMPANY = "company"
+ATS = "ats"  # a tracking system or job board without templates of its own
+
+# what kind of sender a domain is: the tracking system's name, ATS or PERSONAL
+SENDER_DOMAINS = DomainTrie()
+for ats, domains in ATS_SENDER_DOMAINS.items():
+    for domain in domains:
+        SENDER_DOMAINS.add(domain, ats)
+for domain in GENERIC_ATS_DOMAINS:
+    # us.greenhouse-mail.io keeps the templates of greenhouse-mail.io
+    if SENDER_DOMAINS.get(domain) is None:
+        SENDER_DOMAINS.add(domain, ATS)
+for domain in PERSONAL_EMAIL_DOMAINS:
+    SENDER_DOMAINS.add(domain, PERSONAL)
+
+
+def sender_kind(email_from: str) -> str:
+    """The tracking system an email was sent from, PERSONAL, or COMPANY for any other domain."""
+    domain = get_email_domain_from_address(parseaddr(email_from)[1])
+    return SENDER_DOMAINS.get(domain, COMPANY) if domain else PERSONAL
+
+
+class Template(NamedTuple):
+    pattern: re.Pattern  # with groups named company and/or title
+    status: str = ""  # the status of every email the template matches, if any
+
+
+def subject_template(pattern: str, status: str = "") -> Template:
+    return Template(re.compile(f"^{pattern}[.!]*$", re.IGNORECASE), status)
+
+
+def body_template(pattern: str, status: str = "") -> Template:
+    return Template(re.compile(pattern, re.IGNORECASE), status)
+
+
+COMPANY_GROUP = r"(?P<company>[^.!?,:\n]+?)"
+TITLE_GROUP = r"(?P<title>[^.!?:\n]+?)"
+ROLE_WORDS = r"(?:position|role|opening|job)"
+
+# (subject templates, body templates) of every sender
+COMMON_TEMPLATES = (
+    [
+        # rejections are often titled like this too, so it gives no status
+        subject_template(
+            rf"(?:thank you|thanks) for (?:applying|your application|your interest) (?:to|at|with) {COMPANY_GROUP}"
+        ),
+        subject_template(rf"(?:application|applying) for {TITLE_GROUP} at {COMPANY_GROUP}"),
+        subject_template(rf"interview (?:invitation|request)\s*[:\-–]\s*{TITLE_GROUP} at {COMPANY_GROUP}", "Interview invitation"),
+        subject_template(rf"your application (?:to|at|with) {COMPANY_GROUP}"),
+    ],
+    [
+        body_template(
+            rf"received your application for (?:the )?{TITLE_GROUP} {ROLE_WORDS}(?: at {COMPANY_GROUP}[.!,\n])?",
+            "Application confirmation",
+        ),
+        body_template(rf"(?:application|interest|applying) (?:for|in) the {TITLE_GROUP} {ROLE_WORDS} at {COMPANY_GROUP}[.!,\n]"),
+    ],
+)
+
+# (subject templates, body templates) of each tracking system, matched before the common ones
+ATS_TEMPLATES: Dict[str, tuple] = {
+    "greenhouse": (
+        [],
+        [
+            body_template(
+                rf"we received your application for {TITLE_GROUP}(?:,| and we)", "Application confirmation"
+            ),
+        ],
+    ),
+    "lever": (
+        [subject_template(rf"{COMPANY_GROUP} application received", "Application confirmation")],
+        [],
+    ),
+    "ashby": (
+        [],
+        [body_template(rf"your application for the {TITLE_GROUP} {ROLE_WORDS}")],
+    ),
+    "linkedin": (
+        [subject_template(rf"(?:[^,\n]+, )?your application was sent to {COMPANY_GROUP}", "Application confirmation")],
+        [],
+    ),
+}
+
+
+class ExtractedFields(NamedTuple):
+    company_name: str = ""
+    job_title: str = ""
+    status: str = ""
+
+    @property
+    def is_confident(self) -> bool:
+        """Whether the model is needed for the status at most."""
+        return bool(self.company_name and self.job_title)
+
+    @property
+    def is_application_event(self) -> bool:
+        """Whether a template identified what happened to the application, so the model isn't needed."""
+        return self.is_confident and bool(self.status)
+
+
+def clean_company_name(company_name: Optional[str]) -> str:
+    # "our team at Acme" is Acme, and "us" is no company at all
+    return get_last_capitalized_words_in_line((company_name or "").strip(" -–")) or ""
+
+
+def clean_job_title(job_title: Optional[str]) -> str:
+    job_title = (job_title or "").strip(" -–,")
+    words = job_title.split()
+    if not words or len(words) > TITLE_MAX_WORDS or not (words[0][0].isupper() or words[0][0].isdigit()):
+        return ""
+    return job_title
+
+
+def match_templates(templates: List[Template], text: str, fields: ExtractedFields) -> ExtractedFields:
+    """Fills in the fields still empty from the templates that match, in order."""
+    for template in templates:
+        match = template.pattern.search(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        fields = ExtractedFields(
+            fields.company_name or clean_company_name(groups.get("company")),
+            fields.job_title or clean_job_title(groups.get("title")),
+            fields.status or template.status,
+        )
+        if fields.is_confident:
+            break
+    return fields
+
+
+def extract_email_fields(
+    subject: str,
+    email_from: str,
+    email_text: str,
+    company_for_domain: Optional[Callable[[str], Optional[str]]] = None,
+) -> ExtractedFields:
+    """
+    The company, job title and status the rules find in an email, "" for those they
+    don't. company_for_domain returns the company already known for a sender, if any.
+    """
+    subject = (subject or "").strip()
+    body = (email_text or "")[:BODY_CHARS]
+    if NOT_APPLICATION.search(f"{subject}\n{body}"):
+        return ExtractedFields()
+
+    kind = sender_kind(email_from or "")
+    fields = ExtractedFields()
+    if kind == COMPANY and company_for_domain:
+        fields = ExtractedFields(company_name=company_for_domain(email_from) or "")
+    ats_subject_templates, ats_body_templates = ATS_TEMPLATES.get(kind, ([], []))
+    for templates, text in (
+        (ats_subject_templates, subject),
+        (COMMON_TEMPLATES[0], subject),
+        (ats_body_templates, body),
+        (COMMON_TEMPLATES[1], body),
+    ):
+        fields = match_templates(templates, text, fields)
+        if fields.is_confident:
+            break
+    if fields.status and STATUS_VETO.search(f"{subject}\n{body}"):
+        fields = fields._replace(status="")
+    return fields
@@ -1,16 +1,19 @@
 import google.generativeai as genai
+import threading
 import time
 import json
+from typing import List, Optional
 from google.ai.generativelanguage_v1beta2 import GenerateTextResponse
 import logging
 
 from utils.config_utils import get_settings
+from utils import cassette_utils, extraction_utils, metrics_utils
 
 settings = get_settings()
 
 # Configure Google Gemini API
 genai.configure(api_key=settings.GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-2.0-flash-lite")
+model = cassette_utils.wrap_model(genai.GenerativeModel("gemini-2.0-flash-lite"))
 logger = logging.getLogger(__name__)
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -20,8 +23,29 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def process_email(email_text):
-    prompt = f"""
+# Bump this whenever LABELING_RULES (or the response formats below) change in a way
+# that should change the labels of emails that are already stored. Rows classified
+# with an older version are picked up by jobs/reclassify_emails.py.
+PROMPT_VERSION = 1
+
+# The application status labels LABELING_RULES asks the model for. Stored statuses
+# are compared lower-cased (see db/utils/application_utils.py)
+APPLICATION_STATUS_LABELS = (
+    "Application confirmation",
+    "Rejection",
+    "Availability request",
+    "Information request",
+    "Assessment sent",
+    "Interview invitation",
+    "Did not apply - inbound request",
+    "Action required from company",
+    "Hiring freeze notification",
+    "Withdrew application",
+    "Offer made",
+    "False positive",
+)
+
+LABELING_RULES = """
         First, extract the job application status from the following email using the labels below. 
         If the status is 'False positive', only return the status as 'False positive' and do not extract company name or job title. 
         If the status is not 'False positive', then extract the company name and job title as well.
@@ -93,35 +117,98 @@ def process_email(email_text):
         Examples: Newsletters, event invitations, conference invites, marketing emails, spam, unrelated notifications, or personal emails.
         Example: "Join us for our annual conference" → False positive
         Example: "Sign up for our upcoming event" → False positive
+"""
 
-        If the status is 'False positive', only return: {{"job_application_status": "False positive"}}
-        If the status is not 'False positive', return: {{"company_name": "company_name", "job_application_status": "status", "job_title": "job_title"}}
+SINGLE_EMAIL_RESPONSE_FORMAT = """
+        If the status is 'False positive', only return: {"job_application_status": "False positive"}
+        If the status is not 'False positive', return: {"company_name": "company_name", "job_application_status": "status", "job_title": "job_title"}
         Remove backticks. Only use double quotes. Enclose key and value pairs in a single pair of curly braces.
-        Email: {email_text}
+"""
+
+# for emails whose company and job title were found by utils/extraction_utils.py
+STATUS_RESPONSE_FORMAT = """
+        Only return the status, even if it is not 'False positive': {"job_application_status": "status"}
+        Remove backticks. Only use double quotes. Enclose key and value pairs in a single pair of curly braces.
+"""
+
+BATCH_RESPONSE_FORMAT = """
+        You will be given several emails. Each one starts with a line of the form "Email <number>:".
+        Label every email independently, using the rules above.
+        For an email with status 'False positive', only return: {"job_application_status": "False positive"}
+        For any other email, return: {"company_name": "company_name", "job_application_status": "status", "job_title": "job_title"}
+        Return a JSON array containing exactly one such object per email, in the same order as the emails.
+        Remove backticks. Only use double quotes.
+"""
+
+
+class RateLimiter:
+    """
+    Spaces out calls so that no more than requests_per_minute of them start in any
+    one minute. A value of 0 or less disables the limiter.
+    Thread safe, so a single instance can be shared by every caller in the process.
     """
 
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self.calls = 0  # number of calls let through, used by jobs to enforce a budget
+        self._next_call_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            self.calls += 1
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = self._next_call_at - now
+            self._next_call_at = max(now, self._next_call_at) + self.interval
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+
+rate_limiter = RateLimiter(settings.LLM_REQUESTS_PER_MINUTE)
+
+# how long to back off after the model answers with a 429
+RATE_LIMIT_RETRY_DELAY_SECONDS = 60
+
+
+def clean_response_json(response_json: str) -> str:
+    return (
+        response_json.replace("json", "")
+        .replace("`", "")
+        .replace("'", '"')
+        .strip()
+    )
+
+
+def record_token_usage(response) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    for kind, attribute in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+        token_count = getattr(usage, attribute, None)
+        if isinstance(token_count, int):
+            metrics_utils.LLM_TOKENS.inc(token_count, kind=kind)
+
+
+def generate_json(prompt: str):
+    """
+    Sends the prompt to the model and parses the JSON in its answer.
+    Retries when the model is rate limited and returns None on any other failure.
+    """
     retries = 3  # Max retries
-    delay = 60  # Initial delay
+    delay = RATE_LIMIT_RETRY_DELAY_SECONDS
     for attempt in range(retries):
         try:
+            rate_limiter.wait()
             logger.info("Calling generate_content")
-            response: GenerateTextResponse = model.generate_content(prompt)
-            response.resolve()
+            with metrics_utils.stage("llm"):
+                response: GenerateTextResponse = model.generate_content(prompt)
+                response.resolve()
+            record_token_usage(response)
             response_json: str = response.text
             logger.info("Received response from model: %s", response_json)
             if response_json:
-                cleaned_response_json = (
-                    response_json.replace("json", "")
-                    .replace("`", "")
-                    .replace("'", '"')
-                    .strip()
-                )
-                cleaned_response_json = (
-                    response_json.replace("json", "")
-                    .replace("`", "")
-                    .replace("'", '"')
-                    .strip()
-                )
+                cleaned_response_json = clean_response_json(response_json)
                 logger.info("Cleaned response: %s", cleaned_response_json)
                 return json.loads(cleaned_response_json)
             else:
@@ -129,13 +216,86 @@ def process_email(email_text):
                 return None
         except Exception as e:
             if "429" in str(e):
+                metrics_utils.LLM_RATE_LIMITED.inc()
                 logger.warning(
                     f"Rate limit hit. Retrying in {delay} seconds (attempt {attempt + 1})."
                 )
                 time.sleep(delay)
             else:
-                logger.error(f"process_email exception: {e}")
+                logger.error(f"generate_json exception: {e}")
                 return None
     logger.error(f"Failed to process email after {retries} attempts.")
     return None
 
+
+def process_email(email_text):
+    prompt = f"""{LABELING_RULES}{SINGLE_EMAIL_RESPONSE_FORMAT}
+        Email: {email_text}
+    """
+    return generate_json(prompt)
+
+
+def process_email_status(email_text):
+    prompt = f"""{LABELING_RULES}{STATUS_RESPONSE_FORMAT}
+        Email: {email_text}
+    """
+    return generate_json(prompt)
+
+
+def process_email_with_rules(subject, email_from, email_text, company_for_domain=None):
+    """
+    Labels an email like process_email, trying the sender-domain rules of
+    utils/extraction_utils.py first. When they find the company and job title, the
+    model is only asked for the status, and not at all if a template also identified
+    the application event (e.g. a confirmation that the application was received).
+    """
+    if not settings.RULE_EXTRACTION_ENABLED:
+        return process_email(email_text)
+    fields = extraction_utils.extract_email_fields(subject, email_from, email_text, company_for_domain)
+    if not fields.is_confident:
+        metrics_utils.INGEST_RULE_EXTRACTIONS.inc(outcome="llm")
+        return process_email(email_text)
+
+    status = fields.status
+    if fields.is_application_event:
+        metrics_utils.INGEST_RULE_EXTRACTIONS.inc(outcome="rules")
+    else:
+        metrics_utils.INGEST_RULE_EXTRACTIONS.inc(outcome="llm_status")
+        result = process_email_status(email_text)
+        status = result.get("job_application_status") if isinstance(result, dict) else None
+        if status and status.lower().strip() == "false positive":
+            return {"job_application_status": status}
+    return {
+        "company_name": fields.company_name,
+        "job_application_status": status or "unknown",
+        "job_title": fields.job_title,
+    }
+
+
+def process_emails_batch(email_texts: List[str]) -> List[Optional[dict]]:
+    """
+    Labels several emails with a single model call.
+    Returns one result per email, in order. If the model's answer can't be matched
+    up with the emails, each email is labeled on its own instead.
+    """
+    if not email_texts:
+        return []
+    if len(email_texts) == 1:
+        return [process_email(email_texts[0])]
+
+    emails = "\n".join(
+        f"Email {number}:\n{email_text}\n"
+        for number, email_text in enumerate(email_texts, start=1)
+    )
+    prompt = f"""{LABELING_RULES}{BATCH_RESPONSE_FORMAT}
+        {emails}
+    """
+    results = generate_json(prompt)
+    if isinstance(results, list) and len(results) == len(email_texts):
+        return [result if isinstance(result, dict) else None for result in results]
+
+    logger.warning(
+        "Batch response did not contain one result per email, labeling %s emails one at a time",
+        len(email_texts),
+    )
+    return [process_email(email_text) for email_text in email_texts]
@@ -0,0 +1,281 @@
+"""
+Process metrics, exposed in the Prometheus text format at /metrics.
+
+Metrics are prometheus_client metrics. With several uvicorn workers, set
+PROMETHEUS_MULTIPROC_DIR to an empty directory (cleared before every start) so each
+worker writes its values there and /metrics adds up every worker's, whichever one
+serves the scrape. Without it, the numbers are those of the worker that answers.
+
+Besides the process-wide totals, everything recorded inside a collect_run() block
+is also summed into that run's RunSummary, used for per-run stats like TaskRuns.
+"""
+
+import abc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+import prometheus_client
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+# the *_created series only add noise to every counter and histogram
+prometheus_client.disable_created_metrics()
+
+
+class RunSummary:
+    """Totals of everything recorded while the run is active."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_observation(self, key: str, value: float) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(key, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += value
+            stage["max_seconds"] = max(stage["max_seconds"], value)
+
+    def add_count(self, key: str, amount: float) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {
+                    key: {
+                        "count": stage["count"],
+                        "seconds": round(stage["seconds"], 4),
+                        "max_seconds": round(stage["max_seconds"], 4),
+                    }
+                    for key, stage in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+
+_current_run: ContextVar[Optional[RunSummary]] = ContextVar("current_run", default=None)
+
+
+@contextmanager
+def collect_run() -> Iterator[RunSummary]:
+    """Collects a RunSummary of everything recorded in this block (and this thread/task)."""
+    run = RunSummary()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+class Metric(abc.ABC):
+    def __init__(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), registry: Optional["Registry"] = None,
+        **kwargs,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.metric = self.create(
+            name, documentation, labelnames=self.labelnames, registry=(registry or REGISTRY).collector_registry, **kwargs
+        )
+
+    @abc.abstractmethod
+    def create(self, *args, **kwargs):
+        """The prometheus_client metric backing this one."""
+
+    def label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def child(self, values: LabelValues):
+        return self.metric.labels(*values) if values else self.metric
+
+    def run_key(self, values: LabelValues) -> str:
+        """Name of a series in run summaries: the metric's name, then its label values if any."""
+        return f"{self.name}:{','.join(values)}" if values else self.name
+
+    def sample(self, sample_name: str, labels: Dict[str, str]) -> float:
+        """The value this process recorded for a series."""
+        wanted = dict(zip(self.labelnames, self.label_values(labels)))
+        for family in self.metric.collect():
+            for sample in family.samples:
+                if sample.name == sample_name and all(sample.labels.get(k) == v for k, v in wanted.items()):
+                    return sample.value
+        return 0
+
+
+class Counter(Metric):
+    def create(self, *args, **kwargs):
+        return prometheus_client.Counter(*args, **kwargs)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        values = self.label_values(labels)
+        self.child(values).inc(amount)
+        run = _current_run.get()
+        if run:
+            run.add_count(self.run_key(values), amount)
+
+    def get(self, **labels) -> float:
+        return self.sample(self.name if self.name.endswith("_total") else f"{self.name}_total", labels)
+
+
+class Gauge(Metric):
+    """
+    multiprocess_mode says how the workers' values are combined: "livesum" (the
+    default here) adds up those of the running workers, "mostrecent" keeps the last
+    one set.
+    """
+
+    def __init__(self, *args, multiprocess_mode: str = "livesum", **kwargs):
+        super().__init__(*args, multiprocess_mode=multiprocess_mode, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return prometheus_client.Gauge(*args, **kwargs)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.child(self.label_values(labels)).inc(amount)
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self.child(self.label_values(labels)).set(value)
+
+    def get(self, **labels) -> float:
+        return self.sample(self.name, labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, buckets=buckets, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return prometheus_client.Histogram(*args, **kwargs)
+
+    def observe(self, value: float, **labels) -> None:
+        values = self.label_values(labels)
+        self.child(values).observe(value)
+        run = _current_run.get()
+        if run:
+            run.add_observation(self.run_key(values), value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        return int(self.sample(f"{self.name}_count", labels))
+
+    def sum(self, **labels) -> float:
+        return self.sample(f"{self.name}_sum", labels)
+
+
+class Registry:
+    def __init__(self):
+        self.collector_registry = CollectorRegistry(auto_describe=True)
+
+    def render(self) -> str:
+        """The metrics of this process, or of every worker in multiprocess mode."""
+        if self is REGISTRY and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            collector_registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(collector_registry)
+            return generate_latest(collector_registry).decode()
+        return generate_latest(self.collector_registry).decode()
+
+
+REGISTRY = Registry()
+
+# Email ingestion, see routes/email_routes.fetch_emails_to_db
+INGEST_STAGE_SECONDS = Histogram(
+    "ingest_stage_seconds",
+    "Time spent in each stage of fetching emails: list, get, parse, html_to_text, llm, db_write.",
+    labelnames=("stage",),
+)
+INGEST_STAGE_IN_FLIGHT = Gauge(
+    "ingest_stage_in_flight", "Ingestion stages currently running.", labelnames=("stage",)
+)
+INGEST_RUNS_IN_FLIGHT = Gauge("ingest_runs_in_flight", "Email fetching runs currently running.")
+INGEST_EMAILS = Counter("ingest_emails_total", "Emails processed by email fetching runs.")
+INGEST_FALSE_POSITIVES = Counter(
+    "ingest_false_positives_total", "Emails the model labeled as not related to a job search."
+)
+INGEST_CACHE_HITS = Counter(
+    "ingest_cache_hits_total", "Fetched emails that were already stored and were not saved again."
+)
+INGEST_COMPANY_NAMES_CANONICALIZED = Counter(
+    "ingest_company_names_canonicalized_total",
+    "Company names replaced with the name already used for the company, by rule.",
+    labelnames=("rule",),
+)
+INGEST_RULE_EXTRACTIONS = Counter(
+    "ingest_rule_extractions_total",
+    "Emails labeled by sender-domain rules (rules), by the rules and the model for the status only "
+    "(llm_status), or by the model alone (llm).",
+    labelnames=("outcome",),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by model calls.", labelnames=("kind",))
+LLM_RATE_LIMITED = Counter("llm_rate_limited_total", "Model calls rejected with a 429.")
+
+# HTTP requests, see utils/timing_utils.py
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Time to handle a request, by route template.", labelnames=("method", "route", "status")
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent running SQL while handling a request.", labelnames=("method", "route")
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements run while handling a request.",
+    labelnames=("method", "route"),
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+
+# Database connection pools, see utils/pool_utils.py
+DB_POOL_CHECKOUT_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to check a connection out of the pool, including waiting for a free one.",
+    labelnames=("pool",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0),
+)
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections currently checked out of the pool.", labelnames=("pool",)
+)
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag at the last check, -1 when the replica could not be reached.",
+    multiprocess_mode="mostrecent",
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that timed out waiting for a free connection.", labelnames=("pool",)
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times an ingestion stage and counts it as in flight while it runs."""
+    with INGEST_STAGE_IN_FLIGHT.track_in_progress(stage=name), INGEST_STAGE_SECONDS.time(stage=name):
+        yield
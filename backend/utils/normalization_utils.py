@@ -0,0 +1,163 @@
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+# Legal-entity suffixes dropped from company names, so "Acme, Inc." and "ACME" match
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation", "co",
+    "company", "plc", "gmbh", "ag", "sa", "bv", "pty", "lp", "llp",
+}
+
+# Common abbreviations in job titles, expanded so "Sr. SWE" and "Senior SWE" match
+JOB_TITLE_ABBREVIATIONS = {
+    "sr": "senior",
+    "jr": "junior",
+    "eng": "engineer",
+    "engr": "engineer",
+    "mgr": "manager",
+    "dev": "developer",
+    "assoc": "associate",
+    "&": "and",
+}
+
+# Role names written in many ways, expanded on top of JOB_TITLE_ABBREVIATIONS so that
+# "Senior SWE" and "Sr. Software Engineer" are the same role family
+ROLE_ABBREVIATIONS = {
+    "swe": "software engineer",
+    "sde": "software engineer",
+    "developer": "engineer",
+    "programmer": "engineer",
+    "pm": "product manager",
+    "em": "engineering manager",
+    "ml": "machine learning",
+    "mts": "member of technical staff",
+}
+SENIORITIES = {"intern", "junior", "entry", "mid", "senior", "staff", "principal", "lead", "distinguished"}
+# II, 3, L4, E5, IC3
+LEVEL = re.compile(r"^(i{1,3}|iv|v|[1-9]|l[1-9]|e[1-9]|ic[1-9])$")
+# words about the contract rather than the role
+EMPLOYMENT_WORDS = {"remote", "hybrid", "onsite", "contract", "contractor", "temporary", "fulltime", "parttime"}
+# the team or location usually follows one of these: "Software Engineer - Payments (Remote)"
+TITLE_QUALIFIER = re.compile(r"\s[-\u2013\u2014|/]\s|[,(\[:]|\s(?:at|@)\s")
+
+UNKNOWN_VALUES = {"", "unknown", "n/a", "none", "null"}
+
+# keep + and # so "C++" and "C#" survive
+NON_WORD_CHARACTERS = re.compile(r"[^\w\s+#&]")
+
+
+def tokenize(value: Optional[str]) -> list:
+    if not value or value.strip().lower() in UNKNOWN_VALUES:
+        return []
+    return NON_WORD_CHARACTERS.sub(" ", value.lower()).split()
+
+
+def normalize_company_name(company_name: Optional[str]) -> str:
+    """
+    Returns the key used to group a company's emails, or "" for unknown companies.
+    Lower-cased, without punctuation, a leading "the" or legal suffixes.
+    """
+    tokens = tokenize(company_name)
+    if tokens and tokens[0] == "the":
+        tokens = tokens[1:]
+    while len(tokens) > 1 and tokens[-1] in COMPANY_SUFFIXES:
+        tokens = tokens[:-1]
+    return " ".join(tokens)
+
+
+def normalize_job_title(job_title: Optional[str]) -> str:
+    """
+    Returns the key used to group emails about the same role, or "" for unknown titles.
+    Lower-cased, without punctuation and with common abbreviations expanded.
+    """
+    return " ".join(JOB_TITLE_ABBREVIATIONS.get(token, token) for token in tokenize(job_title))
+
+
+class JobTitleParts(NamedTuple):
+    family: str  # the role without seniority or level, "" for unknown titles
+    seniority: str
+    level: str
+
+
+@lru_cache(maxsize=10000)
+def parse_job_title(job_title: Optional[str]) -> JobTitleParts:
+    """
+    Splits a job title into its role family, seniority and level: "Sr. SWE II - Payments"
+    is ("software engineer", "senior", "ii"). The family is normalized like
+    normalize_job_title, with more role abbreviations expanded.
+    """
+    role = TITLE_QUALIFIER.split(job_title or "", maxsplit=1)[0]
+    seniority, level, family = "", "", []
+    role = normalize_job_title(role).replace("full time", "fulltime").replace("part time", "parttime")
+    for token in role.split():
+        if token in SENIORITIES and not seniority:
+            seniority = token
+        elif LEVEL.match(token) and not level:
+            level = token
+        elif token not in EMPLOYMENT_WORDS:
+            family.extend(ROLE_ABBREVIATIONS.get(token, token).split())
+    return JobTitleParts(" ".join(family), seniority, level)
+
+
+def normalize_status(application_status: Optional[str]) -> str:
+    """Returns the lower-cased status, or "" for unknown statuses."""
+    status = (application_status or "").strip().lower()
+    return "" if status in UNKNOWN_VALUES else status
+
+
+def ngrams(value: str, size: int) -> Set[str]:
+    """Character n-grams of value, padded with a space so the first and last characters count."""
+    padded = f" {value} "
+    return {padded[start:start + size] for start in range(max(1, len(padded) - size + 1))}
+
+
+class NGramIndex:
+    """
+    Finds the added key most similar to a value, by the Jaccard similarity of their
+    character n-grams. Keys are found through an inverted index from n-gram to keys,
+    and only through the value's rarest n-grams: a key sharing none of those can't
+    share enough n-grams to be similar enough, so a lookup only looks at a few keys
+    however many there are.
+    """
+
+    def __init__(self, size: int = 3):
+        self.size = size
+        self.key_ngrams: Dict[str, Set[str]] = {}
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.key_ngrams)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_ngrams
+
+    def add(self, key: str) -> None:
+        if key in self.key_ngrams:
+            return
+        self.key_ngrams[key] = ngrams(key, self.size)
+        for gram in self.key_ngrams[key]:
+            self.postings[gram].add(key)
+
+    def best_match(self, value: str, min_similarity: float) -> Optional[Tuple[str, float]]:
+        """The most similar key with at least min_similarity and its similarity, None if there is none."""
+        value_ngrams = ngrams(value, self.size)
+        grams = sorted(value_ngrams, key=lambda gram: len(self.postings.get(gram, ())))
+        # a similar enough key shares at least min_shared n-grams, so one of these
+        min_shared = math.ceil(min_similarity * len(grams))
+        candidates = set()
+        for gram in grams[:len(grams) - min_shared + 1]:
+            candidates.update(self.postings.get(gram, ()))
+        # and has between min_similarity and 1 / min_similarity times as many n-grams
+        min_size, max_size = min_similarity * len(grams), len(grams) / min_similarity
+        best = None
+        for key in candidates:
+            if not min_size <= len(self.key_ngrams[key]) <= max_size:
+                continue
+            shared = len(self.key_ngrams[key] & value_ngrams)
+            similarity = shared / (len(value_ngrams) + len(self.key_ngrams[key]) - shared)
+            # ties go to the first key in sort order, so the result doesn't depend on set order
+            if similarity >= min_similarity and (best is None or (-similarity, key) < (-best[1], best[0])):
+                best = (key, similarity)
+        return best
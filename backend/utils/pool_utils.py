@@ -0,0 +1,45 @@
+"""
+Connection pools that report how they are used, so pool sizes (DB_POOL_* and
+INGEST_DB_POOL_* settings) can be chosen from data.
+
+Each pool is named by its pool_logging_name ("web", "web_async", "ingest", "replica") and
+records, per pool:
+- db_pool_checkout_wait_seconds: time to get a connection, including waiting for
+  one to be returned when the pool and its overflow are all in use
+- db_pool_connections_in_use: connections currently checked out
+- db_pool_timeouts_total: checkouts that gave up after DB_POOL_TIMEOUT seconds
+"""
+
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from utils import metrics_utils
+
+
+def pool_name(pool: Pool) -> str:
+    return pool.logging_name or "default"
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics_utils.DB_POOL_TIMEOUTS.inc(pool=pool_name(self))
+            raise
+        finally:
+            metrics_utils.DB_POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - started, pool=pool_name(self))
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+def track_connections_in_use(pool: Pool) -> None:
+    """Keeps db_pool_connections_in_use up to date for the pool (and its replacements after dispose())."""
+    name = pool_name(pool)
+    event.listen(pool, "checkout", lambda *args: metrics_utils.DB_POOL_CONNECTIONS_IN_USE.inc(pool=name))
+    event.listen(pool, "checkin", lambda *args: metrics_utils.DB_POOL_CONNECTIONS_IN_USE.dec(pool=name))
@@ -0,0 +1,124 @@
+"""
+Opt-in sampling profiler for live traffic.
+
+With PROFILING_SAMPLE_RATE above 0, that fraction of requests is profiled by a
+background thread that snapshots the Python stacks every PROFILING_INTERVAL_SECONDS
+while the request runs. Stacks are appended to PROFILING_OUTPUT_DIR/<route>.folded
+in the collapsed format ("frame;frame;frame count") read by flamegraph.pl, speedscope
+and similar tools, so a flame graph per route builds up over time.
+
+Every thread except the sampler is sampled, since sync handlers run on the thread
+pool rather than the event loop thread. Threads that are idle (waiting on a lock,
+queue or selector) are left out, but concurrent requests can still show up in each
+other's profiles.
+"""
+
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from utils.config_utils import get_settings
+from utils.timing_utils import get_route_template
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# leaf functions of threads that are waiting rather than working
+IDLE_FUNCTIONS = {"wait", "select", "poll", "accept", "_worker", "_wait_for_tstate_lock"}
+
+
+def format_frame(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> Optional[str]:
+    """Root-first 'frame;frame;frame' for the stack ending at frame, None if the thread is idle."""
+    if frame.f_code.co_name in IDLE_FUNCTIONS:
+        return None
+    frames = []
+    while frame is not None:
+        frames.append(format_frame(frame))
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+def route_filename(method: str, route: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", f"{method} {route}").strip("_") + ".folded"
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of all other threads until stop() is called."""
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True, name="stack-sampler")
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self.output_path: Optional[str] = None
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = collapse_stack(frame)
+                if stack:
+                    self.stacks[stack] += 1
+        if self.output_path:
+            self.write(self.output_path)
+
+    def stop(self, output_path: str) -> None:
+        """Stops sampling and appends the samples to output_path, from the sampler thread."""
+        self.output_path = output_path
+        self._stopped.set()
+
+    def write(self, output_path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            with open(output_path, "a") as profile_file:
+                for stack, count in self.stacks.items():
+                    profile_file.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error("Could not write profile to %s: %s", output_path, e)
+
+
+class SamplingProfilerMiddleware:
+    """Profiles a random PROFILING_SAMPLE_RATE fraction of requests, see the module docstring."""
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = settings.PROFILING_SAMPLE_RATE,
+        interval: float = settings.PROFILING_INTERVAL_SECONDS,
+        output_dir: str = settings.PROFILING_OUTPUT_DIR,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = get_route_template(scope)
+            sampler.stop(os.path.join(self.output_dir, route_filename(scope["method"], route)))
+            logger.info(
+                "Profiled %s %s (%.1fms)", scope["method"], route, (time.perf_counter() - started_at) * 1000
+            )
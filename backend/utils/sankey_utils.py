@@ -0,0 +1,142 @@
+"""
+Renders the Sankey diagram of where a user's applications ended up
+(db/utils/application_utils.get_stage_counts) as PNG, SVG or Plotly JSON.
+
+PNG export goes through Kaleido, which drives a headless Chromium, so it runs in a
+small process pool instead of the request thread, and every rendering is cached
+by a hash of the counts: the diagram only shows counts, so users with the same
+counts share it. SVG is drawn directly and JSON is the Plotly figure for
+rendering in the browser; neither needs Chromium.
+"""
+
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+import plotly.graph_objects as go
+import plotly.io
+from cachetools import LRUCache
+
+from utils.config_utils import get_settings
+
+settings = get_settings()
+
+# format: media type
+SANKEY_FORMATS = {"png": "image/png", "svg": "image/svg+xml", "json": "application/json"}
+
+# (label, key in the stage counts, color)
+SANKEY_STAGES = (
+    ("Offers", "offer", "#2ca02c"),
+    ("Rejected", "rejected", "#d62728"),
+    ("Interviewing", "interview", "#1f77b4"),
+    ("Assessment", "assessment", "#9467bd"),
+    ("No Response", "no_response", "#7f7f7f"),
+    ("Other Response", "other", "#ff7f0e"),
+)
+
+sankey_cache = LRUCache(maxsize=settings.SANKEY_CACHE_SIZE)
+sankey_cache_lock = threading.Lock()
+
+render_pool: Optional[ProcessPoolExecutor] = None
+render_pool_lock = threading.Lock()
+
+
+def sankey_stages(stage_counts: Dict[str, int]) -> List[Tuple[str, int, str]]:
+    return [(f"{label} ({stage_counts[key]})", stage_counts[key], color) for label, key, color in SANKEY_STAGES]
+
+
+def sankey_figure(stage_counts: Dict[str, int]) -> go.Figure:
+    stages = sankey_stages(stage_counts)
+    return go.Figure(go.Sankey(
+        node=dict(label=[f"Applications ({stage_counts['applications']})"] + [label for label, _, _ in stages],
+                  color=["#636efa"] + [color for _, _, color in stages]),
+        link=dict(source=[0] * len(stages), target=list(range(1, len(stages) + 1)),
+                  value=[count for _, count, _ in stages])))
+
+
+def sankey_svg(stage_counts: Dict[str, int], width: int = 900, height: int = 500) -> str:
+    """
+    Draws the diagram as SVG: the applications node on the left, one node per
+    non-empty stage on the right, and a band from one to the other sized by its count.
+    """
+    stages = [stage for stage in sankey_stages(stage_counts) if stage[1]]
+    total = sum(count for _, count, _ in stages)
+    margin, node_width, gap = 20, 20, 12
+    usable = height - 2 * margin - gap * max(len(stages) - 1, 0)
+    scale = usable / total if total else 0
+    source_x, target_x = margin + 150, width - margin - 160 - node_width
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="13">',
+        f'<rect x="{source_x}" y="{margin}" width="{node_width}" height="{total * scale:.1f}" fill="#636efa"/>',
+        f'<text x="{source_x - 6}" y="{margin + total * scale / 2:.1f}" text-anchor="end" dominant-baseline="middle">'
+        f'Applications ({stage_counts["applications"]})</text>',
+    ]
+    source_y, target_y = margin, margin
+    for label, count, color in stages:
+        band = count * scale
+        x0, x1 = source_x + node_width, target_x
+        middle = (x0 + x1) / 2
+        parts.append(
+            f'<path d="M{x0},{source_y:.1f} C{middle},{source_y:.1f} {middle},{target_y:.1f} {x1},{target_y:.1f} '
+            f'L{x1},{target_y + band:.1f} C{middle},{target_y + band:.1f} {middle},{source_y + band:.1f} '
+            f'{x0},{source_y + band:.1f} Z" fill="{color}" fill-opacity="0.4"/>'
+        )
+        parts.append(
+            f'<rect x="{target_x}" y="{target_y:.1f}" width="{node_width}" height="{band:.1f}" fill="{color}"/>'
+        )
+        parts.append(
+            f'<text x="{target_x + node_width + 6}" y="{target_y + band / 2:.1f}" '
+            f'dominant-baseline="middle">{escape(label)}</text>'
+        )
+        source_y += band
+        target_y += band + gap
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def figure_to_png(figure_json: str) -> bytes:
+    """Runs in the render pool, so each worker keeps its own Chromium warm."""
+    return plotly.io.from_json(figure_json).to_image(format="png")
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global render_pool
+    with render_pool_lock:
+        if render_pool is None:
+            # spawned, not forked, so workers don't inherit the server's threads and connections
+            render_pool = ProcessPoolExecutor(
+                max_workers=settings.SANKEY_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return render_pool
+
+
+def render_sankey(stage_counts: Dict[str, int], sankey_format: str) -> bytes:
+    """
+    Returns the diagram in one of SANKEY_FORMATS, from the cache when the same
+    counts were rendered before.
+    """
+    digest = hashlib.sha256(orjson.dumps(stage_counts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    key = (sankey_format, digest)
+    with sankey_cache_lock:
+        if key in sankey_cache:
+            return sankey_cache[key]
+
+    if sankey_format == "svg":
+        content = sankey_svg(stage_counts).encode()
+    elif sankey_format == "json":
+        content = sankey_figure(stage_counts).to_json().encode()
+    else:
+        figure_json = sankey_figure(stage_counts).to_json()
+        content = get_render_pool().submit(figure_to_png, figure_json).result(
+            timeout=settings.SANKEY_RENDER_TIMEOUT_SECONDS
+        )
+
+    with sankey_cache_lock:
+        sankey_cache[key] = content
+    return content
@@ -0,0 +1,112 @@
+import math
+from typing import Dict, Optional
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch-style).
+
+    Values are counted in logarithmically sized bins, so any quantile is returned
+    within relative_accuracy of the true value, and the sketch size depends on the
+    range of the values, not on how many there are. Unlike t-digest, bins are
+    fixed, so sketches can be merged exactly and a value can be removed again,
+    which lets the community rollup replace a user's old contribution with a new one.
+    Values <= MIN_POSITIVE_VALUE (including 0) share a single zero bin.
+    """
+
+    MIN_POSITIVE_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def key(self, value: float) -> Optional[int]:
+        if value <= self.MIN_POSITIVE_VALUE:
+            return None
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def value(self, key: int) -> float:
+        """Representative value of a bin, within relative_accuracy of every value in it."""
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("QuantileSketch only supports non-negative values")
+        key = self.key(value)
+        if key is None:
+            self.zero_count += count
+        else:
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def remove(self, value: float, count: int = 1) -> None:
+        """Removes a value that was added before."""
+        key = self.key(value)
+        if key is None:
+            if self.zero_count < count:
+                raise ValueError(f"{value} was not added to the sketch")
+            self.zero_count -= count
+            return
+        remaining = self.bins.get(key, 0) - count
+        if remaining < 0:
+            raise ValueError(f"{value} was not added to the sketch")
+        if remaining:
+            self.bins[key] = remaining
+        else:
+            del self.bins[key]
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can only merge sketches with the same relative_accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the q-quantile (0 <= q <= 1), or None if the sketch is empty."""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                return self.value(key)
+        return self.value(max(self.bins))
+
+    def rank(self, value: float) -> Optional[float]:
+        """Returns the fraction of values <= value (up to the bin resolution)."""
+        total = self.count
+        if not total:
+            return None
+        key = self.key(value)
+        if key is None:
+            return self.zero_count / total
+        below = self.zero_count + sum(count for bin_key, count in self.bins.items() if bin_key <= key)
+        return below / total
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            # JSON object keys are strings
+            "bins": {str(key): count for key, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch.zero_count = data["zero_count"]
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        return sketch
@@ -0,0 +1,92 @@
+"""
+Per-request latency and database time.
+
+RequestTimingMiddleware records how long each request takes, by route template
+(e.g. /delete-email/{email_id}) rather than by raw path, and how much of that time
+was spent running SQL. SQL time is measured with SQLAlchemy cursor events on every
+engine, and attributed to the request whose context the statement ran in, including
+sync handlers and dependencies that FastAPI runs in its thread pool.
+"""
+
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils import metrics_utils
+
+logger = logging.getLogger(__name__)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestDbTime:
+    """SQL time and statement count of the request in progress."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+
+_request_db_time: ContextVar[Optional[RequestDbTime]] = ContextVar("request_db_time", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info["query_started_at"].pop()
+    db_time = _request_db_time.get()
+    if db_time is not None:
+        db_time.seconds += time.perf_counter() - started_at
+        db_time.queries += 1
+
+
+def get_route_template(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware, so streaming responses and background tasks are untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        db_time = RequestDbTime()
+        token = _request_db_time.set(db_time)
+        started_at = time.perf_counter()
+        try:
+            with metrics_utils.HTTP_REQUESTS_IN_FLIGHT.track_in_progress():
+                await self.app(scope, receive, send_with_status)
+        finally:
+            _request_db_time.reset(token)
+            elapsed = time.perf_counter() - started_at
+            method = scope["method"]
+            route = get_route_template(scope)
+            metrics_utils.HTTP_REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=str(status_code))
+            metrics_utils.HTTP_REQUEST_DB_SECONDS.observe(db_time.seconds, method=method, route=route)
+            metrics_utils.HTTP_REQUEST_DB_QUERIES.observe(db_time.queries, method=method, route=route)
+            logger.debug(
+                "%s %s %s took %.1fms, %s queries in %.1fms",
+                method, route, status_code, elapsed * 1000, db_time.queries, db_time.seconds * 1000,
+            )